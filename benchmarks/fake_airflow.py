@@ -0,0 +1,113 @@
+import asyncio
+import random
+from collections import Counter
+
+from aiohttp import web
+
+# Collection name -> field holding the object id
+COLLECTIONS = {
+    "connections": "connection_id",
+    "pools": "name",
+    "variables": "key",
+}
+
+# Fields the real list endpoints never return
+HIDDEN_FIELDS = {"connections": {"password"}}
+
+
+class FakeAirflow:
+    """In-memory stand-in for the Airflow REST API used by the operator.
+
+    Serves list, create, patch and delete for connections, pools and
+    variables under /api/v1. Every request can be delayed by `latency`
+    seconds, and a fraction `error_rate` of them is answered with
+    `error_status` instead of being processed.
+
+    Args:
+        latency: Seconds added to every response.
+        error_rate: Fraction of requests to fail, between 0 and 1.
+        error_status: HTTP status returned for injected errors.
+        seed: Seed for the error injection, for reproducible runs.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=503, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.objects = {collection: {} for collection in COLLECTIONS}
+        self.calls = Counter()
+        self._random = random.Random(seed)
+
+    def app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/api/v1/{collection}", self._list)
+        app.router.add_post("/api/v1/{collection}", self._create)
+        app.router.add_patch("/api/v1/{collection}/{object_id}", self._patch)
+        app.router.add_delete("/api/v1/{collection}/{object_id}", self._delete)
+        return app
+
+    def drift(self, collection, fraction, field, value):
+        """Overwrite `field` on a fraction of the stored objects.
+
+        Returns the number of objects changed.
+        """
+        ids = sorted(self.objects[collection])
+        drifted = ids[: int(len(ids) * fraction)]
+        for object_id in drifted:
+            self.objects[collection][object_id][field] = value
+        return len(drifted)
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        collection = request.match_info.get("collection")
+        if collection not in COLLECTIONS:
+            raise web.HTTPNotFound()
+        self.calls[(request.method, collection)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return _problem(self.error_status, "Injected error")
+        return await handler(request)
+
+    async def _list(self, request):
+        collection = request.match_info["collection"]
+        limit = int(request.query.get("limit", 100))
+        offset = int(request.query.get("offset", 0))
+        hidden = HIDDEN_FIELDS.get(collection, set())
+        items = list(self.objects[collection].values())
+        return web.json_response(
+            {
+                collection: [
+                    {k: v for k, v in item.items() if k not in hidden}
+                    for item in items[offset : offset + limit]
+                ],
+                "total_entries": len(items),
+            }
+        )
+
+    async def _create(self, request):
+        collection = request.match_info["collection"]
+        payload = await request.json()
+        object_id = payload[COLLECTIONS[collection]]
+        if object_id in self.objects[collection]:
+            return _problem(409, "Already Exists")
+        self.objects[collection][object_id] = payload
+        return web.json_response(payload)
+
+    async def _patch(self, request):
+        collection = request.match_info["collection"]
+        stored = self.objects[collection].get(request.match_info["object_id"])
+        if stored is None:
+            return _problem(404, "Not Found")
+        stored.update(await request.json())
+        return web.json_response(stored)
+
+    async def _delete(self, request):
+        collection = request.match_info["collection"]
+        if self.objects[collection].pop(request.match_info["object_id"], None) is None:
+            return _problem(404, "Not Found")
+        return web.Response(status=204)
+
+
+def _problem(status, title):
+    return web.json_response({"status": status, "title": title}, status=status)
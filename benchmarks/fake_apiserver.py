@@ -0,0 +1,87 @@
+import asyncio
+import base64
+from collections import Counter
+
+from aiohttp import web
+
+
+class FakeApiServer:
+    """Minimal stand-in for the Kubernetes API used outside of kopf.
+
+    Serves Secret reads and lists, and accepts status patches of custom
+    resources, which is everything the operator requests directly through
+    the kubernetes client. Watches are not served; the benchmark feeds the
+    handlers itself.
+
+    Args:
+        latency: Seconds added to every response.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.secrets = {}
+        self.calls = Counter()
+
+    def add_secret(self, namespace, name, data):
+        self.secrets[(namespace, name)] = {
+            key: base64.b64encode(value.encode()).decode()
+            for key, value in data.items()
+        }
+
+    def app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/api/v1/namespaces/{namespace}/secrets", self._list_secrets)
+        app.router.add_get(
+            "/api/v1/namespaces/{namespace}/secrets/{name}", self._read_secret
+        )
+        app.router.add_patch(
+            "/apis/{group}/{version}/namespaces/{namespace}/{plural}/{name}/status",
+            self._patch_status,
+        )
+        return app
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        route = request.match_info.route.resource
+        self.calls[(request.method, route.canonical if route else request.path)] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    def _secret(self, namespace, name):
+        return {
+            "apiVersion": "v1",
+            "kind": "Secret",
+            "metadata": {"name": name, "namespace": namespace},
+            "data": self.secrets[(namespace, name)],
+        }
+
+    async def _read_secret(self, request):
+        namespace = request.match_info["namespace"]
+        name = request.match_info["name"]
+        if (namespace, name) not in self.secrets:
+            return web.json_response(
+                {"kind": "Status", "code": 404, "reason": "NotFound"}, status=404
+            )
+        return web.json_response(self._secret(namespace, name))
+
+    async def _list_secrets(self, request):
+        namespace = request.match_info["namespace"]
+        return web.json_response(
+            {
+                "apiVersion": "v1",
+                "kind": "SecretList",
+                "metadata": {},
+                "items": [
+                    self._secret(secret_namespace, name)
+                    for secret_namespace, name in self.secrets
+                    if secret_namespace == namespace
+                ],
+            }
+        )
+
+    async def _patch_status(self, request):
+        body = await request.json()
+        return web.json_response(
+            {"metadata": {"name": request.match_info["name"]}, **body}
+        )
@@ -0,0 +1,81 @@
+"""Profile how long importing the operator takes.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter, which is
+what `kopf run main.py` pays on every pod start, and reports the wall time
+and the packages that take longest to import.
+
+Usage:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --backend aws --top 15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Enough configuration for every auth backend to import without a cluster
+DEFAULT_ENV = {
+    "AIRFLOW_HOST": "http://localhost:8080",
+    "AIRFLOW_USERNAME": "benchmark",
+    "AIRFLOW_PASSWORD": "benchmark",
+    "AWS_REGION": "us-east-1",
+    "MWAA_ENV_NAME": "benchmark",
+}
+
+
+def parse_importtime(stderr):
+    """Return the self time in microseconds spent importing each package.
+
+    Times of submodules are added to their top-level package, e.g. all of
+    `kubernetes.client.*` counts towards `kubernetes`.
+    """
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_time, _, module = line.removeprefix("import time:").split("|")
+        if not self_time.strip().isdigit():
+            continue
+        package = module.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_time)
+    return packages
+
+
+def profile(backend=None):
+    env = {**DEFAULT_ENV, **os.environ}
+    if backend:
+        env["AIRFLOW_AUTH_BACKEND"] = backend
+    start_time = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start_time
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing the operator failed:\n{completed.stderr}")
+    return elapsed, parse_importtime(completed.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", help="AIRFLOW_AUTH_BACKEND to import with")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    elapsed, packages = profile(args.backend)
+    print(f"interpreter start and import: {elapsed * 1000:.0f} ms")
+    print(f"{'import_ms':>10}  package")
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    for package, self_time in ranked[: args.top]:
+        print(f"{self_time / 1000:>10.1f}  {package}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,422 @@
+"""Reconciliation benchmark against local fake Airflow and Kubernetes APIs.
+
+Starts `FakeAirflow` and `FakeApiServer` on localhost, points the operator's
+clients at them and drives the real handlers and bulk reconciler with
+synthetic custom resources. No cluster or Airflow installation is needed.
+
+Usage:
+    python benchmarks/run.py --count 1000 --latency-ms 20
+    python benchmarks/run.py --count 1000 --output baseline.json
+    python benchmarks/run.py --count 1000 --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.fake_airflow import FakeAirflow
+from benchmarks.fake_apiserver import FakeApiServer
+
+NAMESPACE = "benchmark"
+KINDS = ("connection", "pool", "variable")
+# Connections share Secrets, like credentials reused across environments
+RESOURCES_PER_SECRET = 10
+
+logger = logging.getLogger("benchmark")
+
+
+class BackgroundServers:
+    """Run aiohttp applications on an event loop in a separate thread.
+
+    Keeping the fake servers off the operator's event loop means their own
+    work does not show up in the handler latencies being measured.
+    """
+
+    def __init__(self, *apps):
+        self._apps = apps
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._runners = []
+        self.urls = []
+
+    def __enter__(self):
+        self._thread.start()
+        for app in self._apps:
+            future = asyncio.run_coroutine_threadsafe(self._serve(app), self._loop)
+            self.urls.append(future.result())
+        return self
+
+    def __exit__(self, *exc_info):
+        for runner in self._runners:
+            asyncio.run_coroutine_threadsafe(runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _serve(self, app):
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        self._runners.append(runner)
+        host, port = runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def synthetic_resources(count):
+    """Yield (kind, name, spec) for `count` custom resources, evenly mixed."""
+    for i in range(count):
+        kind = KINDS[i % len(KINDS)]
+        name = f"{kind}-{i:05d}"
+        if kind == "connection":
+            yield (
+                kind,
+                name,
+                {
+                    "connType": "postgres",
+                    "host": f"db-{i}.example.com",
+                    "port": 5432,
+                    "login": "airflow",
+                    "password": {
+                        "secretRef": {
+                            "name": f"secret-{i // RESOURCES_PER_SECRET}",
+                            "key": "password",
+                        }
+                    },
+                },
+            )
+        elif kind == "pool":
+            yield kind, name, {"slots": i % 32 + 1, "description": f"Pool {i}"}
+        else:
+            yield kind, name, {"value": f"value-{i}", "description": f"Variable {i}"}
+
+
+def updated_spec(kind, spec):
+    """Return `spec` with one field changed, as a user editing the resource would."""
+    if kind == "connection":
+        return {**spec, "port": spec["port"] + 1}
+    if kind == "pool":
+        return {**spec, "slots": spec["slots"] + 1}
+    return {**spec, "value": f"{spec['value']}-updated"}
+
+
+def _configure_environment(airflow_url, rate_limit):
+    # The operator reads its settings at import time
+    os.environ.setdefault("AIRFLOW_HOST", airflow_url)
+    os.environ.setdefault("AIRFLOW_USERNAME", "benchmark")
+    os.environ.setdefault("AIRFLOW_PASSWORD", "benchmark")
+    os.environ.setdefault("OPERATOR_AIRFLOW_RATE_LIMIT", str(rate_limit))
+
+
+class Scenario:
+    def __init__(self, name, airflow, apiserver):
+        self.name = name
+        self._airflow = airflow
+        self._apiserver = apiserver
+        self.latencies = []
+        self.errors = 0
+
+    def __enter__(self):
+        self._airflow_calls = sum(self._airflow.calls.values())
+        self._apiserver_calls = sum(self._apiserver.calls.values())
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self._start
+        self.airflow_calls = sum(self._airflow.calls.values()) - self._airflow_calls
+        self.apiserver_calls = (
+            sum(self._apiserver.calls.values()) - self._apiserver_calls
+        )
+
+    async def timed(self, handler, **kwargs):
+        start = time.perf_counter()
+        await handler(**kwargs)
+        self.latencies.append(time.perf_counter() - start)
+        # Handlers report failures through the Ready condition
+        conditions = kwargs["patch"].get("status", {}).get("conditions") or []
+        if any(condition["status"] == "False" for condition in conditions):
+            self.errors += 1
+
+    def result(self, count):
+        return {
+            "count": count,
+            "elapsed_s": round(self.elapsed, 3),
+            "throughput_per_s": round(count / self.elapsed, 1) if self.elapsed else 0,
+            "p50_ms": round(percentile(self.latencies, 0.5) * 1000, 2),
+            "p99_ms": round(percentile(self.latencies, 0.99) * 1000, 2),
+            "errors": self.errors,
+            "airflow_calls": self.airflow_calls,
+            "apiserver_calls": self.apiserver_calls,
+        }
+
+
+async def _run_scenarios(custom_resources, airflow, apiserver, drift):
+    import kopf
+
+    import resources.connections as connections
+    import resources.pools as pools
+    import resources.sets as sets
+    import resources.variables as variables
+    from config import reconciler
+    from config.instances import airflow_instances
+    from config.status import status_manager
+    from config.workqueue import work_queue
+
+    handlers = {
+        "connection": connections,
+        "pool": pools,
+        "variable": variables,
+    }
+
+    def handler(kind, action):
+        return getattr(handlers[kind], f"{action}_{kind}")
+
+    def kwargs(name, spec):
+        return {
+            "meta": {"name": name},
+            "spec": spec,
+            "status": {},
+            "namespace": NAMESPACE,
+            "logger": logger,
+            "body": {"metadata": {"name": name}, "spec": spec},
+            "patch": kopf.Patch(),
+        }
+
+    def index(resources, event_type):
+        for kind, name, spec in resources:
+            handler(kind, "index")(
+                event={"type": event_type},
+                meta={"name": name},
+                spec=spec,
+                status={},
+                namespace=NAMESPACE,
+            )
+
+    # Replay the initial watch listing that fills the reconciler indexes
+    index(custom_resources, None)
+
+    results = {}
+    updated_resources = [
+        (kind, name, updated_spec(kind, spec)) for kind, name, spec in custom_resources
+    ]
+    for action in ("create", "update"):
+        if action == "update":
+            # Every resource is edited; the watch sees the new specs first
+            custom_resources = updated_resources
+            index(custom_resources, "MODIFIED")
+        with Scenario(action, airflow, apiserver) as scenario:
+            await asyncio.gather(
+                *(
+                    scenario.timed(handler(kind, action), **kwargs(name, spec))
+                    for kind, name, spec in custom_resources
+                )
+            )
+            # Updates are queued; the workers' writes belong to the scenario
+            await asyncio.to_thread(work_queue.drain)
+        results[action] = scenario.result(len(custom_resources))
+
+    with Scenario("cycle_steady", airflow, apiserver) as scenario:
+        await asyncio.to_thread(reconciler.run_all_cycles)
+        await asyncio.to_thread(work_queue.drain)
+        await asyncio.to_thread(status_manager.flush, True)
+    scenario.latencies.append(scenario.elapsed)
+    results["cycle_steady"] = scenario.result(len(custom_resources))
+
+    airflow.drift("pools", drift, "slots", 0)
+    airflow.drift("variables", drift, "value", "drifted")
+    airflow.drift("connections", drift, "host", "drifted.example.com")
+    with Scenario("cycle_drift", airflow, apiserver) as scenario:
+        await asyncio.to_thread(reconciler.run_all_cycles)
+        await asyncio.to_thread(work_queue.drain)
+        await asyncio.to_thread(status_manager.flush, True)
+    scenario.latencies.append(scenario.elapsed)
+    results["cycle_drift"] = scenario.result(len(custom_resources))
+
+    # The same number of variables managed through a single VariableSet
+    set_spec = {
+        "variables": [
+            {"key": f"set-variable-{i:05d}", "value": f"value-{i}"}
+            for i in range(len(custom_resources))
+        ]
+    }
+    with Scenario("variable_set", airflow, apiserver) as scenario:
+        await scenario.timed(
+            sets.create_variable_set, **kwargs("benchmark-set", set_spec)
+        )
+    results["variable_set"] = scenario.result(len(custom_resources))
+    await sets.delete_variable_set(**kwargs("benchmark-set", set_spec))
+
+    with Scenario("delete", airflow, apiserver) as scenario:
+        await asyncio.gather(
+            *(
+                scenario.timed(handler(kind, "delete"), **kwargs(name, spec))
+                for kind, name, spec in custom_resources
+            )
+        )
+    results["delete"] = scenario.result(len(custom_resources))
+
+    await airflow_instances.close()
+    return results
+
+
+def run_benchmark(
+    count=1000,
+    latency=0.0,
+    error_rate=0.0,
+    error_status=503,
+    apiserver_latency=0.0,
+    drift=0.1,
+    rate_limit=0,
+    trace_memory=False,
+):
+    """Run every scenario once and return the results.
+
+    Args:
+        count: Number of synthetic custom resources.
+        latency: Seconds the fake Airflow adds to every response.
+        error_rate: Fraction of Airflow requests answered with `error_status`.
+        error_status: HTTP status used for injected Airflow errors.
+        apiserver_latency: Seconds the fake apiserver adds to every response.
+        drift: Fraction of Airflow objects changed behind the operator's back
+            before the drift cycle.
+        rate_limit: Airflow requests per second allowed by the operator's rate
+            limiter; 0 disables it. Only applies if the operator was not
+            imported yet.
+        trace_memory: Also report the peak Python heap size measured with
+            tracemalloc. Tracing slows every allocation down, so latencies of
+            such a run are not comparable with untraced runs.
+
+    Returns:
+        Dict of scenario name to metrics, plus a "memory" entry.
+    """
+    from kubernetes import client as k8s_client
+
+    airflow = FakeAirflow(latency, error_rate, error_status)
+    apiserver = FakeApiServer(apiserver_latency)
+    custom_resources = list(synthetic_resources(count))
+    for i in range(count // RESOURCES_PER_SECRET + 1):
+        apiserver.add_secret(NAMESPACE, f"secret-{i}", {"password": f"password-{i}"})
+
+    with BackgroundServers(airflow.app(), apiserver.app()) as servers:
+        airflow_url, apiserver_url = servers.urls
+        _configure_environment(airflow_url, rate_limit)
+        configuration = k8s_client.Configuration()
+        configuration.host = apiserver_url
+        k8s_client.Configuration.set_default(configuration)
+
+        from config.client import api_client
+
+        api_client.configuration.host = f"{airflow_url}/api/v1"
+
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            results = asyncio.run(
+                _run_scenarios(custom_resources, airflow, apiserver, drift)
+            )
+            if trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                results["memory"] = {"tracemalloc_peak_mib": round(peak / 2**20, 1)}
+        finally:
+            tracemalloc.stop()
+
+    results.setdefault("memory", {})["max_rss_mib"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+    )
+    return results
+
+
+def format_results(results, baseline=None):
+    columns = [
+        "count",
+        "elapsed_s",
+        "throughput_per_s",
+        "p50_ms",
+        "p99_ms",
+        "errors",
+        "airflow_calls",
+        "apiserver_calls",
+    ]
+    lines = [f"{'scenario':<14}" + "".join(f"{column:>18}" for column in columns)]
+    for name, metrics in results.items():
+        if name == "memory":
+            continue
+        cells = []
+        for column in columns:
+            cell = str(metrics[column])
+            previous = (baseline or {}).get(name, {}).get(column)
+            if previous:
+                cell += f" ({(metrics[column] - previous) / previous:+.0%})"
+            cells.append(f"{cell:>18}")
+        lines.append(f"{name:<14}" + "".join(cells))
+    memory = results["memory"]
+    line = f"memory: max RSS {memory['max_rss_mib']} MiB"
+    if "tracemalloc_peak_mib" in memory:
+        line += f", tracemalloc peak {memory['tracemalloc_peak_mib']} MiB"
+    lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--apiserver-latency-ms", type=float, default=0.0)
+    parser.add_argument("--drift", type=float, default=0.1)
+    parser.add_argument("--rate-limit", type=float, default=0)
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="report the peak Python heap; slows the run down",
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    # Failed requests are counted, not logged one by one
+    logging.getLogger("config").setLevel(logging.CRITICAL)
+    logger.setLevel(logging.CRITICAL)
+
+    results = run_benchmark(
+        count=args.count,
+        latency=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        apiserver_latency=args.apiserver_latency_ms / 1000,
+        drift=args.drift,
+        rate_limit=args.rate_limit,
+        trace_memory=args.trace_memory,
+    )
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print(format_results(results, baseline))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+import ssl
+import time
+from urllib.parse import quote
+
+import aiohttp
+from airflow_client.client.exceptions import ApiException
+
+from config.api_client import record_api_call
+from config.base import (
+    OPERATOR_HTTP_CONNECT_TIMEOUT,
+    OPERATOR_HTTP_KEEPALIVE,
+    OPERATOR_HTTP_POOL_MAXSIZE,
+    OPERATOR_HTTP_READ_TIMEOUT,
+)
+from config.log import redact_error
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAirflowClient:
+    """Asyncio transport for the Airflow REST API.
+
+    Requests are sent with aiohttp on the operator's event loop, so async
+    handlers do not hold a thread for the HTTP round trip. Host and auth
+    headers come from a blocking `AirflowApiClient`. Every request is paced by
+    the rate limiter of that client and takes a slot of its `in_flight`
+    limit, so both paths share one budget per instance.
+
+    Errors are raised as `ApiException`, like the generated client does, so
+    handlers treat both paths the same.
+
+    Args:
+        sync_client: The `AirflowApiClient` to take host and auth from.
+    """
+
+    def __init__(self, sync_client):
+        self._sync_client = sync_client
+        self._session = None
+
+    def _ssl_context(self):
+        configuration = self._sync_client.configuration
+        if not configuration.verify_ssl:
+            return False
+        return ssl.create_default_context(cafile=configuration.ssl_ca_cert)
+
+    def _connector(self):
+        if OPERATOR_HTTP_KEEPALIVE <= 0:
+            return aiohttp.TCPConnector(
+                ssl=self._ssl_context(),
+                limit_per_host=OPERATOR_HTTP_POOL_MAXSIZE,
+                force_close=True,
+            )
+        return aiohttp.TCPConnector(
+            ssl=self._ssl_context(),
+            limit_per_host=OPERATOR_HTTP_POOL_MAXSIZE,
+            keepalive_timeout=OPERATOR_HTTP_KEEPALIVE,
+        )
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=self._connector(),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=OPERATOR_HTTP_CONNECT_TIMEOUT,
+                    sock_read=OPERATOR_HTTP_READ_TIMEOUT,
+                ),
+                json_serialize=json.dumps,
+            )
+        return self._session
+
+    async def _auth(self):
+        # Token refreshes are blocking; keep them off the event loop
+        if self._sync_client.auth_refresh_needed():
+            headers = await asyncio.to_thread(self._sync_client.auth_headers)
+        else:
+            headers = self._sync_client.auth_headers()
+        return {"Content-Type": "application/json", **headers}
+
+    async def request(self, method, path, body=None):
+        """Send a request and return the decoded JSON response, if any.
+
+        Args:
+            method: HTTP method.
+            path: Path below the API base URL, e.g. "/connections".
+            body: JSON-serializable request body.
+
+        Raises:
+            ApiException: If Airflow answers with a non-2xx status.
+        """
+        limiter = self._sync_client.rate_limiter
+        await limiter.acquire_async()
+        async with self._sync_client.in_flight:
+            headers = await self._auth()
+            url = f"{self._sync_client.api_host().rstrip('/')}{path}"
+            session = self._get_session()
+            start_time = time.time()
+            try:
+                async with session.request(
+                    method, url, json=body, headers=headers
+                ) as response:
+                    data = await response.read()
+            except Exception as e:
+                record_api_call(method, path, None, time.time() - start_time, e)
+                raise
+            record_api_call(method, path, response.status, time.time() - start_time)
+            limiter.record(response.status, response.headers.get("Retry-After"))
+            if not 200 <= response.status <= 299:
+                exception = ApiException(status=response.status, reason=response.reason)
+                exception.body = data.decode("utf-8", errors="replace")
+                raise redact_error(exception, body)
+            if not data:
+                return None
+            return json.loads(data)
+
+    async def post(self, collection, payload):
+        return await self.request("POST", f"/{collection}", payload)
+
+    async def patch(self, collection, object_id, payload):
+        return await self.request(
+            "PATCH", f"/{collection}/{quote(str(object_id), safe='')}", payload
+        )
+
+    async def delete(self, collection, object_id):
+        return await self.request(
+            "DELETE", f"/{collection}/{quote(str(object_id), safe='')}"
+        )
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
@@ -0,0 +1,182 @@
+import json
+import time
+from urllib.parse import urlsplit
+
+import airflow_client.client as client
+from airflow_client.client import rest
+from airflow_client.client.exceptions import ApiException
+
+from config import http_pool
+from config.base import OPERATOR_HTTP_POOL_SIZE
+from config.log import redact_error
+from config.metrics import (
+    AIRFLOW_API_DURATION,
+    AIRFLOW_API_ERRORS,
+    AIRFLOW_API_REQUESTS,
+    RECONCILE_PHASE_DURATION,
+)
+from config.ratelimit import airflow_in_flight, airflow_rate_limiter
+
+# Authentication schemes of the Airflow API, as the generated API classes list them
+AUTH_SETTINGS = ["Basic", "Kerberos"]
+
+
+def endpoint_label(path):
+    """Reduce a request path below the API base URL to a metric label.
+
+    Object ids are replaced by a placeholder to bound label cardinality, e.g.
+    "/connections/my_conn" becomes "/connections/{id}".
+    """
+    segments = [segment for segment in path.split("/") if segment]
+    if not segments:
+        return "/"
+    return f"/{segments[0]}" + ("/{id}" if len(segments) > 1 else "")
+
+
+def record_api_call(method, path, status, duration, error=None):
+    """Record the request metrics of one Airflow API call.
+
+    Args:
+        method: HTTP method.
+        path: Request path below the API base URL.
+        status: HTTP status code, or None if no response was received.
+        duration: Seconds from sending the request to the response.
+        error: Exception raised by the call, if any.
+    """
+    endpoint = endpoint_label(path)
+    AIRFLOW_API_REQUESTS.labels(
+        method=method, endpoint=endpoint, status_code=str(status or "none")
+    ).inc()
+    AIRFLOW_API_DURATION.labels(method=method, endpoint=endpoint).observe(duration)
+    RECONCILE_PHASE_DURATION.labels(phase="airflow_http").observe(duration)
+    if error is not None:
+        AIRFLOW_API_ERRORS.labels(
+            error_type=f"http_{status}" if status else type(error).__name__
+        ).inc()
+    elif status is not None and not 200 <= status <= 299:
+        AIRFLOW_API_ERRORS.labels(error_type=f"http_{status}").inc()
+
+
+class AirflowApiClient(client.ApiClient):
+    """Airflow API client that exposes its target host and auth headers.
+
+    The async transport in `config.aio` reuses both, so every authentication
+    backend serves the blocking and the asyncio code paths alike. Connections
+    are pooled with the settings from `config.http_pool`, and every request
+    gets the default connect and read timeouts unless the caller passes its
+    own. Every request goes through `rate_limiter`, by default the
+    process-wide `airflow_rate_limiter` of the default Airflow instance, and
+    takes a slot of `in_flight`, shared with the async transport.
+    """
+
+    # Name of the Airflow instance this client talks to, used in metrics
+    instance = "default"
+
+    def __init__(self, configuration=None, *args, **kwargs):
+        if configuration is None:
+            configuration = client.Configuration.get_default_copy()
+        http_pool.configure(configuration)
+        super().__init__(configuration, *args, **kwargs)
+        self.rest_client = rest.RESTClientObject(
+            configuration, pools_size=OPERATOR_HTTP_POOL_SIZE
+        )
+        self.rate_limiter = airflow_rate_limiter
+        self.in_flight = airflow_in_flight
+
+    def api_host(self):
+        """Return the base URL, including the API path, requests are sent to."""
+        return self.configuration.host
+
+    def auth_refresh_needed(self):
+        """Return True if `auth_headers` has to perform blocking network I/O."""
+        return False
+
+    def auth_headers(self):
+        """Return the headers authenticating a request to the Airflow API."""
+        headers = {"Content-Type": "application/json"}
+        if self.configuration.access_token:
+            headers["Authorization"] = f"Bearer {self.configuration.access_token}"
+        for setting in self.configuration.auth_settings().values():
+            if setting["in"] == "header":
+                headers[setting["key"]] = setting["value"]
+        return headers
+
+    def send_json(self, method, path, body=None):
+        """Send a JSON request without the generated model classes.
+
+        The generated API methods check every attribute of a model against
+        the OpenAPI schema and deserialize the response into models again.
+        Writes only need to know whether they succeeded, so `body` is sent as
+        is and the response body is discarded unread.
+
+        Args:
+            method: HTTP method.
+            path: Path below the API base URL, e.g. "/pools/my_pool".
+            body: JSON-serializable request body.
+
+        Returns:
+            The HTTP status code.
+
+        Raises:
+            ApiException: If Airflow answers with a non-2xx status.
+        """
+        response = self._call_json(method, path, body)
+        # Return the connection to the pool without reading the body
+        response.drain_conn()
+        response.release_conn()
+        return response.status
+
+    def request_json(self, method, path, body=None):
+        """Like `send_json`, but return the decoded JSON response, if any."""
+        response = self._call_json(method, path, body)
+        try:
+            data = response.data
+        finally:
+            response.release_conn()
+        return json.loads(data) if data else None
+
+    def _call_json(self, method, path, body):
+        try:
+            return self.call_api(
+                path,
+                method,
+                header_params={
+                    "Accept": "application/json",
+                    "Content-Type": "application/json",
+                },
+                body=body,
+                auth_settings=AUTH_SETTINGS,
+                _return_http_data_only=True,
+                _preload_content=False,
+            )
+        except ApiException as e:
+            raise redact_error(e, body)
+
+    def call_api(self, *args, _request_timeout=None, **kwargs):
+        if _request_timeout is None:
+            _request_timeout = http_pool.request_timeout()
+        try:
+            return super().call_api(*args, _request_timeout=_request_timeout, **kwargs)
+        finally:
+            http_pool.record_pool_usage(
+                "airflow" if self.instance == "default" else f"airflow:{self.instance}",
+                self.rest_client.pool_manager,
+            )
+
+    def request(self, method, url, *args, **kwargs):
+        self.rate_limiter.acquire()
+        path = urlsplit(url).path.removeprefix(urlsplit(self.api_host()).path)
+        try:
+            with self.in_flight:
+                start_time = time.time()
+                response = super().request(method, url, *args, **kwargs)
+        except ApiException as e:
+            record_api_call(method, path, e.status, time.time() - start_time, e)
+            self.rate_limiter.record(e.status, (e.headers or {}).get("Retry-After"))
+            raise
+        except Exception as e:
+            record_api_call(method, path, None, time.time() - start_time, e)
+            raise
+        record_api_call(method, path, response.status, time.time() - start_time)
+        self.rate_limiter.record(response.status)
+        return response
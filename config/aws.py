@@ -1,3 +1,4 @@
+import functools
 import logging
 import os
 import time
@@ -6,8 +7,11 @@ import airflow_client.client as client
 import boto3
 import requests
 
+from config import http_pool
+from config.api_client import AirflowApiClient
 from config.base import AIRFLOW_API_BASE_URL
 from config.metrics import AUTH_FAILURES
+from config.token_refresh import TokenRefresher
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +19,18 @@ AWS_REGION = os.getenv("AWS_REGION")
 MWAA_ENV_NAME = os.getenv("MWAA_ENV_NAME")
 MWAA_LOGIN_PATH = os.getenv("MWAA_LOGIN_PATH", "/pluginsv2/aws_mwaa/login")
 
-if not AWS_REGION or not MWAA_ENV_NAME:
-    raise RuntimeError(
-        "AWS_REGION and MWAA_ENV_NAME must be set when USE_AWS_AUTH is enabled"
-    )
+# Keep the TLS connection to the MWAA web server open between token refreshes
+mwaa_session = http_pool.requests_session()
+
+
+@functools.cache
+def mwaa_client(region):
+    """Return the MWAA client for `region`, creating it on first use.
+
+    boto3 clients are thread-safe, and building one resolves credentials and
+    loads service models, so it is done once instead of on every refresh.
+    """
+    return boto3.client("mwaa", region_name=region)
 
 
 def get_token_info(region, env_name, login_path):
@@ -33,9 +45,8 @@ def get_token_info(region, env_name, login_path):
         Tuple of (hostname, session_token, expires_in_seconds) or None on failure.
     """
     try:
-        # Initialize MWAA client and request a web login token
-        mwaa = boto3.client("mwaa", region_name=region)
-        response = mwaa.create_web_login_token(Name=env_name)
+        # Request a web login token from the cached MWAA client
+        response = mwaa_client(region).create_web_login_token(Name=env_name)
         # Extract the web server hostname, login token, and expiration time
         web_server_host_name = response["WebServerHostname"]
         web_token = response["WebToken"]
@@ -46,7 +57,12 @@ def get_token_info(region, env_name, login_path):
         login_url = f"https://{web_server_host_name}{login_path}"
         login_payload = {"token": web_token}
         # Make a POST request to the MWAA login url using the login payload
-        response = requests.post(login_url, data=login_payload, timeout=10)
+        response = mwaa_session.post(
+            login_url, data=login_payload, timeout=http_pool.request_timeout()
+        )
+        http_pool.record_pool_usage(
+            "mwaa_login", mwaa_session.get_adapter(login_url).poolmanager
+        )
         # Check if login was successful
         if response.status_code == 200:
             # Safely retrieve the session cookie
@@ -76,11 +92,13 @@ def get_token_info(region, env_name, login_path):
         return None
 
 
-class AWSAuthApiClient(client.ApiClient):
+class AWSAuthApiClient(AirflowApiClient):
     """API client with MWAA token caching and refresh logic.
 
-    Implements token caching to avoid unnecessary MWAA API calls.
-    Tokens are refreshed only when they are within a grace period of expiration.
+    Tokens are obtained by a single-flight `TokenRefresher`: concurrent
+    requests near expiry share one refresh, and a background thread renews the
+    token before it enters the grace period, so requests normally never wait
+    for the MWAA login round trip.
     """
 
     # Grace period (in seconds) before token expiration to refresh proactively
@@ -92,18 +110,45 @@ class AWSAuthApiClient(client.ApiClient):
         self._env_name = env_name
         self._login_path = login_path
         self._credentials = credentials  # (hostname, token, expires_in) or None
-        self._token_expires_at = None  # Unix timestamp of token expiration
+        self._refresher = TokenRefresher(
+            "aws", self._refresh_token, grace=self.TOKEN_REFRESH_GRACE
+        )
+
+    def _refresh_token(self):
+        refreshed = get_token_info(self._region, self._env_name, self._login_path)
+        if not refreshed:
+            logger.error("Failed to refresh MWAA session token")
+            AUTH_FAILURES.labels(auth_type="aws").inc()
+            raise RuntimeError(
+                "MWAA authentication failed; cannot obtain session token"
+            )
+        # Update cached credentials; expires_in is in seconds
+        self._credentials = refreshed
+        return time.time() + refreshed[2]
 
     def _needs_token_refresh(self):
         """Check if the cached token is expired or near expiration.
 
         Returns True if the token is missing, expired, or within the grace period.
         """
-        if not self._credentials or self._token_expires_at is None:
-            return True
-        # Refresh if within grace period of expiration
-        time_until_expiry = self._token_expires_at - time.time()
-        return time_until_expiry <= self.TOKEN_REFRESH_GRACE
+        return not self._credentials or self._refresher.needs_refresh()
+
+    def auth_refresh_needed(self):
+        return self._needs_token_refresh()
+
+    def auth_headers(self):
+        # Refresh MWAA session token only if necessary (expired or near expiration)
+        self._refresher.ensure_fresh()
+        return {
+            "Authorization": f"Bearer {self._credentials[1]}",
+            "Content-Type": "application/json",
+        }
+
+    def api_host(self):
+        # The web server hostname is only known once a token has been obtained
+        if not self._credentials:
+            self.auth_headers()
+        return f"{self._credentials[0].rstrip('/')}{self.configuration.host}"
 
     def call_api(
         self,
@@ -125,28 +170,13 @@ class AWSAuthApiClient(client.ApiClient):
         _host=None,
         _check_type=None,
     ):
-        # Refresh MWAA session token only if necessary (expired or near expiration)
-        if self._needs_token_refresh():
-            refreshed = get_token_info(self._region, self._env_name, self._login_path)
-            if not refreshed:
-                logger.error("Failed to refresh MWAA session token")
-                AUTH_FAILURES.labels(auth_type="aws").inc()
-                raise RuntimeError(
-                    "MWAA authentication failed; cannot obtain session token"
-                )
-            # Update cached credentials and expiration time
-            self._credentials = refreshed
-            # expires_in is in seconds, compute absolute expiration time
-            self._token_expires_at = time.time() + refreshed[2]
-
         # Set the authorization header
         if header_params is None:
             header_params = {}
-        header_params["Authorization"] = f"Bearer {self._credentials[1]}"
-        header_params["Content-Type"] = "application/json"
+        header_params.update(self.auth_headers())
 
         # Ensure the call targets the correct host + API base path
-        host = f"{self._credentials[0].rstrip('/')}{AIRFLOW_API_BASE_URL}"
+        host = self.api_host()
 
         return super().call_api(
             resource_path,
@@ -169,11 +199,20 @@ class AWSAuthApiClient(client.ApiClient):
         )
 
 
-# Defer MWAA token acquisition until the first API call to avoid import-time failures.
-credentials = None
-
-# Configuration host will be overridden per call via the `_host` parameter in `call_api`.
-configuration = client.Configuration(host=AIRFLOW_API_BASE_URL)
-aws_api_client = AWSAuthApiClient(
-    configuration, AWS_REGION, MWAA_ENV_NAME, MWAA_LOGIN_PATH, credentials
-)
+def create_api_client(
+    region=AWS_REGION,
+    env_name=MWAA_ENV_NAME,
+    login_path=MWAA_LOGIN_PATH,
+    api_base_url=AIRFLOW_API_BASE_URL,
+):
+    if not region or not env_name:
+        raise RuntimeError(
+            "AWS_REGION and MWAA_ENV_NAME must be set when USE_AWS_AUTH is enabled"
+        )
+    # Defer MWAA token acquisition until the first API call to avoid
+    # import-time failures. The configuration only holds the API base path;
+    # the web server hostname is prepended per call via `_host` in `call_api`.
+    configuration = client.Configuration(host=api_base_url)
+    return AWSAuthApiClient(
+        configuration, region, env_name, login_path, credentials=None
+    )
@@ -1,5 +1,6 @@
 import logging
 import os
+import socket
 
 logger = logging.getLogger(__name__)
 
@@ -10,6 +11,132 @@ OPERATOR_RECONCILE_INTERVAL = int(
 OPERATOR_RECONCILE_INTERVAL_DELAY = int(
     os.getenv("OPERATOR_RECONCILE_INTERVAL_DELAY", "10")
 )  # default to 10 seconds
+OPERATOR_DRIFT_MODE = os.getenv(
+    "OPERATOR_DRIFT_MODE", "correct"
+).lower()  # "correct" writes drifted objects back, "detect" only reports drift
+OPERATOR_WARM_SYNC_RATE = float(
+    os.getenv("OPERATOR_WARM_SYNC_RATE", "5")
+)  # Airflow writes per second during the first cycle after startup
+OPERATOR_WARM_SYNC_BURST = int(
+    os.getenv("OPERATOR_WARM_SYNC_BURST", "10")
+)  # writes allowed back to back before the warm-sync rate applies
+OPERATOR_AIRFLOW_RATE_LIMIT = float(
+    os.getenv("OPERATOR_AIRFLOW_RATE_LIMIT", "20")
+)  # Airflow API requests per second, 0 disables rate limiting
+OPERATOR_AIRFLOW_RATE_BURST = int(
+    os.getenv("OPERATOR_AIRFLOW_RATE_BURST", "40")
+)  # Airflow API requests allowed back to back
+OPERATOR_AIRFLOW_RATE_MIN = float(
+    os.getenv("OPERATOR_AIRFLOW_RATE_MIN", "1")
+)  # lowest request rate adaptive backoff may reach
+OPERATOR_AIRFLOW_RATE_INCREASE = float(
+    os.getenv("OPERATOR_AIRFLOW_RATE_INCREASE", "1")
+)  # requests per second regained for each second without throttling
+OPERATOR_AUTH_STARTUP_TIMEOUT = float(
+    os.getenv("OPERATOR_AUTH_STARTUP_TIMEOUT", "10")
+)  # seconds to wait for Airflow credentials at startup
+OPERATOR_CROSS_NAMESPACE_INSTANCES = (
+    os.getenv("OPERATOR_CROSS_NAMESPACE_INSTANCES", "false").lower() == "true"
+)  # let resources reference AirflowInstances of other namespaces
+OPERATOR_LIST_PAGE_SIZE = int(
+    os.getenv("OPERATOR_LIST_PAGE_SIZE", "100")
+)  # page size for Airflow list endpoints, Airflow caps it at 100 by default
+OPERATOR_FINGERPRINT_TTL = int(
+    os.getenv("OPERATOR_FINGERPRINT_TTL", "86400")
+)  # default to 1 day before an unchanged object is pushed again
+OPERATOR_HTTP_POOL_SIZE = int(
+    os.getenv("OPERATOR_HTTP_POOL_SIZE", "4")
+)  # number of hosts to keep connection pools for
+OPERATOR_HTTP_POOL_MAXSIZE = int(
+    os.getenv("OPERATOR_HTTP_POOL_MAXSIZE", "32")
+)  # maximum open connections per host
+OPERATOR_HTTP_KEEPALIVE = int(
+    os.getenv("OPERATOR_HTTP_KEEPALIVE", "60")
+)  # seconds an idle connection is kept alive, 0 disables keep-alive probes
+OPERATOR_HTTP_RETRIES = int(
+    os.getenv("OPERATOR_HTTP_RETRIES", "3")
+)  # retries for connection errors and 502/504 on idempotent requests
+OPERATOR_HTTP_CONNECT_TIMEOUT = float(
+    os.getenv("OPERATOR_HTTP_CONNECT_TIMEOUT", "5")
+)  # default to 5 seconds
+OPERATOR_HTTP_READ_TIMEOUT = float(
+    os.getenv("OPERATOR_HTTP_READ_TIMEOUT", "30")
+)  # default to 30 seconds
+OPERATOR_SHARDING = (
+    os.getenv("OPERATOR_SHARDING", "false").lower() == "true"
+)  # split custom resources between replicas instead of running one replica
+OPERATOR_SHARD_GROUP = os.getenv(
+    "OPERATOR_SHARD_GROUP", "airflow-k8s-operator"
+)  # replicas with the same group share the custom resources
+OPERATOR_SHARD_NAMESPACE = os.getenv(
+    "OPERATOR_SHARD_NAMESPACE", os.getenv("POD_NAMESPACE", "default")
+)  # namespace of the shard Leases, normally the operator's own
+OPERATOR_SHARD_IDENTITY = os.getenv(
+    "OPERATOR_SHARD_IDENTITY", os.getenv("POD_NAME") or socket.gethostname()
+)  # unique name of this replica
+OPERATOR_SHARD_LEASE_DURATION = int(
+    os.getenv("OPERATOR_SHARD_LEASE_DURATION", "15")
+)  # seconds without renewal after which a replica counts as gone
+OPERATOR_SHARD_RENEW_INTERVAL = int(
+    os.getenv("OPERATOR_SHARD_RENEW_INTERVAL", "5")
+)  # seconds between Lease renewals
+OPERATOR_MAX_INFLIGHT_REQUESTS = int(
+    os.getenv("OPERATOR_MAX_INFLIGHT_REQUESTS", "32")
+)  # maximum concurrent Airflow API requests from async handlers
+OPERATOR_LOG_SAMPLE_INTERVAL = float(
+    os.getenv("OPERATOR_LOG_SAMPLE_INTERVAL", "300")
+)  # seconds a repeated message about one object is suppressed after it was logged
+OPERATOR_LOG_QUEUE_SIZE = int(
+    os.getenv("OPERATOR_LOG_QUEUE_SIZE", "10000")
+)  # log records waiting for the writer thread; further records are dropped
+OPERATOR_EVENT_LEVEL = os.getenv(
+    "OPERATOR_EVENT_LEVEL", "WARNING"
+).upper()  # lowest level of handler log messages posted as Kubernetes Events
+OPERATOR_WORKERS = int(
+    os.getenv("OPERATOR_WORKERS", "4")
+)  # threads reconciling queued custom resources
+OPERATOR_ORPHAN_GC = os.getenv(
+    "OPERATOR_ORPHAN_GC", "disabled"
+).lower()  # "enabled" deletes orphaned Airflow objects, "dry-run" only reports them
+OPERATOR_OWNER_ID = os.getenv(
+    "OPERATOR_OWNER_ID", "airflow-k8s-operator"
+)  # operators sharing an Airflow instance need different ids
+OPERATOR_OWNER_NAMESPACE = os.getenv(
+    "OPERATOR_OWNER_NAMESPACE", os.getenv("POD_NAMESPACE", "default")
+)  # namespace of the ConfigMap listing the Airflow objects the operator owns
+OPERATOR_ORPHAN_GC_INTERVAL = int(
+    os.getenv("OPERATOR_ORPHAN_GC_INTERVAL", "3600")
+)  # seconds between garbage collection passes
+OPERATOR_ORPHAN_GC_RATE = float(
+    os.getenv("OPERATOR_ORPHAN_GC_RATE", "2")
+)  # orphan deletes per second
+OPERATOR_ORPHAN_GC_BATCH_SIZE = int(
+    os.getenv("OPERATOR_ORPHAN_GC_BATCH_SIZE", "10")
+)  # orphans deleted back to back before the rate applies
+OPERATOR_ORPHAN_GC_MAX_DELETES = int(
+    os.getenv("OPERATOR_ORPHAN_GC_MAX_DELETES", "10")
+)  # a collection with more orphans is only reported, as a safety net
+OPERATOR_SECRET_CACHE_MAX_ENTRIES = int(
+    os.getenv("OPERATOR_SECRET_CACHE_MAX_ENTRIES", "1000")
+)  # maximum number of Secrets kept in memory
+OPERATOR_BULK_WRITES = (
+    os.getenv("OPERATOR_BULK_WRITES", "auto").lower()
+)  # "auto" groups writes to the Airflow API v2 into bulk requests, "disabled" never
+OPERATOR_BULK_BATCH_SIZE = int(
+    os.getenv("OPERATOR_BULK_BATCH_SIZE", "100")
+)  # objects written per bulk request
+OPERATOR_BULK_LINGER = float(
+    os.getenv("OPERATOR_BULK_LINGER", "0.05")
+)  # seconds a write waits for others to share its bulk request
+OPERATOR_BULK_WRITE_TIMEOUT = float(
+    os.getenv("OPERATOR_BULK_WRITE_TIMEOUT", "120")
+)  # seconds a blocking write waits for the answer to its bulk request
+OPERATOR_SET_BATCH_SIZE = int(
+    os.getenv("OPERATOR_SET_BATCH_SIZE", "50")
+)  # entries of a set written concurrently by one batch
+OPERATOR_STATUS_COALESCE_WINDOW = float(
+    os.getenv("OPERATOR_STATUS_COALESCE_WINDOW", "2")
+)  # seconds status updates of one object are merged before they are written
 AIRFLOW_API_BASE_URL = os.getenv(
     "AIRFLOW_API_BASE_URL", "/api/v1"
 )  # for airflow api v1 compatibility, airflow v2.
@@ -20,5 +147,5 @@ if not AIRFLOW_HOST:
 if not AIRFLOW_HOST.endswith(AIRFLOW_API_BASE_URL):
     AIRFLOW_HOST = AIRFLOW_HOST.rstrip("/") + AIRFLOW_API_BASE_URL
     logger.debug(
-        f"Appending AIRFLOW_API_BASE_URL to AIRFLOW_HOST. Using: {AIRFLOW_HOST}"
+        "Appending AIRFLOW_API_BASE_URL to AIRFLOW_HOST. Using: %s", AIRFLOW_HOST
     )
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import re
+import threading
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+
+from config.base import (
+    OPERATOR_BULK_BATCH_SIZE,
+    OPERATOR_BULK_LINGER,
+    OPERATOR_BULK_WRITE_TIMEOUT,
+    OPERATOR_BULK_WRITES,
+)
+from config.metrics import BULK_WRITE_ENTITIES
+from config.ownership import written_objects
+
+logger = logging.getLogger(__name__)
+
+
+BULK_AUTO = "auto"
+BULK_DISABLED = "disabled"
+# First version of the Airflow REST API with bulk endpoints (Airflow 3)
+BULK_API_VERSION = 2
+
+_API_VERSION = re.compile(r"/api/v(\d+)/?$")
+
+
+def api_version(api_host):
+    """Return the major version of the Airflow REST API at a base URL.
+
+    URLs without a versioned API path are taken to be the stable API v1.
+    """
+    match = _API_VERSION.search(api_host or "")
+    return int(match.group(1)) if match else 1
+
+
+class BulkWriteError(Exception):
+    """An object of a bulk request was not written.
+
+    Attributes:
+        object_id: Id of the object.
+        status: HTTP status Airflow reported for the failed action, if any.
+    """
+
+    def __init__(self, object_id, message, status=None):
+        super().__init__(f"{object_id}: {message}")
+        self.object_id = object_id
+        self.status = status
+
+
+@dataclass
+class _Batch:
+    # object id -> payload to create or overwrite
+    upserts: dict = field(default_factory=dict)
+    deletes: set = field(default_factory=set)
+    # object id -> futures of the writes waiting for it
+    futures: dict = field(default_factory=dict)
+
+    def add(self, object_id, payload, future):
+        # The last write of an object within a batch wins
+        self.upserts.pop(object_id, None)
+        self.deletes.discard(object_id)
+        if payload is None:
+            self.deletes.add(object_id)
+        else:
+            self.upserts[object_id] = payload
+        self.futures.setdefault(object_id, []).append(future)
+
+    def __len__(self):
+        return len(self.futures)
+
+
+def _resolve(future, error=None):
+    # A caller may have given up on its write, e.g. a cancelled coroutine;
+    # that must not keep the other writes of the batch from resolving
+    if future.done():
+        return
+    try:
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
+    except InvalidStateError:
+        pass
+
+
+def _error_message(error):
+    if isinstance(error, dict):
+        message = error.get("error") or error.get("detail") or error
+        status = error.get("status_code")
+        return (f"{status} {message}" if status else str(message)), status
+    return str(error), None
+
+
+class BulkWriter:
+    """Group the writes to one Airflow instance into bulk requests.
+
+    The Airflow API v2 takes create, update and delete actions for many
+    objects of a collection in one PATCH request. Writes wait up to `linger`
+    seconds for others of the same collection, then up to `batch_size` of
+    them are sent together. Objects are created with `overwrite`, so a write
+    does not need to know whether the object exists, and deleted with
+    `skip`, so objects that are already gone count as deleted.
+
+    Each write returns a `concurrent.futures.Future`, so threads can wait on
+    it and coroutines can await it with `asyncio.wrap_future`. It resolves
+    once the bulk request was answered, or raises `BulkWriteError` if Airflow
+    reported the object's action as failed.
+
+    Args:
+        api_client: `AirflowApiClient` of the instance.
+        batch_size: Maximum number of objects per request.
+        linger: Seconds to wait for more writes before sending a batch.
+        timeout: Seconds `write` waits for the answer to a bulk request.
+    """
+
+    def __init__(
+        self,
+        api_client,
+        batch_size=OPERATOR_BULK_BATCH_SIZE,
+        linger=OPERATOR_BULK_LINGER,
+        timeout=OPERATOR_BULK_WRITE_TIMEOUT,
+    ):
+        self._api_client = api_client
+        self.batch_size = batch_size
+        self.linger = linger
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # collection -> batch collecting writes
+        self._batches = {}
+
+    @classmethod
+    def for_client(cls, api_client, api_url, mode=OPERATOR_BULK_WRITES):
+        """Return a writer if the instance speaks an API with bulk endpoints.
+
+        The version is read from the configured `api_url` rather than from the
+        client, which may need a token exchange to know its host.
+        """
+        if mode == BULK_DISABLED:
+            return None
+        if api_version(api_url) < BULK_API_VERSION:
+            return None
+        return cls(api_client)
+
+    def upsert(self, collection, object_id, payload):
+        """Create or overwrite an object. Returns a `Future`."""
+        return self._add(collection, object_id, payload)
+
+    def delete(self, collection, object_id):
+        """Delete an object unless it is already gone. Returns a `Future`."""
+        return self._add(collection, object_id, None)
+
+    def write(self, collection, object_id, payload):
+        """Create or overwrite an object and wait for the bulk request.
+
+        Raises:
+            BulkWriteError: If Airflow rejected the object.
+            TimeoutError: If no answer arrived within `timeout` seconds.
+        """
+        return self.upsert(collection, object_id, payload).result(self.timeout)
+
+    def _add(self, collection, object_id, payload):
+        future = Future()
+        with self._lock:
+            batch = self._batches.get(collection)
+            if batch is None:
+                batch = self._batches[collection] = _Batch()
+                timer = threading.Timer(self.linger, self._flush, (collection, batch))
+                timer.daemon = True
+                timer.start()
+            batch.add(str(object_id), payload, future)
+            full = len(batch) >= self.batch_size
+            if full:
+                del self._batches[collection]
+        if full:
+            threading.Thread(
+                target=self._send,
+                args=(collection, batch),
+                name="bulk-writer",
+                daemon=True,
+            ).start()
+        return future
+
+    def _flush(self, collection, batch):
+        with self._lock:
+            if self._batches.get(collection) is not batch:
+                # Already sent when it filled up
+                return
+            del self._batches[collection]
+        self._send(collection, batch)
+
+    def _send(self, collection, batch):
+        try:
+            errors = self._write_batch(collection, batch)
+        except Exception as e:
+            errors = dict.fromkeys(batch.futures, e)
+        for object_id, futures in batch.futures.items():
+            for future in futures:
+                _resolve(future, errors.get(object_id))
+
+    def _write_batch(self, collection, batch):
+        """Send one bulk request. Returns the errors of failed objects by id."""
+        actions = []
+        if batch.upserts:
+            actions.append(
+                {
+                    "action": "create",
+                    "action_on_existence": "overwrite",
+                    "entities": list(batch.upserts.values()),
+                }
+            )
+        if batch.deletes:
+            actions.append(
+                {
+                    "action": "delete",
+                    "action_on_non_existence": "skip",
+                    "entities": sorted(batch.deletes),
+                }
+            )
+        BULK_WRITE_ENTITIES.labels(collection=collection).observe(len(batch))
+        results = (
+            self._api_client.request_json(
+                "PATCH", f"/{collection}", {"actions": actions}
+            )
+            or {}
+        )
+
+        errors = {}
+        for action, object_ids in (
+            ("create", batch.upserts),
+            ("delete", batch.deletes),
+        ):
+            result = results.get(action) or {}
+            # Airflow lists the ids written, but not which id an error is
+            # about; without errors, skipped deletes are successes too
+            if not result.get("errors"):
+                continue
+            messages = [_error_message(error) for error in result["errors"]]
+            message = "; ".join(text for text, _ in messages)
+            status = messages[0][1] if len(messages) == 1 else None
+            succeeded = {str(object_id) for object_id in result.get("success") or []}
+            for object_id in object_ids:
+                if object_id not in succeeded:
+                    errors[object_id] = BulkWriteError(object_id, message, status)
+        if errors:
+            logger.warning(
+                "Bulk write of %s %s to Airflow failed for %s",
+                len(batch),
+                collection,
+                ", ".join(sorted(errors)),
+            )
+        return errors
+
+
+async def create_object(target, collection, object_id, payload):
+    """Create an Airflow object, as part of a bulk request if the API has them."""
+    if target.bulk is not None:
+        result = await asyncio.wrap_future(
+            target.bulk.upsert(collection, object_id, payload)
+        )
+    else:
+        result = await target.aio_client.post(collection, payload)
+    written_objects.record(target.name, collection, object_id)
+    return result
+
+
+async def delete_object(target, collection, object_id):
+    """Delete an Airflow object, as part of a bulk request if the API has them.
+
+    Bulk requests skip objects that are already gone instead of failing
+    with a 404.
+    """
+    if target.bulk is not None:
+        return await asyncio.wrap_future(target.bulk.delete(collection, object_id))
+    return await target.aio_client.delete(collection, object_id)
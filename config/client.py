@@ -1,8 +1,10 @@
+import importlib
 import logging
 import os
 
 import airflow_client.client as client
 
+from config.api_client import AirflowApiClient
 from config.base import AIRFLOW_HOST
 
 logger = logging.getLogger(__name__)
@@ -14,32 +16,99 @@ AIRFLOW_ACCESS_TOKEN = os.getenv("AIRFLOW_ACCESS_TOKEN")
 # Check if we should use Google Cloud authentication (for Cloud Composer)
 USE_GOOGLE_AUTH = os.getenv("USE_GOOGLE_AUTH")
 USE_AWS_AUTH = os.getenv("USE_AWS_AUTH")
+AIRFLOW_AUTH_BACKEND = os.getenv(
+    "AIRFLOW_AUTH_BACKEND"
+)  # backend name or "module:factory"; overrides the USE_* flags
 
-if USE_GOOGLE_AUTH is not None and USE_GOOGLE_AUTH.lower() in ["true"]:
-    from config.gcp import gcp_api_client
 
-    api_client = gcp_api_client
-elif USE_AWS_AUTH is not None and USE_AWS_AUTH.lower() in ["true"]:
-    from config.aws import aws_api_client
-
-    api_client = aws_api_client
-elif AIRFLOW_USERNAME and AIRFLOW_PASSWORD:
+def create_basic_api_client(
+    host=AIRFLOW_HOST, username=AIRFLOW_USERNAME, password=AIRFLOW_PASSWORD
+):
     configuration = client.Configuration(
-        host=AIRFLOW_HOST, username=AIRFLOW_USERNAME, password=AIRFLOW_PASSWORD
+        host=host, username=username, password=password
     )
-    api_client = client.ApiClient(configuration=configuration)
-elif AIRFLOW_ACCESS_TOKEN:
+    return AirflowApiClient(configuration=configuration)
+
+
+def create_token_api_client(host=AIRFLOW_HOST, access_token=AIRFLOW_ACCESS_TOKEN):
     configuration = client.Configuration(
-        host=AIRFLOW_HOST,
-        access_token=AIRFLOW_ACCESS_TOKEN,
+        host=host,
+        access_token=access_token,
     )
-    api_client = client.ApiClient(configuration=configuration)
-else:
+    api_client = AirflowApiClient(configuration=configuration)
+    # The generated client only applies basic auth settings on its own
+    api_client.set_default_header("Authorization", f"Bearer {access_token}")
+    return api_client
+
+
+# Authentication backends by name. Cloud backends are given as
+# "module:factory" and imported only when selected, so their SDKs are neither
+# loaded nor required otherwise. Factories must not perform network I/O;
+# credentials are obtained on the first request. Called without arguments they
+# configure the default instance from the environment; keyword arguments
+# override those settings for other Airflow instances.
+AUTH_BACKENDS = {
+    "google": "config.gcp:create_api_client",
+    "aws": "config.aws:create_api_client",
+    "basic": create_basic_api_client,
+    "token": create_token_api_client,
+}
+
+# Optional dependency group providing each cloud backend's SDK
+AUTH_BACKEND_EXTRAS = {"google": "gcp", "aws": "aws"}
+
+
+def selected_auth_backend():
+    """Return the name of the configured authentication backend."""
+    if AIRFLOW_AUTH_BACKEND:
+        return AIRFLOW_AUTH_BACKEND
+    if USE_GOOGLE_AUTH is not None and USE_GOOGLE_AUTH.lower() in ["true"]:
+        return "google"
+    if USE_AWS_AUTH is not None and USE_AWS_AUTH.lower() in ["true"]:
+        return "aws"
+    if AIRFLOW_USERNAME and AIRFLOW_PASSWORD:
+        return "basic"
+    if AIRFLOW_ACCESS_TOKEN:
+        return "token"
     raise RuntimeError(
         "Airflow client authentication is not configured.\n\n"
         + "Configure at least one of the following options:\n"
         + "- Set USE_GOOGLE_AUTH=true for Google Cloud authentication, or\n"
         + "- Set USE_AWS_AUTH=true for AWS authentication, or\n"
         + "- Set AIRFLOW_USERNAME and AIRFLOW_PASSWORD for basic authentication, or\n"
-        + "- Set AIRFLOW_ACCESS_TOKEN for token-based authentication."
+        + "- Set AIRFLOW_ACCESS_TOKEN for token-based authentication, or\n"
+        + "- Set AIRFLOW_AUTH_BACKEND to a backend name or a module:factory path."
     )
+
+
+def load_auth_backend(name, **settings):
+    """Create the API client of an authentication backend.
+
+    Args:
+        name: A key of `AUTH_BACKENDS`, or a "module:factory" path to a
+            custom factory returning an `AirflowApiClient`.
+        **settings: Keyword arguments passed on to the factory.
+    """
+    factory = AUTH_BACKENDS.get(name, name)
+    if callable(factory):
+        return factory(**settings)
+
+    module_name, _, factory_name = factory.partition(":")
+    if not module_name or not factory_name:
+        raise RuntimeError(
+            f"Unknown Airflow auth backend '{name}'. Use one of "
+            f"{', '.join(sorted(AUTH_BACKENDS))} or a module:factory path."
+        )
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        extra = AUTH_BACKEND_EXTRAS.get(name)
+        hint = f" Install the '{extra}' extra of airflow-operator." if extra else ""
+        raise RuntimeError(
+            f"Airflow auth backend '{name}' is not available: {e}.{hint}"
+        ) from e
+    logger.debug("Using Airflow auth backend %s", name)
+    return getattr(module, factory_name)(**settings)
+
+
+api_client = load_auth_backend(selected_auth_backend())
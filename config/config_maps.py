@@ -0,0 +1,71 @@
+import threading
+
+from kubernetes import client
+
+from config.secret_refs import SecretRefIndex
+
+
+class ConfigMapCache:
+    """Thread-safe cache of the data of the ConfigMaps that sets read.
+
+    A ConfigMap is read from the apiserver on its first lookup only. The
+    ConfigMap watch stream afterwards calls `update` and `remove`, so set
+    expansions in handlers, reconciliation cycles and garbage collection
+    passes never reach the apiserver again. Only ConfigMaps referenced in
+    `refs` are kept.
+
+    Args:
+        refs: `SecretRefIndex` of the ConfigMaps the sets reference.
+        api: Optional `CoreV1Api`; created on first use.
+    """
+
+    def __init__(self, refs, api=None):
+        self._refs = refs
+        self._api = api
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, namespace, name):
+        """Return the data of a ConfigMap.
+
+        Raises:
+            kubernetes.client.exceptions.ApiException: If the ConfigMap is not
+                cached and cannot be read.
+        """
+        with self._lock:
+            data = self._entries.get((namespace, name))
+        if data is not None:
+            return data
+        if self._api is None:
+            self._api = client.CoreV1Api()
+        config_map = self._api.read_namespaced_config_map(name, namespace)
+        data = dict(config_map.data or {})
+        if self._refs.is_referenced(namespace, name):
+            with self._lock:
+                # Data the watch stored meanwhile is newer
+                data = self._entries.setdefault((namespace, name), data)
+        return data
+
+    def update(self, namespace, name, data):
+        """Store the data of a ConfigMap from the watch stream.
+
+        Returns the previously cached data, or None if it was not cached.
+        """
+        with self._lock:
+            previous = self._entries.pop((namespace, name), None)
+            if self._refs.is_referenced(namespace, name):
+                self._entries[(namespace, name)] = dict(data or {})
+        return previous
+
+    def remove(self, namespace, name):
+        with self._lock:
+            self._entries.pop((namespace, name), None)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+
+# ConfigMaps sets read whole, keyed like Secrets with the key None
+config_map_ref_index = SecretRefIndex()
+config_map_cache = ConfigMapCache(config_map_ref_index)
@@ -0,0 +1,93 @@
+import datetime
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from config.base import OPERATOR_FINGERPRINT_TTL
+
+logger = logging.getLogger(__name__)
+
+CRD_GROUP = "airflow.drfaust92"
+CRD_VERSION = "v1beta1"
+STATUS_FIELD = "fingerprint"
+
+
+def fingerprint(payload):
+    """Return a stable hash of a fully resolved Airflow payload.
+
+    Only the digest is ever stored, so resolved secret values never end up in
+    memory caches or in the custom resource status.
+    """
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def _to_timestamp(value):
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class FingerprintStore:
+    """In-memory map of (namespace, name) to the last pushed payload fingerprint.
+
+    Entries are persisted to `status.fingerprint` of the custom resource so the
+    store can be re-seeded from the watch stream after an operator restart.
+
+    Args:
+        ttl: Seconds a verified fingerprint stays fresh. After that the object
+            is written again even if nothing changed, which also repairs
+            out-of-band edits of fields the Airflow API never returns.
+    """
+
+    def __init__(self, ttl=OPERATOR_FINGERPRINT_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, key, digest, verified_at=None):
+        """Store `digest` for `key` and return the status entry to persist."""
+        verified_at = time.time() if verified_at is None else verified_at
+        with self._lock:
+            self._entries[key] = (digest, verified_at)
+        return {
+            "hash": digest,
+            "verifiedAt": datetime.datetime.fromtimestamp(
+                verified_at, datetime.timezone.utc
+            ).isoformat(),
+        }
+
+    def seed(self, key, status_entry):
+        """Load a persisted status entry unless the key is already known."""
+        if not status_entry or not status_entry.get("hash"):
+            return
+        verified_at = _to_timestamp(status_entry.get("verifiedAt"))
+        if verified_at is None:
+            return
+        with self._lock:
+            self._entries.setdefault(key, (status_entry["hash"], verified_at))
+
+    def verified_at(self, key):
+        """Return when the fingerprint of `key` was last verified, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def matches(self, key, digest):
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and entry[0] == digest
+
+    def is_fresh(self, key, digest, now=None):
+        """Return True if `digest` was pushed for `key` within the TTL."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+        return entry is not None and entry[0] == digest and now - entry[1] < self.ttl
+
+    def forget(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,383 @@
+import json
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import quote
+
+from kubernetes import client
+
+from config import reconciler
+from config.base import (
+    OPERATOR_ORPHAN_GC,
+    OPERATOR_ORPHAN_GC_BATCH_SIZE,
+    OPERATOR_ORPHAN_GC_INTERVAL,
+    OPERATOR_ORPHAN_GC_MAX_DELETES,
+    OPERATOR_ORPHAN_GC_RATE,
+    OPERATOR_OWNER_ID,
+    OPERATOR_OWNER_NAMESPACE,
+)
+from config.instances import airflow_instances
+from config.metrics import ORPHAN_DELETES, ORPHANED_OBJECTS
+from config.ownership import written_objects
+from config.ratelimit import TokenBucket
+from config.sharding import shard_coordinator
+
+logger = logging.getLogger(__name__)
+
+
+GC_DISABLED = "disabled"
+GC_DRY_RUN = "dry-run"
+GC_ENABLED = "enabled"
+GC_MODES = (GC_DISABLED, GC_DRY_RUN, GC_ENABLED)
+# Orphans listed by id in the log of one pass
+MAX_LOGGED_ORPHANS = 10
+# Attempts to update the ledger while other replicas update it too
+MAX_LEDGER_CONFLICTS = 5
+
+
+def ledger_key(instance, collection):
+    # Namespaces and names cannot contain "_", so keys never collide
+    return f"{instance.replace('/', '_')}.{collection}"
+
+
+class OwnershipLedger:
+    """Ids of the Airflow objects this operator owns, kept in a ConfigMap.
+
+    Airflow objects carry no field the operator could mark them with without
+    changing what users see, so ownership is recorded on the Kubernetes side
+    instead. The ConfigMap `<owner>-owned-objects` has one key per instance
+    and collection, holding a JSON list of object ids.
+
+    Args:
+        owner: `OPERATOR_OWNER_ID`; operators sharing an Airflow instance
+            keep separate ledgers.
+        namespace: Namespace of the ConfigMap.
+        api: Optional `CoreV1Api`; created on first use.
+    """
+
+    def __init__(
+        self, owner=OPERATOR_OWNER_ID, namespace=OPERATOR_OWNER_NAMESPACE, api=None
+    ):
+        self.name = f"{owner}-owned-objects"
+        self.namespace = namespace
+        self._api = api
+
+    def _core_api(self):
+        if self._api is None:
+            self._api = client.CoreV1Api()
+        return self._api
+
+    def _read(self):
+        try:
+            return self._core_api().read_namespaced_config_map(
+                self.name, self.namespace
+            )
+        except client.exceptions.ApiException as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def owned(self, instance, collection):
+        """Return the ids of the owned objects of one collection."""
+        config_map = self._read()
+        data = (config_map.data if config_map is not None else None) or {}
+        return set(json.loads(data.get(ledger_key(instance, collection), "[]")))
+
+    def update(self, instance, collection, add=(), remove=()):
+        """Record objects as owned and forget others.
+
+        Replicas of a sharded operator update the ledger concurrently; the
+        ConfigMap is replaced only if it is unchanged since it was read.
+        """
+        key = ledger_key(instance, collection)
+        for _ in range(MAX_LEDGER_CONFLICTS):
+            config_map = self._read()
+            data = dict((config_map.data if config_map is not None else None) or {})
+            ids = (set(json.loads(data.get(key, "[]"))) | set(add)) - set(remove)
+            data[key] = json.dumps(sorted(ids))
+            metadata = {"name": self.name}
+            try:
+                if config_map is None:
+                    self._core_api().create_namespaced_config_map(
+                        self.namespace, {"metadata": metadata, "data": data}
+                    )
+                else:
+                    metadata["resourceVersion"] = config_map.metadata.resource_version
+                    self._core_api().replace_namespaced_config_map(
+                        self.name, self.namespace, {"metadata": metadata, "data": data}
+                    )
+                return
+            except client.exceptions.ApiException as e:
+                if e.status != 409:
+                    raise
+        raise RuntimeError(
+            f"ConfigMap {self.namespace}/{self.name} kept changing while updating it"
+        )
+
+
+class OrphanCollector:
+    """Delete Airflow objects this operator created whose custom resource is gone.
+
+    Delete handlers do not run for custom resources removed while the
+    operator is down, or whose finalizer was removed, so their objects would
+    stay in Airflow. A pass lists each Airflow collection once per instance.
+    Listed objects some indexed custom resource produces are recorded as
+    owned in the `OwnershipLedger`. Owned objects no custom resource
+    produces anymore are orphans. They are deleted through a token bucket,
+    `batch_size` back to back and then at `rate` per second.
+
+    The index is read after the listing: an object can only exist once the
+    watch event of its custom resource was indexed, so objects created during
+    a pass are never mistaken for orphans. Passes only start once the warm
+    sync has run over the initially listed resources, and the first pass
+    after startup only reports orphans, so a partly filled index cannot
+    delete anything.
+
+    Args:
+        mode: `disabled`, `dry-run` to only log and count orphans, or
+            `enabled` to delete them.
+        reconcilers: Dict of the registered `BulkReconciler`s, whose indexes
+            hold the custom resources.
+        instances: `InstanceRegistry` of the Airflow instances to collect.
+        shards: `ShardCoordinator`; each orphan is collected by one replica.
+        ledger: `OwnershipLedger` of the objects this operator owns.
+        synced: `threading.Event` set once the resource indexes are filled.
+        written: `WrittenObjects` the operator records its writes in.
+        rate: Deletes per second.
+        batch_size: Deletes allowed back to back.
+        max_deletes: Collections with more orphans than this are only
+            reported, so that an incomplete index cannot empty Airflow.
+
+    Raises:
+        ValueError: If `mode` is not one of `GC_MODES`.
+    """
+
+    def __init__(
+        self,
+        mode=OPERATOR_ORPHAN_GC,
+        reconcilers=reconciler.reconcilers,
+        instances=airflow_instances,
+        shards=shard_coordinator,
+        ledger=None,
+        synced=reconciler.warm_synced,
+        written=written_objects,
+        rate=OPERATOR_ORPHAN_GC_RATE,
+        batch_size=OPERATOR_ORPHAN_GC_BATCH_SIZE,
+        max_deletes=OPERATOR_ORPHAN_GC_MAX_DELETES,
+    ):
+        if mode not in GC_MODES:
+            raise ValueError(
+                f"Unknown orphan GC mode {mode!r}, expected one of "
+                f"{', '.join(GC_MODES)}"
+            )
+        self.mode = mode
+        self._reconcilers = reconcilers
+        self._instances = instances
+        self._shards = shards
+        self._ledger = ledger if ledger is not None else OwnershipLedger()
+        self._synced = synced
+        self._written = written
+        self.rate = rate
+        self.batch_size = batch_size
+        self.max_deletes = max_deletes
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _collections(self):
+        by_collection = defaultdict(list)
+        for bulk_reconciler in self._reconcilers.values():
+            by_collection[bulk_reconciler.collection].append(bulk_reconciler)
+        return by_collection
+
+    def _desired_ids(self, reconcilers, instance):
+        ids = set()
+        for bulk_reconciler in reconcilers:
+            for resource in bulk_reconciler.index.items():
+                if resource.instance == instance:
+                    ids.update(bulk_reconciler.desired_ids(resource))
+        return ids
+
+    def find_orphans(self, target, instance, reconcilers):
+        """Return the ids of owned objects of one collection without a resource.
+
+        Records the listed objects that custom resources produce and that
+        this operator wrote as owned, and forgets owned objects that are gone
+        from Airflow. Objects that only share an id with a resource are
+        never owned.
+
+        Raises:
+            Exception: If the collection cannot be listed, a set cannot be
+                expanded or the ledger cannot be read or updated; nothing of
+                the collection may be collected then.
+        """
+        collection = reconcilers[0].collection
+        remote_ids = set(reconcilers[0].snapshot(target))
+        desired = self._desired_ids(reconcilers, instance)
+        owned = self._ledger.owned(instance, collection)
+        written = self._written.get(instance, collection)
+
+        def mine(object_id):
+            return self._shards.owns(instance, f"{collection}/{object_id}")
+
+        adopted = {
+            object_id
+            for object_id in written & remote_ids & desired
+            if object_id not in owned and mine(object_id)
+        }
+        gone = {object_id for object_id in owned - remote_ids if mine(object_id)}
+        if adopted or gone:
+            self._ledger.update(instance, collection, add=adopted, remove=gone)
+        # Writes the listing did not include yet are looked at on the next pass
+        pending = {
+            object_id
+            for object_id in (written & desired) - remote_ids
+            if mine(object_id)
+        }
+        self._written.forget(instance, collection, written - pending)
+        return sorted(
+            object_id
+            for object_id in owned & remote_ids
+            if object_id not in desired and mine(object_id)
+        )
+
+    def _delete(self, target, collection, resource_type, object_id, limiter):
+        """Delete an orphan. Returns "success", "missing" or "failure"."""
+        limiter.acquire()
+        try:
+            target.api_client.send_json(
+                "DELETE", f"/{collection}/{quote(str(object_id), safe='')}"
+            )
+        except Exception as e:
+            if "404" in str(e) or "Not Found" in str(e):
+                return "missing"
+            ORPHAN_DELETES.labels(resource_type=resource_type, result="failure").inc()
+            logger.error(
+                "Failed to delete orphaned Airflow %s %s: %s", collection, object_id, e
+            )
+            return "failure"
+        ORPHAN_DELETES.labels(resource_type=resource_type, result="success").inc()
+        return "success"
+
+    def run_pass(self, dry_run=False):
+        """Collect the orphans of every collection and instance.
+
+        Args:
+            dry_run: Only report orphans, as in `dry-run` mode.
+
+        Returns the number of objects deleted.
+        """
+        if self.mode == GC_DISABLED:
+            return 0
+        dry_run = dry_run or self.mode == GC_DRY_RUN
+        limiter = TokenBucket(self.rate, self.batch_size)
+        deleted = 0
+        for instance in self._instances.keys():
+            try:
+                target = self._instances.target(instance)
+            except Exception as e:
+                logger.error(
+                    "Failed to collect orphans of instance %s: %s", instance, e
+                )
+                continue
+            for collection, reconcilers in self._collections().items():
+                resource_type = reconcilers[0].resource_type
+                try:
+                    orphans = self.find_orphans(target, instance, reconcilers)
+                except Exception as e:
+                    logger.error(
+                        "Failed to collect orphaned Airflow %s of instance %s: %s",
+                        collection,
+                        instance,
+                        e,
+                    )
+                    continue
+                ORPHANED_OBJECTS.labels(
+                    resource_type=resource_type, instance=instance
+                ).set(len(orphans))
+                if not orphans:
+                    continue
+                listed = ", ".join(orphans[:MAX_LOGGED_ORPHANS])
+                if dry_run:
+                    logger.info(
+                        "Found %s orphaned Airflow %s in instance %s: %s; "
+                        "not deleting them in this pass",
+                        len(orphans),
+                        collection,
+                        instance,
+                        listed,
+                    )
+                    continue
+                if len(orphans) > self.max_deletes:
+                    logger.error(
+                        "Found %s orphaned Airflow %s in instance %s, more than %s; "
+                        "not deleting any. Check the custom resources, then raise "
+                        "OPERATOR_ORPHAN_GC_MAX_DELETES",
+                        len(orphans),
+                        collection,
+                        instance,
+                        self.max_deletes,
+                    )
+                    continue
+                logger.info(
+                    "Deleting %s orphaned Airflow %s from instance %s: %s",
+                    len(orphans),
+                    collection,
+                    instance,
+                    listed,
+                )
+                results = {
+                    object_id: self._delete(
+                        target, collection, resource_type, object_id, limiter
+                    )
+                    for object_id in orphans
+                }
+                deleted += sum(result == "success" for result in results.values())
+                removed = [
+                    object_id
+                    for object_id, result in results.items()
+                    if result != "failure"
+                ]
+                try:
+                    self._ledger.update(instance, collection, remove=removed)
+                except Exception as e:
+                    # Forgotten on the next pass, which finds them gone
+                    logger.warning(
+                        "Failed to update the ownership ledger of %s: %s",
+                        collection,
+                        e,
+                    )
+        return deleted
+
+    def _run(self):
+        # Wait for the warm sync over the initially listed resources
+        while not self._synced.wait(1):
+            if self._stop_event.is_set():
+                return
+        first = True
+        while True:
+            try:
+                self.run_pass(dry_run=first)
+            except Exception as e:
+                logger.error("Orphan garbage collection failed: %s", e)
+            first = False
+            if self._stop_event.wait(OPERATOR_ORPHAN_GC_INTERVAL):
+                return
+
+    def start(self):
+        """Run a pass every `OPERATOR_ORPHAN_GC_INTERVAL` seconds, unless disabled."""
+        if self.mode == GC_DISABLED:
+            return
+        self._written.enabled = True
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="orphan-collector", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+orphan_collector = OrphanCollector()
@@ -1,35 +1,69 @@
+import datetime
 import logging
+import time
 
 import airflow_client.client as client
 import google.auth
 import google.auth.transport.requests
 
+from config import http_pool
+from config.api_client import AirflowApiClient
 from config.base import AIRFLOW_HOST
 from config.metrics import AUTH_FAILURES
+from config.token_refresh import TokenRefresher
 
 logger = logging.getLogger(__name__)
 
-# Authenticate using Application Default Credentials for Google Cloud Composer
-try:
-    credentials, project = google.auth.default(
-        scopes=["https://www.googleapis.com/auth/cloud-platform"]
-    )
-    auth_req = google.auth.transport.requests.Request()
-    credentials.refresh(auth_req)
-except Exception as e:
-    logger.error(f"Failed to authenticate with Google Cloud: {e}")
-    AUTH_FAILURES.labels(auth_type="google_cloud").inc()
-    raise
-
-configuration = client.Configuration(host=AIRFLOW_HOST)
+# Scopes requested from Application Default Credentials for Cloud Composer
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
 
 
 # Create a custom API client that adds the Bearer token to every request
-class GoogleAuthApiClient(client.ApiClient):
-    def __init__(self, configuration, credentials, auth_request):
+class GoogleAuthApiClient(AirflowApiClient):
+    """API client authenticating with Google Cloud credentials.
+
+    Application Default Credentials are looked up on the first refresh rather
+    than at import, since the lookup may query the metadata server.
+    """
+
+    # Refresh well before google-auth itself considers the token expired
+    TOKEN_REFRESH_GRACE = 300
+
+    def __init__(self, configuration, credentials=None, auth_request=None):
         super().__init__(configuration)
         self._credentials = credentials
-        self._auth_request = auth_request
+        # Keep connections to the Google token endpoint open between refreshes
+        self._auth_request = auth_request or google.auth.transport.requests.Request(
+            session=http_pool.requests_session()
+        )
+        self._refresher = TokenRefresher(
+            "google_cloud", self._refresh_credentials, grace=self.TOKEN_REFRESH_GRACE
+        )
+
+    def _refresh_credentials(self):
+        try:
+            if self._credentials is None:
+                # Authenticate using Application Default Credentials
+                self._credentials, _ = google.auth.default(scopes=SCOPES)
+            self._credentials.refresh(self._auth_request)
+        except Exception as e:
+            logger.error("Failed to refresh Google Cloud credentials: %s", e)
+            AUTH_FAILURES.labels(auth_type="google_cloud").inc()
+            raise
+        expiry = self._credentials.expiry
+        if expiry is None:
+            # Credentials without an expiry are renewed hourly
+            return time.time() + 3600
+        # google-auth reports expiry as a naive UTC datetime
+        return expiry.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+    def auth_refresh_needed(self):
+        return self._refresher.needs_refresh()
+
+    def auth_headers(self):
+        # Refresh token if needed; normally done ahead of time in the background
+        self._refresher.ensure_fresh()
+        return {"Authorization": f"Bearer {self._credentials.token}"}
 
     def call_api(
         self,
@@ -51,19 +85,10 @@ class GoogleAuthApiClient(client.ApiClient):
         _host=None,
         _check_type=None,
     ):
-        # Refresh token if needed before each API call
-        if not self._credentials.valid:
-            try:
-                self._credentials.refresh(self._auth_request)
-            except Exception as e:
-                logger.error(f"Failed to refresh Google Cloud credentials: {e}")
-                AUTH_FAILURES.labels(auth_type="google_cloud").inc()
-                raise
-
         # Set the authorization header
         if header_params is None:
             header_params = {}
-        header_params["Authorization"] = f"Bearer {self._credentials.token}"
+        header_params.update(self.auth_headers())
 
         return super().call_api(
             resource_path,
@@ -86,4 +111,5 @@ class GoogleAuthApiClient(client.ApiClient):
         )
 
 
-gcp_api_client = GoogleAuthApiClient(configuration, credentials, auth_req)
+def create_api_client(host=AIRFLOW_HOST):
+    return GoogleAuthApiClient(client.Configuration(host=host))
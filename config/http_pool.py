@@ -0,0 +1,103 @@
+import socket
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from config.base import (
+    OPERATOR_HTTP_CONNECT_TIMEOUT,
+    OPERATOR_HTTP_KEEPALIVE,
+    OPERATOR_HTTP_POOL_MAXSIZE,
+    OPERATOR_HTTP_POOL_SIZE,
+    OPERATOR_HTTP_READ_TIMEOUT,
+    OPERATOR_HTTP_RETRIES,
+)
+from config.metrics import HTTP_POOL_CAPACITY, HTTP_POOL_CONNECTIONS
+
+# Transient gateway errors worth retrying; urllib3 only retries them for
+# idempotent methods, so creates are never sent twice. Throttling responses
+# (429, 503) are left to the adaptive rate limiter in `config.ratelimit`.
+RETRY_STATUSES = (502, 504)
+
+
+def request_timeout():
+    """Return the (connect, read) timeout applied to every request."""
+    return (OPERATOR_HTTP_CONNECT_TIMEOUT, OPERATOR_HTTP_READ_TIMEOUT)
+
+
+def retry_policy():
+    return urllib3.Retry(
+        total=OPERATOR_HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False,
+    )
+
+
+def socket_options():
+    """Return socket options enabling TCP keep-alive on pooled connections.
+
+    Idle connections are probed so that load balancers and NAT gateways do not
+    silently drop them between reconciliation bursts.
+    """
+    options = list(HTTPConnection.default_socket_options)
+    if OPERATOR_HTTP_KEEPALIVE <= 0:
+        return options
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    # The fine-grained probe settings are not available on every platform
+    for name, value in (
+        ("TCP_KEEPIDLE", OPERATOR_HTTP_KEEPALIVE),
+        ("TCP_KEEPINTVL", max(OPERATOR_HTTP_KEEPALIVE // 4, 1)),
+        ("TCP_KEEPCNT", 4),
+    ):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+def configure(configuration):
+    """Apply the pool, retry and keep-alive settings to an Airflow client
+    configuration. Must be called before the `ApiClient` is created.
+    """
+    configuration.connection_pool_maxsize = OPERATOR_HTTP_POOL_MAXSIZE
+    configuration.retries = retry_policy()
+    configuration.socket_options = socket_options()
+    return configuration
+
+
+def requests_session():
+    """Return a `requests.Session` sharing the operator's pool settings."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=OPERATOR_HTTP_POOL_SIZE,
+        pool_maxsize=OPERATOR_HTTP_POOL_MAXSIZE,
+        max_retries=retry_policy(),
+    )
+    adapter.poolmanager.connection_pool_kw["socket_options"] = socket_options()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def pool_usage(pool_manager):
+    """Return (in_use, idle, capacity) summed over all pools of a manager."""
+    in_use = idle = capacity = 0
+    for key in pool_manager.pools.keys():
+        pool = pool_manager.pools.get(key)
+        if pool is None or pool.pool is None:
+            continue
+        # The queue starts filled with `maxsize` placeholders; a checked out
+        # connection leaves the queue until it is returned
+        queued = list(pool.pool.queue)
+        in_use += pool.pool.maxsize - len(queued)
+        idle += sum(1 for conn in queued if conn is not None)
+        capacity += pool.pool.maxsize
+    return in_use, idle, capacity
+
+
+def record_pool_usage(client, pool_manager):
+    in_use, idle, capacity = pool_usage(pool_manager)
+    HTTP_POOL_CONNECTIONS.labels(client=client, state="in_use").set(in_use)
+    HTTP_POOL_CONNECTIONS.labels(client=client, state="idle").set(idle)
+    HTTP_POOL_CAPACITY.labels(client=client).set(capacity)
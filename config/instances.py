@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass, field
+
+from config.aio import AsyncAirflowClient
+from config.base import (
+    AIRFLOW_API_BASE_URL,
+    AIRFLOW_HOST,
+    OPERATOR_AIRFLOW_RATE_BURST,
+    OPERATOR_AIRFLOW_RATE_INCREASE,
+    OPERATOR_AIRFLOW_RATE_LIMIT,
+    OPERATOR_AIRFLOW_RATE_MIN,
+    OPERATOR_CROSS_NAMESPACE_INSTANCES,
+    OPERATOR_MAX_INFLIGHT_REQUESTS,
+)
+from config.bulk import BulkWriter
+from config.k8s_secret import resolve_value, secret_refs
+from config.ratelimit import AdaptiveRateLimiter, InFlightLimit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INSTANCE = "default"
+
+# Value fields of `spec.auth` that may reference Secrets
+CREDENTIAL_FIELDS = ("username", "password", "token")
+
+
+def instance_key(namespace, spec, cross_namespace=None):
+    """Return the key of the Airflow instance a custom resource targets.
+
+    Resources without `spec.airflowRef` target the default instance configured
+    through the environment. The reference names an AirflowInstance in the
+    resource's own namespace. Other namespaces may only be named if
+    `OPERATOR_CROSS_NAMESPACE_INSTANCES` is set, since whoever can create
+    resources in a namespace could otherwise write to any Airflow instance.
+    `cross_namespace` overrides that setting.
+
+    Raises:
+        LookupError: If the reference names another namespace and that is
+            not allowed.
+    """
+    ref = (spec or {}).get("airflowRef")
+    if not ref or not ref.get("name"):
+        return DEFAULT_INSTANCE
+    ref_namespace = ref.get("namespace") or namespace
+    if cross_namespace is None:
+        cross_namespace = OPERATOR_CROSS_NAMESPACE_INSTANCES
+    if ref_namespace != namespace and not cross_namespace:
+        raise LookupError(
+            f"AirflowInstance {ref_namespace}/{ref['name']} is in another "
+            "namespace; set OPERATOR_CROSS_NAMESPACE_INSTANCES=true to allow this"
+        )
+    return f"{ref_namespace}/{ref['name']}"
+
+
+def api_url(host, api_base_url=None):
+    """Append the API base path to an Airflow host unless it is already there."""
+    api_base_url = api_base_url or AIRFLOW_API_BASE_URL
+    if host.endswith(api_base_url):
+        return host
+    return host.rstrip("/") + api_base_url
+
+
+def credential_refs(spec):
+    """Return the (secret name, key) references of an instance's credentials."""
+    auth = (spec or {}).get("auth") or {}
+    return secret_refs(*(auth.get(name) for name in CREDENTIAL_FIELDS))
+
+
+@dataclass
+class AirflowTarget:
+    """Clients for one Airflow instance.
+
+    Every target owns its connection pool, adaptive rate limiter and aiohttp
+    session, so a slow or throttling instance does not hold up the others.
+    `bulk` is the `BulkWriter` of instances serving the Airflow API v2, and
+    None for the API v1, which writes one object per request.
+    """
+
+    name: str
+    api_client: object
+    aio_client: AsyncAirflowClient
+    bulk: BulkWriter | None = None
+    _apis: dict = field(default_factory=dict)
+
+    def api(self, api_class):
+        """Return the generated API object of `api_class` bound to this target."""
+        api = self._apis.get(api_class)
+        if api is None:
+            api = self._apis[api_class] = api_class(api_client=self.api_client)
+        return api
+
+
+def _auth_settings(backend, spec, namespace):
+    auth = spec.get("auth") or {}
+    values = {
+        name: resolve_value(auth[name], namespace)
+        for name in CREDENTIAL_FIELDS
+        if auth.get(name)
+    }
+    host = api_url(spec["host"], spec.get("apiBaseUrl")) if spec.get("host") else None
+    if backend == "aws":
+        settings = {
+            "region": auth.get("awsRegion"),
+            "env_name": auth.get("mwaaEnvironment"),
+            "api_base_url": spec.get("apiBaseUrl") or AIRFLOW_API_BASE_URL,
+        }
+        if auth.get("mwaaLoginPath"):
+            settings["login_path"] = auth["mwaaLoginPath"]
+        return settings
+    if host is None:
+        raise ValueError("spec.host is required")
+    if backend == "basic":
+        return {
+            "host": host,
+            "username": values.get("username"),
+            "password": values.get("password"),
+        }
+    if backend == "token":
+        return {"host": host, "access_token": values.get("token")}
+    return {"host": host}
+
+
+def create_target(name, namespace, spec):
+    """Build the clients of an AirflowInstance from its spec.
+
+    Credentials given as `secretRef` are resolved from the instance's
+    namespace. No request is sent to Airflow; tokens are obtained on first use.
+
+    Raises:
+        ValueError: If `spec.auth.backend` is not a registered backend name.
+            Custom "module:factory" backends can only be configured through
+            `AIRFLOW_AUTH_BACKEND`, never by an AirflowInstance.
+    """
+    from config.client import AUTH_BACKENDS, load_auth_backend
+
+    backend = (spec.get("auth") or {}).get("backend", "basic")
+    if backend not in AUTH_BACKENDS:
+        raise ValueError(
+            f"Unknown auth backend {backend!r}, expected one of "
+            f"{', '.join(sorted(AUTH_BACKENDS))}"
+        )
+    settings = _auth_settings(backend, spec, namespace)
+    api_client = load_auth_backend(backend, **settings)
+    rate_limit = spec.get("rateLimit") or {}
+    api_client.instance = name
+    api_client.rate_limiter = AdaptiveRateLimiter(
+        max_rate=rate_limit.get("requestsPerSecond", OPERATOR_AIRFLOW_RATE_LIMIT),
+        burst=rate_limit.get("burst", OPERATOR_AIRFLOW_RATE_BURST),
+        min_rate=rate_limit.get("minRequestsPerSecond", OPERATOR_AIRFLOW_RATE_MIN),
+        increase=OPERATOR_AIRFLOW_RATE_INCREASE,
+        instance=name,
+    )
+    api_client.in_flight = InFlightLimit(
+        spec.get("maxInFlightRequests", OPERATOR_MAX_INFLIGHT_REQUESTS)
+    )
+    return AirflowTarget(
+        name,
+        api_client,
+        AsyncAirflowClient(api_client),
+        BulkWriter.for_client(
+            api_client, settings.get("host") or settings.get("api_base_url")
+        ),
+    )
+
+
+def create_default_target():
+    """Build the clients of the default instance configured by the environment."""
+    from config.client import api_client
+
+    return AirflowTarget(
+        DEFAULT_INSTANCE,
+        api_client,
+        AsyncAirflowClient(api_client),
+        BulkWriter.for_client(api_client, AIRFLOW_HOST),
+    )
+
+
+class InstanceRegistry:
+    """Keyed, lazily built set of clients, one per Airflow instance.
+
+    AirflowInstance specs are fed from the watch stream. A target is created
+    on the first request to its instance and cached until the spec changes or
+    the instance is deleted; the retired target is handed back to the caller
+    so that its aiohttp session can be closed on the event loop.
+
+    Args:
+        create: Callable (key, namespace, spec) -> AirflowTarget.
+        create_default: Callable () -> AirflowTarget for the default instance.
+    """
+
+    def __init__(self, create=create_target, create_default=create_default_target):
+        self._create = create
+        self._create_default = create_default
+        self._lock = threading.Lock()
+        # key -> (namespace, spec)
+        self._specs = {}
+        self._targets = {}
+
+    def upsert(self, namespace, name, spec):
+        """Record the spec of an AirflowInstance.
+
+        Returns the previously built target if the spec changed, else None.
+        """
+        key = f"{namespace}/{name}"
+        spec = dict(spec or {})
+        with self._lock:
+            if self._specs.get(key) == (namespace, spec):
+                return None
+            self._specs[key] = (namespace, spec)
+            return self._targets.pop(key, None)
+
+    def remove(self, namespace, name):
+        """Forget an AirflowInstance. Returns its built target, if any."""
+        key = f"{namespace}/{name}"
+        with self._lock:
+            self._specs.pop(key, None)
+            return self._targets.pop(key, None)
+
+    def reset(self, namespace, name):
+        """Drop the built target so that it is rebuilt, e.g. with new credentials."""
+        with self._lock:
+            return self._targets.pop(f"{namespace}/{name}", None)
+
+    def target(self, key=DEFAULT_INSTANCE):
+        """Return the clients of the instance `key`, building them on first use.
+
+        Raises:
+            LookupError: If no AirflowInstance with that key is known.
+        """
+        with self._lock:
+            target = self._targets.get(key)
+            if target is not None:
+                return target
+            if key != DEFAULT_INSTANCE:
+                if key not in self._specs:
+                    raise LookupError(f"AirflowInstance {key} not found")
+                namespace, spec = self._specs[key]
+        # Credentials may be read from Secrets; do not hold the lock meanwhile
+        if key == DEFAULT_INSTANCE:
+            target = self._create_default()
+            with self._lock:
+                return self._targets.setdefault(key, target)
+        target = self._create(key, namespace, spec)
+        with self._lock:
+            if self._specs.get(key) != (namespace, spec):
+                # The spec changed while building; the next call rebuilds
+                return target
+            return self._targets.setdefault(key, target)
+
+    def for_resource(self, namespace, spec):
+        """Return the target of the instance a custom resource references."""
+        return self.target(instance_key(namespace, spec))
+
+    async def for_resource_async(self, namespace, spec):
+        """Like `for_resource`, but builds a missing target off the event loop."""
+        key = instance_key(namespace, spec)
+        with self._lock:
+            target = self._targets.get(key)
+        if target is not None:
+            return target
+        return await asyncio.to_thread(self.target, key)
+
+    def keys(self):
+        """Return the keys of the default and of every known instance."""
+        with self._lock:
+            return [DEFAULT_INSTANCE, *sorted(self._specs)]
+
+    def targets(self):
+        with self._lock:
+            return list(self._targets.values())
+
+    async def close(self):
+        for target in self.targets():
+            await target.aio_client.close()
+
+
+airflow_instances = InstanceRegistry()
@@ -3,12 +3,47 @@ from collections.abc import Mapping
 
 from kubernetes import client
 
+from config.base import OPERATOR_LIST_PAGE_SIZE
+from config.metrics import RECONCILE_PHASE_DURATION
+from config.secret_cache import decode_secret_data, secret_cache
 
+
+def get_secret_data(secret_name: str, namespace: str, logger=None) -> dict:
+    """
+    Return the decoded data of a Kubernetes Secret, using the Secret cache.
+
+    Args:
+        secret_name: Name of the Kubernetes Secret
+        namespace: Kubernetes namespace where the Secret is located
+        logger: Optional logger for debugging
+
+    Returns:
+        Dict of Secret keys to decoded values
+
+    Raises:
+        kubernetes.client.exceptions.ApiException: If the Secret cannot be read
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    # Serve from the watch-fed cache, fetching the Secret only on a miss
+    data = secret_cache.get(namespace, secret_name)
+    if data is None:
+        v1 = client.CoreV1Api()
+        secret = v1.read_namespaced_secret(secret_name, namespace)
+        logger.info("Fetched Secret %s from namespace %s", secret_name, namespace)
+        # Secret data is base64 encoded, need to decode
+        data = decode_secret_data(secret.data)
+        secret_cache.put(namespace, secret_name, data)
+    return data
+
+
+@RECONCILE_PHASE_DURATION.labels(phase="secret_resolve").time()
 def _get_secret_value(
     secret_name: str, secret_key: str, namespace: str, logger=None
 ) -> str:
     """
-    Fetch a value from a Kubernetes Secret.
+    Fetch a value from a Kubernetes Secret, using the in-memory Secret cache.
 
     Args:
         secret_name: Name of the Kubernetes Secret
@@ -27,21 +62,14 @@ def _get_secret_value(
         if logger is None:
             logger = logging.getLogger(__name__)
 
-        # Use the Kubernetes API to fetch the secret
-        v1 = client.CoreV1Api()
-        secret = v1.read_namespaced_secret(secret_name, namespace)
-        logger.info(f"Fetched Secret {secret_name} from namespace {namespace}")
+        data = get_secret_data(secret_name, namespace, logger=logger)
 
         # Get the value from the secret data
-        if secret.data and secret_key in secret.data:
-            # Secret data is base64 encoded, need to decode
-            import base64
-
-            value = base64.b64decode(secret.data[secret_key]).decode("utf-8")
-            logger.info(
-                f"Successfully fetched value from Secret {secret_name}/{secret_key}"
+        if secret_key in data:
+            logger.debug(
+                "Successfully fetched value from Secret %s/%s", secret_name, secret_key
             )
-            return value
+            return data[secret_key]
         else:
             error_msg = f"Key '{secret_key}' not found in Secret '{secret_name}' in namespace '{namespace}'"
             logger.error(error_msg)
@@ -59,6 +87,86 @@ def _get_secret_value(
         raise ValueError(error_msg)
 
 
+def prefetch_secrets(secrets, logger=None) -> int:
+    """
+    Load referenced Secrets into the Secret cache with one list per namespace.
+
+    Used at startup so that building every payload does not cost one Secret
+    read each. Secrets that cannot be listed are left to the regular lookup.
+
+    Args:
+        secrets: Iterable of (namespace, secret name) tuples
+        logger: Optional logger for debugging
+
+    Returns:
+        The number of Secrets added to the cache
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    wanted = {}
+    for namespace, secret_name in secrets:
+        wanted.setdefault(namespace, set()).add(secret_name)
+
+    v1 = client.CoreV1Api()
+    loaded = 0
+    for namespace, names in wanted.items():
+        continue_token = None
+        while True:
+            try:
+                secret_list = v1.list_namespaced_secret(
+                    namespace, limit=OPERATOR_LIST_PAGE_SIZE, _continue=continue_token
+                )
+            except client.exceptions.ApiException as e:
+                logger.warning(
+                    "Failed to list Secrets in namespace %s: %s", namespace, e
+                )
+                break
+            for secret in secret_list.items:
+                if secret.metadata.name in names:
+                    secret_cache.put(
+                        namespace,
+                        secret.metadata.name,
+                        decode_secret_data(secret.data),
+                    )
+                    loaded += 1
+            continue_token = secret_list.metadata._continue
+            if not continue_token:
+                break
+    logger.info("Prefetched %s referenced Secrets", loaded)
+    return loaded
+
+
+def _parse_secret_ref(secret_ref) -> tuple[str, str]:
+    if (
+        not isinstance(secret_ref, Mapping)
+        or "name" not in secret_ref
+        or "key" not in secret_ref
+    ):
+        raise ValueError("secretRef must contain 'name' and 'key' fields")
+    return secret_ref["name"], secret_ref["key"]
+
+
+def secret_refs(*value_specs) -> set[tuple[str, str]]:
+    """
+    Collect the Secret references used by value specifications.
+
+    Accepts the same specifications as `resolve_value`; direct values and
+    malformed references are skipped.
+
+    Returns:
+        Set of (secret name, secret key) tuples
+    """
+    refs = set()
+    for value_spec in value_specs:
+        if isinstance(value_spec, Mapping) and "secretRef" in value_spec:
+            try:
+                refs.add(_parse_secret_ref(value_spec["secretRef"]))
+            except ValueError:
+                continue
+    return refs
+
+
 def resolve_value(value_spec: dict | Mapping, namespace: str, logger=None) -> str:
     """
     Resolve a value from either a direct value or a secret reference.
@@ -89,15 +197,7 @@ def resolve_value(value_spec: dict | Mapping, namespace: str, logger=None) -> st
     if isinstance(value_spec, Mapping):
         # Otherwise, handle secretRef or a 'value' field
         if "secretRef" in value_spec:
-            secret_ref = value_spec["secretRef"]
-            if (
-                not isinstance(secret_ref, Mapping)
-                or "name" not in secret_ref
-                or "key" not in secret_ref
-            ):
-                raise ValueError("secretRef must contain 'name' and 'key' fields")
-            secret_name = secret_ref["name"]
-            secret_key = secret_ref["key"]
+            secret_name, secret_key = _parse_secret_ref(value_spec["secretRef"])
             return _get_secret_value(secret_name, secret_key, namespace, logger)
 
         elif "value" in value_spec:
@@ -0,0 +1,209 @@
+import json
+import logging
+import queue
+import threading
+import time
+import weakref
+from collections.abc import Mapping
+from logging.handlers import QueueHandler, QueueListener
+
+from config.base import (
+    OPERATOR_EVENT_LEVEL,
+    OPERATOR_LOG_QUEUE_SIZE,
+    OPERATOR_LOG_SAMPLE_INTERVAL,
+)
+from config.metrics import LOG_RECORDS_DROPPED
+
+REDACTED = "***"
+# Spec fields whose plain string values are never logged
+SENSITIVE_FIELDS = frozenset({"password", "value", "extra", "token"})
+# Shorter values would mask unrelated parts of messages
+MIN_MASKED_LENGTH = 4
+# Sampled keys kept before the ones outside the interval are pruned
+MAX_SAMPLED_KEYS = 10000
+# Record attribute holding the key of the object a sampled message is about
+SAMPLE_KEY = "sample_key"
+
+
+def sampled(*parts):
+    """Return the `extra` of a repetitive message about one object.
+
+    Only one message with the same format string and key is logged per
+    `OPERATOR_LOG_SAMPLE_INTERVAL`; the next one reports how many were
+    suppressed in between.
+    """
+    return {SAMPLE_KEY: "/".join(str(part) for part in parts)}
+
+
+def redacted(spec):
+    """Return a copy of a spec that is safe to log, without inline secret values."""
+    if isinstance(spec, Mapping):
+        return {
+            key: REDACTED
+            if key in SENSITIVE_FIELDS and isinstance(value, str)
+            else redacted(value)
+            for key, value in spec.items()
+        }
+    if isinstance(spec, list):
+        return [redacted(item) for item in spec]
+    return spec
+
+
+def _sensitive_values(body):
+    if isinstance(body, Mapping):
+        for key, value in body.items():
+            if key in SENSITIVE_FIELDS and isinstance(value, str):
+                if len(value) >= MIN_MASKED_LENGTH:
+                    yield value
+            else:
+                yield from _sensitive_values(value)
+    elif isinstance(body, list):
+        for item in body:
+            yield from _sensitive_values(item)
+
+
+def redact_error(error, body):
+    """Remove the sensitive values of a request body from an API error.
+
+    Airflow echoes the request in validation errors, and their text ends up
+    in log messages, Events and the status of custom resources. Values are
+    replaced both as sent and as they appear inside JSON strings.
+
+    Args:
+        error: Exception raised for the request; its `body`, if any, is
+            rewritten in place.
+        body: JSON-serializable request body that was sent.
+
+    Returns:
+        `error`.
+    """
+    text = getattr(error, "body", None)
+    if not isinstance(text, str) or not body:
+        return error
+    # Longest first, so a value containing another is masked whole
+    for value in sorted(set(_sensitive_values(body)), key=len, reverse=True):
+        text = text.replace(value, REDACTED)
+        text = text.replace(json.dumps(value)[1:-1], REDACTED)
+    error.body = text
+    return error
+
+
+class LogFilter(logging.Filter):
+    """Sample repetitive messages.
+
+    Sampling only looks at the record's format string and sample key, so
+    suppressed records are never formatted. Only the first record passing
+    after others were suppressed is formatted, to report how many were.
+
+    The filter is attached both to kopf's per-object logger, so that Events
+    are sampled too, and to the root handler. A record passing both is only
+    decided on once.
+
+    Args:
+        interval: Seconds a message with the same format string and sample
+            key is suppressed after it was logged.
+        clock: Monotonic clock returning seconds.
+    """
+
+    def __init__(self, interval=OPERATOR_LOG_SAMPLE_INTERVAL, clock=time.monotonic):
+        super().__init__()
+        self.interval = interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (sample key, format string) -> (time logged, messages suppressed since)
+        self._sampled = {}
+        # Records already decided on when they reach the root handler
+        self._decided = weakref.WeakKeyDictionary()
+
+    def _suppress(self, record):
+        key = getattr(record, SAMPLE_KEY, None)
+        if key is None:
+            return False, 0
+        key = (key, record.msg)
+        now = self._clock()
+        with self._lock:
+            logged_at, suppressed = self._sampled.get(key, (None, 0))
+            if logged_at is not None and now - logged_at < self.interval:
+                self._sampled[key] = (logged_at, suppressed + 1)
+                return True, 0
+            self._sampled[key] = (now, 0)
+            if len(self._sampled) > MAX_SAMPLED_KEYS:
+                self._sampled = {
+                    sample_key: entry
+                    for sample_key, entry in self._sampled.items()
+                    if now - entry[0] < self.interval
+                }
+        return False, suppressed
+
+    def filter(self, record):
+        with self._lock:
+            decision = self._decided.get(record)
+        if decision is not None:
+            return decision
+        suppressed, previously = self._suppress(record)
+        with self._lock:
+            self._decided[record] = not suppressed
+        if suppressed:
+            LOG_RECORDS_DROPPED.labels(reason="sampled").inc()
+            return False
+        if not previously:
+            return True
+        try:
+            message = record.getMessage()
+        except Exception:
+            # Left to the handler, which reports broken format arguments
+            return True
+        record.msg = f"{message} ({previously} similar messages suppressed)"
+        record.args = None
+        return True
+
+
+class _DroppingQueueHandler(QueueHandler):
+    # Logging never blocks, and never fails, because the writer fell behind
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels(reason="queue_full").inc()
+
+
+log_filter = LogFilter()
+_listener = None
+
+
+def start(settings=None, queue_size=OPERATOR_LOG_QUEUE_SIZE):
+    """Move the root log handlers to a writer thread and install `log_filter`.
+
+    The handlers configured by kopf, with the format chosen by `--log-format`,
+    keep formatting and writing the records, but from a `QueueListener`
+    thread. Callers only put the record on a bounded queue.
+
+    Args:
+        settings: kopf `OperatorSettings`; handler messages are only posted
+            as Kubernetes Events from `OPERATOR_EVENT_LEVEL` on.
+        queue_size: Records buffered for the writer thread.
+    """
+    global _listener
+    if settings is not None:
+        settings.posting.level = logging.getLevelName(OPERATOR_EVENT_LEVEL)
+    logging.getLogger("kopf.objects").addFilter(log_filter)
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    queue_handler = _DroppingQueueHandler(queue.Queue(queue_size))
+    queue_handler.addFilter(log_filter)
+    _listener = QueueListener(
+        queue_handler.queue, *root.handlers, respect_handler_level=True
+    )
+    root.handlers[:] = [queue_handler]
+    _listener.start()
+
+
+def stop():
+    """Write the queued records and hand the handlers back to the root logger."""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    logging.getLogger().handlers[:] = list(listener.handlers)
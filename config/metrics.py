@@ -1,4 +1,5 @@
 import prometheus_client as prometheus
+from prometheus_client.core import GaugeMetricFamily
 
 # Core reconciliation metrics
 RESOURCE_OPERATIONS = prometheus.Counter(
@@ -14,6 +15,20 @@ RESOURCE_RECONCILIATION_DURATION = prometheus.Histogram(
     buckets=[0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0],
 )
 
+RECONCILE_CYCLE_DURATION = prometheus.Histogram(
+    "airflow_reconcile_cycle_duration_seconds",
+    "Time spent on a bulk list-and-diff reconciliation cycle",
+    ["resource_type"],
+    buckets=[0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0],
+)
+
+RECONCILE_PHASE_DURATION = prometheus.Histogram(
+    "airflow_reconcile_phase_duration_seconds",
+    "Time spent in each phase of reconciling a resource",
+    ["phase"],
+    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+)
+
 # API interaction metrics
 AIRFLOW_API_REQUESTS = prometheus.Counter(
     "airflow_api_requests_total",
@@ -32,19 +47,178 @@ AIRFLOW_API_ERRORS = prometheus.Counter(
     "airflow_api_errors_total", "Total number of Airflow API errors", ["error_type"]
 )
 
-# Resource state metrics
-MANAGED_RESOURCES = prometheus.Gauge(
-    "airflow_managed_resources", "Current count of managed resources", ["resource_type"]
+AIRFLOW_API_RATE_LIMIT = prometheus.Gauge(
+    "airflow_api_rate_limit",
+    "Current Airflow API request rate allowed by the adaptive rate limiter",
+    ["instance"],
+)
+
+AIRFLOW_API_QUEUE_DEPTH = prometheus.Gauge(
+    "airflow_api_queue_depth",
+    "Current number of Airflow API requests waiting for the rate limiter",
+    ["instance"],
 )
 
+HTTP_POOL_CONNECTIONS = prometheus.Gauge(
+    "airflow_http_pool_connections",
+    "Current number of pooled HTTP connections",
+    ["client", "state"],
+)
+
+HTTP_POOL_CAPACITY = prometheus.Gauge(
+    "airflow_http_pool_capacity",
+    "Maximum number of pooled HTTP connections",
+    ["client"],
+)
+
+
+# Resource state metrics
+class ManagedResourceCollector:
+    """Report the managed custom resources when metrics are scraped.
+
+    The counts come from the in-memory resource indexes, which the watch
+    stream keeps current, so they are right again right after a restart.
+    Each source is a callable returning a dict of (namespace, state, instance)
+    to count that its index maintains on every change, so a scrape costs the
+    number of label combinations, not the number of resources.
+    """
+
+    def __init__(self):
+        self._sources = {}
+
+    def add_source(self, resource_type, counts):
+        self._sources[resource_type] = counts
+
+    def _family(self):
+        return GaugeMetricFamily(
+            "airflow_managed_resources",
+            "Current count of managed resources",
+            labels=["resource_type", "namespace", "state", "instance"],
+        )
+
+    def describe(self):
+        yield self._family()
+
+    def collect(self):
+        family = self._family()
+        for resource_type, counts in list(self._sources.items()):
+            for (namespace, state, instance), count in counts().items():
+                family.add_metric([resource_type, namespace, state, instance], count)
+        yield family
+
+
+MANAGED_RESOURCES = ManagedResourceCollector()
+prometheus.REGISTRY.register(MANAGED_RESOURCES)
+
 RECONCILIATION_FAILURES = prometheus.Counter(
     "airflow_reconciliation_failures_total",
     "Total number of failed reconciliation attempts",
     ["resource_type"],
 )
 
+DRIFT_DETECTED = prometheus.Counter(
+    "airflow_drift_detected_total",
+    "Total number of Airflow object fields found to differ from their custom resource",
+    ["resource_type", "field"],
+)
+
+STATUS_WRITES = prometheus.Counter(
+    "airflow_status_writes_total",
+    "Total number of coalesced status updates of custom resources",
+    ["result"],
+)
+
 AUTH_FAILURES = prometheus.Counter(
     "airflow_auth_failures_total",
     "Total number of authentication failures",
     ["auth_type"],
 )
+
+TOKEN_REFRESHES = prometheus.Counter(
+    "airflow_token_refreshes_total",
+    "Total number of authentication token refreshes",
+    ["auth_type", "trigger", "status"],
+)
+
+TOKEN_REFRESH_DURATION = prometheus.Histogram(
+    "airflow_token_refresh_duration_seconds",
+    "Time spent obtaining a new authentication token",
+    ["auth_type"],
+    buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0],
+)
+
+# Secret cache metrics
+SECRET_CACHE_LOOKUPS = prometheus.Counter(
+    "airflow_secret_cache_lookups_total",
+    "Total number of Secret cache lookups",
+    ["result"],
+)
+
+SECRET_CACHE_ENTRIES = prometheus.Gauge(
+    "airflow_secret_cache_entries", "Current number of Secrets held in the cache"
+)
+
+SECRET_CHANGE_RECONCILES = prometheus.Counter(
+    "airflow_secret_change_reconciles_total",
+    "Total number of reconciles triggered by a change of a referenced Secret",
+    ["resource_type"],
+)
+
+# Sharding metrics
+SHARD_MEMBERS = prometheus.Gauge(
+    "airflow_operator_shard_members",
+    "Current number of operator replicas sharing the custom resources",
+)
+
+SHARD_REBALANCES = prometheus.Counter(
+    "airflow_operator_shard_rebalances_total",
+    "Total number of shard ownership changes seen by this replica",
+)
+
+# Orphan garbage collection metrics
+ORPHANED_OBJECTS = prometheus.Gauge(
+    "airflow_orphaned_objects",
+    "Operator-owned Airflow objects without a custom resource in the last GC pass",
+    ["resource_type", "instance"],
+)
+
+ORPHAN_DELETES = prometheus.Counter(
+    "airflow_orphan_deletes_total",
+    "Total number of orphaned Airflow objects deleted by garbage collection",
+    ["resource_type", "result"],
+)
+
+# Bulk write metrics
+BULK_WRITE_ENTITIES = prometheus.Histogram(
+    "airflow_bulk_write_entities",
+    "Number of objects written per bulk request to the Airflow API",
+    ["collection"],
+    buckets=[1, 5, 10, 25, 50, 100, 250, 500],
+)
+
+# Logging metrics
+LOG_RECORDS_DROPPED = prometheus.Counter(
+    "airflow_log_records_dropped_total",
+    "Total number of log records dropped by sampling or a full log queue",
+    ["reason"],
+)
+
+# Work queue metrics
+WORKQUEUE_DEPTH = prometheus.Gauge(
+    "airflow_workqueue_depth",
+    "Current number of custom resources waiting to be reconciled",
+    ["priority"],
+)
+
+WORKQUEUE_WAIT = prometheus.Histogram(
+    "airflow_workqueue_wait_seconds",
+    "Time a custom resource waited in the work queue before its reconcile started",
+    ["priority"],
+    buckets=[0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0],
+)
+
+WORKQUEUE_DEDUPLICATED = prometheus.Counter(
+    "airflow_workqueue_deduplicated_total",
+    "Total number of reconciles merged into one already waiting for the same resource",
+    ["resource_type"],
+)
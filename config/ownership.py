@@ -0,0 +1,42 @@
+import threading
+from collections import defaultdict
+
+
+class WrittenObjects:
+    """Ids of the Airflow objects this operator wrote since the last GC pass.
+
+    Orphan garbage collection only records an object as owned once the
+    operator created or updated it itself, so objects that merely share an
+    id with a custom resource are never deleted. Writes are only recorded
+    while `enabled`, which the orphan collector sets when it starts, so the
+    ids do not pile up with garbage collection disabled. Ids recorded before
+    a restart are lost, which only means those objects are never collected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = defaultdict(set)
+        self.enabled = False
+
+    def record(self, instance, collection, object_id):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._ids[(instance, collection)].add(object_id)
+
+    def get(self, instance, collection):
+        """Return the recorded ids of one instance and collection."""
+        with self._lock:
+            return set(self._ids.get((instance, collection), ()))
+
+    def forget(self, instance, collection, ids):
+        with self._lock:
+            recorded = self._ids.get((instance, collection))
+            if recorded is None:
+                return
+            recorded.difference_update(ids)
+            if not recorded:
+                del self._ids[(instance, collection)]
+
+
+written_objects = WrittenObjects()
@@ -0,0 +1,76 @@
+from urllib.parse import quote
+
+from config.ownership import written_objects
+
+NONE_TYPE = type(None)
+
+
+class PayloadSchema:
+    """Field types of the payloads written to one Airflow collection.
+
+    Compiled once from the `openapi_types` of a generated model, so that
+    writes can skip instantiating the model, which checks and converts every
+    attribute again on each call. Read-only fields are rejected, like the
+    model does.
+
+    Args:
+        model: Generated model class, e.g. `airflow_client...Pool`.
+    """
+
+    def __init__(self, model):
+        self.name = model.__name__
+        self.types = {
+            field: frozenset(types)
+            for field, types in model.openapi_types.items()
+            if field not in model.read_only_vars
+        }
+
+    def validate(self, payload):
+        """Check that every field of `payload` exists and has an allowed type.
+
+        Raises:
+            ValueError: If a field is unknown or has the wrong type.
+        """
+        for field, value in payload.items():
+            types = self.types.get(field)
+            if types is None:
+                raise ValueError(f"{self.name} has no writable field {field}")
+            # Exact types: a bool is not accepted for an integer field
+            if type(value) not in types:
+                allowed = ", ".join(
+                    "null" if kind is NONE_TYPE else kind.__name__
+                    for kind in sorted(types, key=lambda kind: kind.__name__)
+                )
+                raise ValueError(
+                    f"Invalid {self.name} field {field}: expected {allowed}, "
+                    f"got {type(value).__name__}"
+                )
+
+
+def write_object(target, collection, schema, object_id, payload, exists):
+    """Create or patch an Airflow object from a payload dict.
+
+    Args:
+        target: `AirflowTarget` to write to.
+        collection: Airflow collection, e.g. "pools".
+        schema: `PayloadSchema` of the collection.
+        object_id: Id of the object within the collection.
+        payload: Payload built from the custom resource.
+        exists: Whether to patch an existing object instead of creating it.
+            Ignored on instances that take bulk requests.
+
+    Raises:
+        ApiException: If Airflow rejects the request.
+        BulkWriteError: If Airflow rejects the object in a bulk request.
+    """
+    schema.validate(payload)
+    if target.bulk is not None:
+        # Bulk creates overwrite existing objects
+        target.bulk.write(collection, object_id, payload)
+    elif exists:
+        target.api_client.send_json(
+            "PATCH", f"/{collection}/{quote(str(object_id), safe='')}", payload
+        )
+    else:
+        target.api_client.send_json("POST", f"/{collection}", payload)
+    written_objects.record(target.name, collection, object_id)
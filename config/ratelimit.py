@@ -0,0 +1,293 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+from config.base import (
+    OPERATOR_AIRFLOW_RATE_BURST,
+    OPERATOR_AIRFLOW_RATE_INCREASE,
+    OPERATOR_AIRFLOW_RATE_LIMIT,
+    OPERATOR_AIRFLOW_RATE_MIN,
+    OPERATOR_MAX_INFLIGHT_REQUESTS,
+)
+from config.metrics import AIRFLOW_API_QUEUE_DEPTH, AIRFLOW_API_RATE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Responses telling us Airflow is overloaded
+THROTTLE_STATUSES = (429, 503)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how often an action may run.
+
+    Tokens are added continuously at `rate` per second, up to `burst`. Each
+    `acquire` takes one token, blocking until one is available.
+
+    Args:
+        rate: Tokens added per second.
+        burst: Maximum number of tokens the bucket holds.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def try_acquire(self):
+        """Take a token if one is available. Returns 0 on success, otherwise the
+        number of seconds until the next token."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available. Returns the seconds spent waiting."""
+        waited = 0
+        while True:
+            delay = self.try_acquire()
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+def _grant(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class InFlightLimit:
+    """Bound on the requests in flight to one Airflow instance.
+
+    A semaphore shared by worker threads and coroutines on the event loop, so
+    blocking and aiohttp requests draw from one budget. Slots are handed to
+    waiters in arrival order whichever side they wait on.
+
+    Args:
+        limit: Maximum number of concurrent requests.
+    """
+
+    def __init__(self, limit=OPERATOR_MAX_INFLIGHT_REQUESTS):
+        self.limit = limit
+        self._free = limit
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a slot is free."""
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            event = threading.Event()
+            self._waiters.append(event.set)
+        event.wait()
+
+    async def acquire_async(self):
+        """Wait for a free slot without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            future = loop.create_future()
+            wake = functools.partial(loop.call_soon_threadsafe, _grant, future)
+            self._waiters.append(wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = wake not in self._waiters
+                if not granted:
+                    self._waiters.remove(wake)
+            if granted:
+                # The slot was handed over meanwhile; pass it on
+                self.release()
+            raise
+
+    def release(self):
+        while True:
+            with self._lock:
+                if not self._waiters:
+                    self._free += 1
+                    return
+                wake = self._waiters.popleft()
+            try:
+                wake()
+                return
+            except RuntimeError:
+                # The event loop of the waiter is closed
+                continue
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds requested by a Retry-After header, or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Limiter for the requests to one Airflow instance with AIMD backoff.
+
+    Every request takes a token from a bucket refilled at the current rate.
+    Throttling responses (429, 503) halve the rate, at most once per second so
+    that a burst of rejected requests counts as one signal, and a Retry-After
+    header pauses all requests until it expires. Each successful response
+    raises the rate additively, by about `increase` requests per second for
+    every second of successful traffic, back up to `max_rate`.
+
+    Args:
+        max_rate: Requests per second when Airflow is healthy; 0 disables
+            limiting.
+        burst: Requests allowed back to back.
+        min_rate: Lowest rate backoff may reach.
+        increase: Additive increase step, in requests per second.
+        instance: Metric label of the Airflow instance being protected.
+    """
+
+    BACKOFF_FACTOR = 0.5
+    BACKOFF_COOLDOWN = 1.0
+
+    def __init__(
+        self,
+        max_rate=OPERATOR_AIRFLOW_RATE_LIMIT,
+        burst=OPERATOR_AIRFLOW_RATE_BURST,
+        min_rate=OPERATOR_AIRFLOW_RATE_MIN,
+        increase=OPERATOR_AIRFLOW_RATE_INCREASE,
+        instance="default",
+    ):
+        self.instance = instance
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate) if max_rate > 0 else min_rate
+        self.increase = increase
+        self.enabled = max_rate > 0
+        self._bucket = TokenBucket(max_rate, burst) if self.enabled else None
+        self._lock = threading.Lock()
+        self._blocked_until = 0.0
+        self._last_backoff = 0.0
+        self._waiting = 0
+        AIRFLOW_API_RATE_LIMIT.labels(instance=self.instance).set(max_rate)
+
+    @property
+    def rate(self):
+        return self._bucket.rate if self.enabled else 0
+
+    def _delay(self):
+        with self._lock:
+            blocked = self._blocked_until - time.monotonic()
+        if blocked > 0:
+            return blocked
+        return self._bucket.try_acquire()
+
+    def _enter(self):
+        with self._lock:
+            self._waiting += 1
+            AIRFLOW_API_QUEUE_DEPTH.labels(instance=self.instance).set(self._waiting)
+
+    def _leave(self):
+        with self._lock:
+            self._waiting -= 1
+            AIRFLOW_API_QUEUE_DEPTH.labels(instance=self.instance).set(self._waiting)
+
+    def acquire(self):
+        """Block the calling thread until a request may be sent."""
+        if not self.enabled:
+            return
+        self._enter()
+        try:
+            while delay := self._delay():
+                time.sleep(delay)
+        finally:
+            self._leave()
+
+    async def acquire_async(self):
+        """Wait on the event loop until a request may be sent."""
+        if not self.enabled:
+            return
+        self._enter()
+        try:
+            while delay := self._delay():
+                await asyncio.sleep(delay)
+        finally:
+            self._leave()
+
+    def record(self, status, retry_after=None):
+        """Adjust the rate to the outcome of a request.
+
+        Args:
+            status: HTTP status code of the response, or None if no response
+                was received.
+            retry_after: Value of the Retry-After response header, if any.
+        """
+        if not self.enabled or status is None:
+            return
+        if status in THROTTLE_STATUSES:
+            self._back_off(status, parse_retry_after(retry_after))
+        elif 200 <= status <= 299 and self.rate < self.max_rate:
+            self._bucket.set_rate(
+                min(self.max_rate, self.rate + self.increase / self.rate)
+            )
+            AIRFLOW_API_RATE_LIMIT.labels(instance=self.instance).set(self.rate)
+
+    def _back_off(self, status, delay):
+        now = time.monotonic()
+        with self._lock:
+            if delay:
+                self._blocked_until = max(self._blocked_until, now + delay)
+            if now - self._last_backoff < self.BACKOFF_COOLDOWN:
+                return
+            self._last_backoff = now
+        rate = max(self.min_rate, self.rate * self.BACKOFF_FACTOR)
+        self._bucket.set_rate(rate)
+        AIRFLOW_API_RATE_LIMIT.labels(instance=self.instance).set(rate)
+        logger.warning(
+            "Airflow answered %s; lowering the request rate to %.2f/s and "
+            "pausing for %.1fs",
+            status,
+            rate,
+            delay or 0,
+        )
+
+
+airflow_rate_limiter = AdaptiveRateLimiter()
+airflow_in_flight = InFlightLimit()
@@ -0,0 +1,644 @@
+import functools
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+
+from config.base import (
+    OPERATOR_DRIFT_MODE,
+    OPERATOR_LIST_PAGE_SIZE,
+    OPERATOR_RECONCILE_INTERVAL,
+    OPERATOR_RECONCILE_INTERVAL_DELAY,
+    OPERATOR_WARM_SYNC_BURST,
+    OPERATOR_WARM_SYNC_RATE,
+)
+from config.fingerprint import FingerprintStore, fingerprint
+from config.instances import DEFAULT_INSTANCE, airflow_instances, instance_key
+from config.log import sampled
+from config.metrics import (
+    DRIFT_DETECTED,
+    MANAGED_RESOURCES,
+    RECONCILE_CYCLE_DURATION,
+    RECONCILIATION_FAILURES,
+    RESOURCE_OPERATIONS,
+    RESOURCE_RECONCILIATION_DURATION,
+)
+from config.ratelimit import TokenBucket
+from config.sharding import shard_coordinator
+from config.status import (
+    SYNC_PENDING,
+    error_message,
+    failed_status,
+    ready_condition,
+    status_manager,
+    sync_state,
+    synced_status,
+)
+from config.workqueue import PRIORITY_CHANGE, PRIORITY_RESYNC, work_queue
+
+logger = logging.getLogger(__name__)
+
+DRIFT_CORRECT = "correct"
+DRIFT_DETECT = "detect"
+DRIFT_MODES = (DRIFT_CORRECT, DRIFT_DETECT)
+# Drift counter field of objects missing from Airflow altogether
+MISSING_FIELD = "missing"
+
+
+@dataclass
+class IndexedResource:
+    """Snapshot of a custom resource as last seen on the watch stream.
+
+    `unresolved` holds the reason the resource may not target `instance`, for
+    example a cross-namespace reference that is not allowed. Such resources
+    are never reconciled, but garbage collection still counts their objects
+    as desired so it does not delete them.
+    """
+
+    namespace: str
+    name: str
+    spec: dict = field(default_factory=dict)
+    instance: str = DEFAULT_INSTANCE
+    generation: int | None = None
+    state: str = SYNC_PENDING
+    unresolved: str | None = None
+
+    @property
+    def count_key(self):
+        return (self.namespace, self.state, self.instance)
+
+
+class ResourceIndex:
+    """Thread-safe in-memory index of custom resources keyed by (namespace, name).
+
+    The index is fed from `kopf.on.event` handlers so it always reflects the
+    latest desired state without any extra apiserver reads. It also keeps the
+    number of resources per namespace, sync state and instance up to date on
+    every change, for the managed resources metric.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = {}
+        self._counts = Counter()
+
+    def _replace(self, key, resource):
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self._counts[previous.count_key] -= 1
+            if not self._counts[previous.count_key]:
+                del self._counts[previous.count_key]
+        if resource is not None:
+            self._items[key] = resource
+            self._counts[resource.count_key] += 1
+
+    def upsert(self, namespace, name, spec, generation=None, status=None):
+        unresolved = None
+        try:
+            instance = instance_key(namespace, spec)
+        except LookupError as e:
+            # Not reconciled; the create handler reports why in the status
+            unresolved = str(e)
+            instance = instance_key(namespace, spec, cross_namespace=True)
+        resource = IndexedResource(
+            namespace=namespace,
+            name=name,
+            spec=dict(spec or {}),
+            instance=instance,
+            generation=generation,
+            state=sync_state(status, generation),
+            unresolved=unresolved,
+        )
+        with self._lock:
+            self._replace((namespace, name), resource)
+
+    def remove(self, namespace, name):
+        with self._lock:
+            self._replace((namespace, name), None)
+
+    def get(self, namespace, name):
+        with self._lock:
+            return self._items.get((namespace, name))
+
+    def items(self):
+        with self._lock:
+            return list(self._items.values())
+
+    def counts(self):
+        """Return the number of resources per (namespace, state, instance)."""
+        with self._lock:
+            return dict(self._counts)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+
+def _normalize(value):
+    # Airflow returns empty optional strings as null; treat both the same.
+    if value == "":
+        return None
+    return value
+
+
+def diff_payload(desired, remote):
+    """Return the fields of `desired` that differ from the `remote` object.
+
+    Fields that the Airflow list endpoint does not expose (for example a
+    connection password) are not compared here; see `BulkReconciler.diff`.
+
+    Args:
+        desired: Payload built from the custom resource spec.
+        remote: Object as returned by the Airflow list endpoint, or None.
+
+    Returns:
+        List of drifted field names; every field if the object is missing.
+    """
+    if remote is None:
+        return list(desired)
+    return [
+        name
+        for name, value in desired.items()
+        if name in remote and _normalize(value) != _normalize(remote[name])
+    ]
+
+
+class BulkReconciler:
+    """Reconcile one Airflow collection against the custom resources indexing it.
+
+    Each cycle pages through the Airflow list endpoint once per Airflow
+    instance referenced by the index and diffs the result against the desired
+    payloads built from the index. Only the objects that actually drifted are
+    queued on the work queue, behind spec edits and Secret rotations, and
+    written by its workers.
+
+    Args:
+        resource_type: Metric label for the resource kind (e.g. "connection").
+        plural: Plural name of the custom resource, used to write status.
+        id_field: Payload field holding the Airflow object id.
+        collection: Key of the item list in the Airflow list response.
+        index: ResourceIndex holding the desired custom resources.
+        list_page: Callable (target, limit, offset) -> parsed list response
+            dict, where target is the `AirflowTarget` to list.
+        build_payload: Callable (name, spec, namespace) -> payload dict.
+        write: Callable (target, payload, exists) creating or patching the
+            object.
+        instances: `InstanceRegistry` resolving instance keys to targets.
+        shards: `ShardCoordinator` deciding which custom resources this
+            replica reconciles.
+        drift_mode: `correct` to write drifted objects back, or `detect` to
+            only count and report drift in the status.
+        queue: `WorkQueue` running the reconciles of single resources.
+
+    Raises:
+        ValueError: If `drift_mode` is not one of `DRIFT_MODES`.
+    """
+
+    def __init__(
+        self,
+        resource_type,
+        plural,
+        id_field,
+        collection,
+        index,
+        list_page,
+        build_payload,
+        write,
+        instances=airflow_instances,
+        shards=shard_coordinator,
+        drift_mode=OPERATOR_DRIFT_MODE,
+        queue=work_queue,
+    ):
+        if drift_mode not in DRIFT_MODES:
+            raise ValueError(
+                f"Unknown drift mode {drift_mode!r}, expected one of "
+                f"{', '.join(DRIFT_MODES)}"
+            )
+        self.resource_type = resource_type
+        self.plural = plural
+        self.id_field = id_field
+        self.collection = collection
+        self.index = index
+        self._list_page = list_page
+        self._build_payload = build_payload
+        self._write = write
+        self._instances = instances
+        self._shards = shards
+        self.drift_mode = drift_mode
+        self.queue = queue
+        self.fingerprints = FingerprintStore()
+        # (namespace, name) of resources reported as drifted in detect mode
+        self._drifted = set()
+
+    def desired_ids(self, resource):
+        """Return the ids of the Airflow objects an indexed resource produces."""
+        return {resource.name}
+
+    def snapshot(self, target):
+        """Page through the Airflow collection of `target`, indexed by object id."""
+        objects = {}
+        offset = 0
+        while True:
+            page = self._list_page(target, OPERATOR_LIST_PAGE_SIZE, offset)
+            items = page.get(self.collection) or []
+            for item in items:
+                objects[item[self.id_field]] = item
+            offset += len(items)
+            if not items or offset >= page.get("total_entries", 0):
+                return objects
+
+    def mark_synced(self, namespace, name, payload):
+        """Record that `payload` is now the state of the object in Airflow.
+
+        Returns the fingerprint entry of the push.
+        """
+        return self.fingerprints.record((namespace, name), fingerprint(payload))
+
+    def synced(self, namespace, name, payload, generation=None):
+        """Like `mark_synced`, but return the status fields describing the push."""
+        return synced_status(self.mark_synced(namespace, name, payload), generation)
+
+    def forget(self, namespace, name):
+        self.fingerprints.forget((namespace, name))
+        self._drifted.discard((namespace, name))
+
+    def diff(self, key, payload, remote):
+        """Return drifted fields, including fields hidden by the list endpoint.
+
+        Hidden fields (e.g. a connection password) cannot be read back, so they
+        count as drifted unless a fresh fingerprint shows this exact payload
+        was already pushed.
+        """
+        changed = diff_payload(payload, remote)
+        if remote is None:
+            return changed
+        hidden = [name for name in payload if name not in remote]
+        if hidden and not self.fingerprints.is_fresh(key, fingerprint(payload)):
+            changed.extend(hidden)
+        return changed
+
+    def count_drift(self, payload, remote):
+        """Count the fields on which an Airflow object differs from `payload`.
+
+        Fields hidden by the list endpoint are not counted, since they cannot
+        be read back to tell whether they differ. A missing object counts once
+        as field `missing`.
+
+        Returns:
+            List of the counted field names.
+        """
+        fields = [MISSING_FIELD] if remote is None else diff_payload(payload, remote)
+        for name in fields:
+            DRIFT_DETECTED.labels(resource_type=self.resource_type, field=name).inc()
+        return fields
+
+    def report_drift(self, key, generation, drift, synced_message="Synced to Airflow"):
+        """Report drift in the status instead of writing it back, in detect mode.
+
+        The Ready condition of a drifted resource turns False with reason
+        `Drifted` and turns True again once Airflow matches the resource.
+
+        Args:
+            key: (namespace, name) of the custom resource.
+            generation: `metadata.generation` of the custom resource.
+            drift: Description of the drift, or None if Airflow matches.
+            synced_message: Message of the Ready condition once it matches.
+        """
+        namespace, name = key
+        if drift is None:
+            if key in self._drifted:
+                self._drifted.discard(key)
+                logger.info(
+                    "%s %s/%s no longer drifts", self.resource_type, namespace, name
+                )
+                status_manager.update(
+                    self.plural,
+                    namespace,
+                    name,
+                    {"conditions": [ready_condition(True, "Synced", synced_message)]},
+                )
+            return
+        if key not in self._drifted:
+            self._drifted.add(key)
+            logger.warning("%s; not reconciling in drift detection mode", drift)
+        status_manager.update(
+            self.plural,
+            namespace,
+            name,
+            failed_status(drift, generation, reason="Drifted"),
+        )
+
+    def enqueue(
+        self,
+        namespace,
+        name,
+        priority=PRIORITY_CHANGE,
+        operation="sync",
+        limiter=None,
+    ):
+        """Queue a reconcile of an indexed resource on the work queue.
+
+        Args:
+            namespace: Namespace of the custom resource.
+            name: Name of the custom resource.
+            priority: `PRIORITY_CHANGE` or `PRIORITY_RESYNC`.
+            operation: Metric label of the reconcile, see `reconcile_one`.
+            limiter: Optional `TokenBucket` the worker acquires before each
+                Airflow write.
+        """
+        self.queue.add(
+            (self.resource_type, namespace, name),
+            functools.partial(self.reconcile_one, namespace, name, operation, limiter),
+            priority,
+        )
+
+    def reconcile_one(self, namespace, name, operation="sync", limiter=None):
+        """Push a single indexed resource if its resolved payload changed.
+
+        Run by the work queue for spec updates, changes of referenced Secrets
+        and drift found by cycles. The spec is read from the index, so it is
+        the latest one however many changes were queued. Returns True if
+        Airflow was written.
+
+        Args:
+            namespace: Namespace of the custom resource.
+            name: Name of the custom resource.
+            operation: Metric label, `update` for spec edits and `sync`
+                otherwise.
+            limiter: Optional `TokenBucket` to acquire before writing.
+        """
+        resource = self.index.get(namespace, name)
+        if resource is None or resource.unresolved:
+            return False
+        if not self._shards.owns(namespace, name):
+            return False
+        start_time = time.time()
+        try:
+            payload = self._build_payload(resource.name, resource.spec, namespace)
+            if self.fingerprints.is_fresh((namespace, name), fingerprint(payload)):
+                RESOURCE_OPERATIONS.labels(
+                    resource_type=self.resource_type,
+                    operation=operation,
+                    status="skipped",
+                ).inc()
+                if resource.generation is not None:
+                    status_manager.update(
+                        self.plural,
+                        namespace,
+                        name,
+                        {"observedGeneration": resource.generation},
+                    )
+                return False
+            target = self._instances.target(resource.instance)
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                self._write(target, payload, True)
+            except Exception as e:
+                # The object was removed from Airflow; recreate it
+                if "404" not in str(e) and "Not Found" not in str(e):
+                    raise
+                self._write(target, payload, False)
+            status_manager.update(
+                self.plural,
+                namespace,
+                name,
+                self.synced(namespace, name, payload, resource.generation),
+            )
+            RESOURCE_RECONCILIATION_DURATION.labels(
+                resource_type=self.resource_type, operation=operation
+            ).observe(time.time() - start_time)
+            RESOURCE_OPERATIONS.labels(
+                resource_type=self.resource_type, operation=operation, status="success"
+            ).inc()
+            logger.info(
+                "Synced %s %s/%s to Airflow",
+                self.resource_type,
+                namespace,
+                name,
+                extra=sampled(self.plural, namespace, name),
+            )
+            return True
+        except Exception as e:
+            RESOURCE_RECONCILIATION_DURATION.labels(
+                resource_type=self.resource_type, operation=operation
+            ).observe(time.time() - start_time)
+            RESOURCE_OPERATIONS.labels(
+                resource_type=self.resource_type, operation=operation, status="failure"
+            ).inc()
+            RECONCILIATION_FAILURES.labels(resource_type=self.resource_type).inc()
+            logger.error(
+                "Failed to reconcile %s %s/%s: %s",
+                self.resource_type,
+                namespace,
+                name,
+                e,
+            )
+            status_manager.update(
+                self.plural,
+                namespace,
+                name,
+                failed_status(
+                    f"Failed to reconcile: {error_message(e)}", resource.generation
+                ),
+            )
+            return False
+
+    def run_cycle(self, limiter=None, snapshots=None):
+        """Run one list-and-diff pass.
+
+        Returns the number of drifted objects queued to be written.
+
+        Args:
+            limiter: Optional `TokenBucket` that the workers acquire before
+                every write queued by this cycle.
+            snapshots: Optional dict of listed collections keyed by
+                (instance, collection), shared by the reconcilers of one
+                round so that each collection is listed once.
+        """
+        start_time = time.time()
+        by_instance = defaultdict(list)
+        for resource in self.index.items():
+            if resource.unresolved:
+                continue
+            # Other replicas reconcile the custom resources they own
+            if self._shards.owns(resource.namespace, resource.name):
+                by_instance[resource.instance].append(resource)
+
+        written = 0
+        for instance, resources in by_instance.items():
+            written += self._run_instance_cycle(instance, resources, limiter, snapshots)
+
+        RECONCILE_CYCLE_DURATION.labels(resource_type=self.resource_type).observe(
+            time.time() - start_time
+        )
+        return written
+
+    def _run_instance_cycle(self, instance, resources, limiter, snapshots=None):
+        written = 0
+        if snapshots is None:
+            snapshots = {}
+        try:
+            key = (instance, self.collection)
+            remote_objects = snapshots.get(key)
+            if remote_objects is None:
+                remote_objects = snapshots[key] = self.snapshot(
+                    self._instances.target(instance)
+                )
+        except Exception as e:
+            RECONCILIATION_FAILURES.labels(resource_type=self.resource_type).inc()
+            logger.error(
+                "Failed to list Airflow %ss of instance %s: %s",
+                self.resource_type,
+                instance,
+                e,
+            )
+            return written
+
+        for resource in resources:
+            written += self._reconcile_resource(resource, remote_objects, limiter)
+        return written
+
+    def _reconcile_resource(self, resource, remote_objects, limiter):
+        """Queue one indexed resource if it drifted. Returns the number queued."""
+        try:
+            payload = self._build_payload(
+                resource.name, resource.spec, resource.namespace
+            )
+            object_id = payload[self.id_field]
+            remote = remote_objects.get(object_id)
+            key = (resource.namespace, resource.name)
+            drifted = self.diff(key, payload, remote)
+            observed = self.count_drift(payload, remote) if drifted else []
+            if self.drift_mode == DRIFT_DETECT:
+                self.report_drift(
+                    key,
+                    resource.generation,
+                    f"Airflow {self.resource_type} {object_id} drifted on "
+                    f"{', '.join(sorted(observed))}"
+                    if observed
+                    else None,
+                )
+                return 0
+            if not drifted:
+                return 0
+
+            logger.info(
+                "Airflow %s %s drifted on %s; reconciling",
+                self.resource_type,
+                object_id,
+                ", ".join(sorted(drifted)),
+                extra=sampled(self.plural, resource.namespace, resource.name),
+            )
+            # Without a fingerprint the queued reconcile rewrites the same spec
+            self.fingerprints.forget(key)
+            self.enqueue(
+                resource.namespace, resource.name, PRIORITY_RESYNC, limiter=limiter
+            )
+            return 1
+        except Exception as e:
+            RESOURCE_OPERATIONS.labels(
+                resource_type=self.resource_type, operation="sync", status="failure"
+            ).inc()
+            RECONCILIATION_FAILURES.labels(resource_type=self.resource_type).inc()
+            logger.error(
+                "Failed to reconcile %s %s/%s: %s",
+                self.resource_type,
+                resource.namespace,
+                resource.name,
+                e,
+            )
+            status_manager.update(
+                self.plural,
+                resource.namespace,
+                resource.name,
+                failed_status(
+                    f"Failed to reconcile: {error_message(e)}", resource.generation
+                ),
+            )
+            return 0
+
+
+reconcilers = {}
+_stop_event = threading.Event()
+_wake_event = threading.Event()
+# Set once the first cycle after startup has run over the listed resources
+warm_synced = threading.Event()
+_thread = None
+
+
+def register(reconciler):
+    reconcilers[reconciler.resource_type] = reconciler
+    MANAGED_RESOURCES.add_source(reconciler.resource_type, reconciler.index.counts)
+    return reconciler
+
+
+def run_all_cycles(limiter=None):
+    # Single resources and sets of the same kind diff against one listing
+    snapshots = {}
+    for reconciler in list(reconcilers.values()):
+        reconciler.run_cycle(limiter, snapshots)
+
+
+def warm_sync(warm_up=None):
+    """Run the first cycle after startup without a burst of Airflow writes.
+
+    `warm_up` seeds caches in bulk (e.g. the Secret cache) before any payload
+    is built. Writes of the cycle then share one token bucket, so a restart
+    with many drifted objects becomes a rate-limited ramp.
+    """
+    if warm_up is not None:
+        try:
+            warm_up()
+        except Exception as e:
+            logger.warning("Warm-up before the first reconciliation failed: %s", e)
+    start_time = time.time()
+    try:
+        run_all_cycles(TokenBucket(OPERATOR_WARM_SYNC_RATE, OPERATOR_WARM_SYNC_BURST))
+    finally:
+        warm_synced.set()
+    logger.info("Warm sync finished in %.1fs", time.time() - start_time)
+
+
+def _run_forever(stop_event, warm_up):
+    # Wait for the initial watch listing to fill the resource indexes
+    if stop_event.wait(OPERATOR_RECONCILE_INTERVAL_DELAY):
+        return
+    warm_sync(warm_up)
+    while True:
+        _wake_event.wait(OPERATOR_RECONCILE_INTERVAL)
+        _wake_event.clear()
+        if stop_event.is_set():
+            return
+        run_all_cycles()
+
+
+def start(warm_up=None):
+    """Start the periodic bulk reconciliation loop in a daemon thread.
+
+    Args:
+        warm_up: Optional callable run once before the first, rate-limited
+            cycle; see `warm_sync`.
+    """
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop_event.clear()
+    _thread = threading.Thread(
+        target=_run_forever,
+        args=(_stop_event, warm_up),
+        name="bulk-reconciler",
+        daemon=True,
+    )
+    _thread.start()
+
+
+def wake():
+    """Run the next cycle now instead of at the end of the interval."""
+    _wake_event.set()
+
+
+def stop():
+    _stop_event.set()
+    _wake_event.set()
@@ -0,0 +1,94 @@
+import base64
+import logging
+import threading
+from collections import OrderedDict
+
+from config.base import OPERATOR_SECRET_CACHE_MAX_ENTRIES
+from config.metrics import SECRET_CACHE_ENTRIES, SECRET_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+
+def decode_secret_data(data):
+    """Decode the base64 `data` of a Secret into a dict of strings.
+
+    Values that are not valid UTF-8 cannot be used as Airflow fields and are
+    left out.
+    """
+    decoded = {}
+    for key, value in (data or {}).items():
+        try:
+            decoded[key] = base64.b64decode(value).decode("utf-8")
+        except (ValueError, TypeError):
+            logger.debug("Skipping non UTF-8 value for secret key %s", key)
+    return decoded
+
+
+class SecretCache:
+    """Bounded, thread-safe LRU cache of decoded Secret data.
+
+    Entries are keyed by (namespace, name). They are populated on the first
+    lookup and afterwards kept current by the Secret watch stream, which calls
+    `refresh` and `invalidate`, so repeated lookups never reach the apiserver.
+
+    Args:
+        max_entries: Maximum number of Secrets to keep; the least recently
+            used entry is evicted first.
+    """
+
+    def __init__(self, max_entries=OPERATOR_SECRET_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, namespace, name):
+        """Return the decoded data of a cached Secret, or None on a miss."""
+        with self._lock:
+            data = self._entries.get((namespace, name))
+            if data is not None:
+                self._entries.move_to_end((namespace, name))
+        SECRET_CACHE_LOOKUPS.labels(result="miss" if data is None else "hit").inc()
+        return data
+
+    def put(self, namespace, name, data):
+        with self._lock:
+            self._entries[(namespace, name)] = data
+            self._entries.move_to_end((namespace, name))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            SECRET_CACHE_ENTRIES.set(len(self._entries))
+
+    def replace(self, namespace, name, data):
+        """Store `data` for a Secret and return the previously cached data."""
+        with self._lock:
+            previous = self._entries.get((namespace, name))
+        self.put(namespace, name, data)
+        return previous
+
+    def refresh(self, namespace, name, data):
+        """Replace a cached entry with new data from the watch stream.
+
+        Secrets that were never looked up are ignored, so the cache only holds
+        Secrets that custom resources actually reference.
+        """
+        with self._lock:
+            if (namespace, name) in self._entries:
+                self._entries[(namespace, name)] = data
+                self._entries.move_to_end((namespace, name))
+
+    def invalidate(self, namespace, name):
+        with self._lock:
+            self._entries.pop((namespace, name), None)
+            SECRET_CACHE_ENTRIES.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            SECRET_CACHE_ENTRIES.set(0)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+
+secret_cache = SecretCache()
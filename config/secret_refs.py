@@ -0,0 +1,81 @@
+import threading
+
+
+class SecretRefIndex:
+    """Reverse index from Secret keys to the custom resources that use them.
+
+    Owners are opaque keys, typically (resource_type, namespace, name). Secret
+    references are namespaced: a custom resource can only reference Secrets
+    in its own namespace. A reference with the key None depends on every key
+    of the Secret.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (namespace, secret name) -> {secret key: set of owners}
+        self._dependents = {}
+        # owner -> set of (namespace, secret name, secret key)
+        self._refs = {}
+
+    def update(self, owner, namespace, refs):
+        """Replace the Secret references of `owner` with `refs`.
+
+        Args:
+            owner: Key identifying the custom resource.
+            namespace: Namespace the references resolve in.
+            refs: Iterable of (secret name, secret key) tuples.
+        """
+        new_refs = {(namespace, name, key) for name, key in refs}
+        with self._lock:
+            old_refs = self._refs.pop(owner, set())
+            for ref in old_refs - new_refs:
+                self._discard(ref, owner)
+            for ref_namespace, ref_name, ref_key in new_refs:
+                keys = self._dependents.setdefault((ref_namespace, ref_name), {})
+                keys.setdefault(ref_key, set()).add(owner)
+            if new_refs:
+                self._refs[owner] = new_refs
+
+    def remove(self, owner):
+        with self._lock:
+            for ref in self._refs.pop(owner, set()):
+                self._discard(ref, owner)
+
+    def _discard(self, ref, owner):
+        ref_namespace, ref_name, ref_key = ref
+        keys = self._dependents.get((ref_namespace, ref_name), {})
+        owners = keys.get(ref_key, set())
+        owners.discard(owner)
+        if not owners:
+            keys.pop(ref_key, None)
+        if not keys:
+            self._dependents.pop((ref_namespace, ref_name), None)
+
+    def is_referenced(self, namespace, secret_name):
+        with self._lock:
+            return (namespace, secret_name) in self._dependents
+
+    def secrets(self):
+        """Return every referenced Secret as a (namespace, name) tuple."""
+        with self._lock:
+            return set(self._dependents)
+
+    def dependents(self, namespace, secret_name, keys=None):
+        """Return the owners referencing a Secret.
+
+        Args:
+            namespace: Namespace of the Secret.
+            secret_name: Name of the Secret.
+            keys: Only consider references to these keys; None means any key.
+        """
+        with self._lock:
+            owners = set()
+            for ref_key, ref_owners in self._dependents.get(
+                (namespace, secret_name), {}
+            ).items():
+                if keys is None or ref_key is None or ref_key in keys:
+                    owners.update(ref_owners)
+            return owners
+
+
+secret_ref_index = SecretRefIndex()
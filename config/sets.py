@@ -0,0 +1,439 @@
+import asyncio
+import logging
+from itertools import batched
+
+from config.base import OPERATOR_SET_BATCH_SIZE
+from config.bulk import delete_object
+from config.config_maps import config_map_cache
+from config.fingerprint import fingerprint
+from config.k8s_secret import get_secret_data
+from config.log import sampled
+from config.metrics import RECONCILIATION_FAILURES, RESOURCE_OPERATIONS
+from config.ownership import written_objects
+from config.reconciler import DRIFT_DETECT, BulkReconciler
+from config.status import failed_status, status_manager, synced_status
+from config.workqueue import PRIORITY_RESYNC
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELD = "summary"
+# Keys listed in the status summary of a set; the count covers the rest
+MAX_FAILED_KEYS = 10
+
+
+def expand_sources(sources, namespace):
+    """Return the entry specs contributed by the `from` sources of a set.
+
+    Every key of a referenced ConfigMap becomes an entry with a direct value.
+    ConfigMaps are served from `config_map_cache`, which the ConfigMap watch
+    keeps current.
+    Every key of a referenced Secret becomes an entry with a `secretRef`, so
+    Secret values are only resolved when the payload is built and never stored
+    in the index.
+
+    Raises:
+        kubernetes.client.exceptions.ApiException: If a source cannot be read.
+            The whole set fails rather than losing the entries of one source.
+    """
+    entries = {}
+    for source in sources or []:
+        prefix = source.get("prefix", "")
+        if source.get("configMapRef"):
+            name = source["configMapRef"]["name"]
+            for key, value in config_map_cache.get(namespace, name).items():
+                entries[f"{prefix}{key}"] = {"value": value}
+        elif source.get("secretRef"):
+            name = source["secretRef"]["name"]
+            for key in get_secret_data(name, namespace):
+                entries[f"{prefix}{key}"] = {"secretRef": {"name": name, "key": key}}
+    return entries
+
+
+def source_secrets(sources):
+    """Return the names of the Secrets whose every key a set depends on."""
+    return {
+        source["secretRef"]["name"]
+        for source in sources or []
+        if source.get("secretRef", {}).get("name")
+    }
+
+
+def source_config_maps(sources):
+    """Return the names of the ConfigMaps whose every key a set depends on."""
+    return {
+        source["configMapRef"]["name"]
+        for source in sources or []
+        if source.get("configMapRef", {}).get("name")
+    }
+
+
+def _is_status(e, *statuses):
+    return getattr(e, "status", None) in statuses or any(
+        str(status) in str(e) for status in statuses
+    )
+
+
+class ResourceSetReconciler(BulkReconciler):
+    """Reconcile set custom resources that each hold many Airflow objects.
+
+    A set is expanded into entries, one per Airflow object, by `expand`. Entry
+    fingerprints are kept in memory only, under (namespace, set name, object
+    id). A digest over all entries is kept in the set's status instead, as
+    `lastSyncedHash` next to a summary of the synced and failed entries, so an
+    unchanged set is skipped as a whole, even right after an operator restart.
+
+    Handlers write the changed entries of a set in concurrent batches of
+    `OPERATOR_SET_BATCH_SIZE` over the asyncio transport. Reconciliation
+    cycles diff every entry against the same list snapshot that single-object
+    resources of the kind use.
+
+    Args:
+        expand: Callable (spec, namespace) -> dict of object id to entry spec.
+            Entry specs are passed to `build_payload` like the spec of a
+            single-object custom resource.
+        **kwargs: Arguments of `BulkReconciler`. `plural` names the set
+            custom resource; `collection` the Airflow collection.
+    """
+
+    def __init__(self, expand, **kwargs):
+        super().__init__(**kwargs)
+        self._expand = expand
+
+    def payloads(self, namespace, name, spec):
+        """Build the payload of every entry of a set.
+
+        Returns:
+            Tuple of (dict of object id to payload, dict of object id to the
+            error of entries whose payload could not be built).
+        """
+        payloads = {}
+        failures = {}
+        for object_id, entry in self._expand(spec, namespace).items():
+            try:
+                payloads[object_id] = self._build_payload(object_id, entry, namespace)
+            except Exception as e:
+                failures[object_id] = str(e)
+        return payloads, failures
+
+    def object_ids(self, namespace, spec):
+        return set(self._expand(spec, namespace))
+
+    def desired_ids(self, resource):
+        return self.object_ids(resource.namespace, resource.spec)
+
+    @staticmethod
+    def digest(payloads):
+        return fingerprint({key: fingerprint(value) for key, value in payloads.items()})
+
+    def _set_is_fresh(self, namespace, name, payloads, failures):
+        return not failures and self.fingerprints.is_fresh(
+            (namespace, name), self.digest(payloads)
+        )
+
+    def _entry_is_fresh(self, namespace, name, object_id, payload):
+        return self.fingerprints.is_fresh(
+            (namespace, name, object_id), fingerprint(payload)
+        )
+
+    def status(self, namespace, name, payloads, failures, generation=None):
+        """Record the outcome of a sync and return the status fields to write."""
+        total = len(payloads) + len(
+            [object_id for object_id in failures if object_id not in payloads]
+        )
+        summary = {"entries": total, "synced": total - len(failures)}
+        if failures:
+            summary["failed"] = len(failures)
+            summary["failedKeys"] = sorted(failures)[:MAX_FAILED_KEYS]
+            self.fingerprints.forget((namespace, name))
+            return {
+                SUMMARY_FIELD: summary,
+                "lastSyncedHash": None,
+                **failed_status(
+                    f"{len(failures)} of {total} entries failed",
+                    generation,
+                    reason="EntriesFailed",
+                ),
+            }
+        return {
+            SUMMARY_FIELD: summary,
+            **synced_status(
+                self.fingerprints.record((namespace, name), self.digest(payloads)),
+                generation,
+                message=f"{total} entries synced to Airflow",
+            ),
+        }
+
+    async def apply(
+        self, namespace, name, spec, removed=(), create=False, generation=None
+    ):
+        """Push the entries of a set that changed since they were last pushed.
+
+        Args:
+            namespace: Namespace of the set.
+            name: Name of the set.
+            spec: Spec of the set.
+            removed: Object ids dropped from the set, deleted from Airflow.
+            create: Whether the set is new; entries are then created first
+                and only patched if they already exist.
+            generation: `metadata.generation` of the set.
+
+        Returns:
+            Status fields to patch onto the set, or None if it is unchanged.
+        """
+        payloads, failures = await asyncio.to_thread(
+            self.payloads, namespace, name, spec
+        )
+        if not removed and self._set_is_fresh(namespace, name, payloads, failures):
+            return None
+        target = await self._instances.for_resource_async(namespace, spec)
+        changed = [
+            (object_id, payload)
+            for object_id, payload in payloads.items()
+            if not self._entry_is_fresh(namespace, name, object_id, payload)
+        ]
+
+        async def push(object_id, payload):
+            try:
+                await self._upsert(target, object_id, payload, create)
+                self.fingerprints.record(
+                    (namespace, name, object_id), fingerprint(payload)
+                )
+            except Exception as e:
+                failures[object_id] = str(e)
+
+        # Bulk requests group the entries on their own
+        batch_size = (
+            max(len(changed), 1) if target.bulk is not None else OPERATOR_SET_BATCH_SIZE
+        )
+        for batch in batched(changed, batch_size):
+            await asyncio.gather(
+                *(push(object_id, payload) for object_id, payload in batch)
+            )
+        await self.delete_entries(target, namespace, name, removed)
+        return self.status(namespace, name, payloads, failures, generation)
+
+    async def remove(self, namespace, name, spec):
+        """Delete every entry of a set from Airflow. Returns how many there were."""
+        object_ids = await asyncio.to_thread(self.object_ids, namespace, spec)
+        target = await self._instances.for_resource_async(namespace, spec)
+        await self.delete_entries(target, namespace, name, object_ids)
+        self.forget(namespace, name)
+        return len(object_ids)
+
+    async def delete_entries(self, target, namespace, name, object_ids):
+        """Delete entries of a set from Airflow, ignoring ones already gone.
+
+        Raises:
+            RuntimeError: If any entry could not be deleted.
+        """
+        failures = {}
+
+        async def delete(object_id):
+            try:
+                await delete_object(target, self.collection, object_id)
+            except Exception as e:
+                if not _is_status(e, 404):
+                    failures[object_id] = str(e)
+                    return
+            self.fingerprints.forget((namespace, name, object_id))
+
+        for batch in batched(sorted(object_ids), OPERATOR_SET_BATCH_SIZE):
+            await asyncio.gather(*(delete(object_id) for object_id in batch))
+        if failures:
+            raise RuntimeError(
+                f"Failed to delete {len(failures)} {self.collection}: "
+                f"{', '.join(sorted(failures)[:MAX_FAILED_KEYS])}"
+            )
+
+    async def _upsert(self, target, object_id, payload, create):
+        result = await self._write_entry(target, object_id, payload, create)
+        written_objects.record(target.name, self.collection, object_id)
+        return result
+
+    async def _write_entry(self, target, object_id, payload, create):
+        if target.bulk is not None:
+            return await asyncio.wrap_future(
+                target.bulk.upsert(self.collection, object_id, payload)
+            )
+        aio_client = target.aio_client
+        if create:
+            try:
+                return await aio_client.post(self.collection, payload)
+            except Exception as e:
+                if not _is_status(e, 409):
+                    raise
+            return await aio_client.patch(self.collection, object_id, payload)
+        try:
+            return await aio_client.patch(self.collection, object_id, payload)
+        except Exception as e:
+            if not _is_status(e, 404):
+                raise
+        return await aio_client.post(self.collection, payload)
+
+    def _reconcile_resource(self, resource, remote_objects, limiter):
+        namespace, name = resource.namespace, resource.name
+        try:
+            payloads, failures = self.payloads(namespace, name, resource.spec)
+        except Exception as e:
+            RECONCILIATION_FAILURES.labels(resource_type=self.resource_type).inc()
+            logger.error(
+                "Failed to expand %s %s/%s: %s", self.resource_type, namespace, name, e
+            )
+            status_manager.update(
+                self.plural,
+                namespace,
+                name,
+                failed_status(
+                    f"Failed to expand: {e}", resource.generation, "ExpandFailed"
+                ),
+            )
+            return 0
+
+        # A fresh set digest vouches for fields the list endpoint hides
+        set_verified_at = (
+            self.fingerprints.verified_at((namespace, name))
+            if self._set_is_fresh(namespace, name, payloads, failures)
+            else None
+        )
+        queued = []
+        # Entries found drifted, or not verifiable, in drift detection mode
+        drifted_entries = {}
+        unverified = False
+        for object_id, payload in payloads.items():
+            key = (namespace, name, object_id)
+            if set_verified_at is not None and (
+                not self.fingerprints.matches(key, fingerprint(payload))
+            ):
+                self.fingerprints.record(
+                    key, fingerprint(payload), verified_at=set_verified_at
+                )
+            remote = remote_objects.get(object_id)
+            drifted = self.diff(key, payload, remote)
+            if not drifted:
+                # Every field was compared, so the entry is verified as is
+                if all(field in remote for field in payload) and not (
+                    self.fingerprints.matches(key, fingerprint(payload))
+                ):
+                    self.fingerprints.record(key, fingerprint(payload))
+                continue
+            observed = self.count_drift(payload, remote)
+            if self.drift_mode == DRIFT_DETECT:
+                if observed:
+                    drifted_entries[object_id] = observed
+                else:
+                    unverified = True
+                continue
+            logger.info(
+                "Airflow %s %s of %s %s/%s drifted on %s; reconciling",
+                self.collection,
+                object_id,
+                self.resource_type,
+                namespace,
+                name,
+                ", ".join(sorted(drifted)),
+                extra=sampled(self.plural, namespace, name, object_id),
+            )
+            queued.append(object_id)
+
+        if self.drift_mode == DRIFT_DETECT:
+            total = len(payloads) + len(failures)
+            self.report_drift(
+                (namespace, name),
+                resource.generation,
+                f"{len(drifted_entries)} of {total} entries of {self.resource_type} "
+                f"{namespace}/{name} drifted: "
+                f"{', '.join(sorted(drifted_entries)[:MAX_FAILED_KEYS])}"
+                if drifted_entries
+                else None,
+                synced_message=f"{total} entries synced to Airflow",
+            )
+            # The set digest may only be recorded once every entry matches
+            if drifted_entries or unverified:
+                return 0
+        if queued:
+            # Without fingerprints the queued reconcile rewrites these entries
+            for object_id in queued:
+                self.fingerprints.forget((namespace, name, object_id))
+            self.fingerprints.forget((namespace, name))
+            self.enqueue(namespace, name, PRIORITY_RESYNC, limiter=limiter)
+            return len(queued)
+        if failures:
+            RESOURCE_OPERATIONS.labels(
+                resource_type=self.resource_type, operation="sync", status="failure"
+            ).inc()
+            RECONCILIATION_FAILURES.labels(resource_type=self.resource_type).inc()
+        # Record a new digest once the whole set was verified against Airflow
+        if failures or set_verified_at is None:
+            status_manager.update(
+                self.plural,
+                namespace,
+                name,
+                self.status(namespace, name, payloads, failures, resource.generation),
+            )
+        return 0
+
+    def reconcile_one(self, namespace, name, operation="sync", limiter=None):
+        """Push the entries of a set whose resolved payloads changed.
+
+        Run by the work queue when a referenced Secret changes or a cycle
+        found drifted entries. Returns True if Airflow was written. `limiter`
+        is an optional `TokenBucket` acquired before each entry is written.
+        """
+        resource = self.index.get(namespace, name)
+        if resource is None or resource.unresolved:
+            return False
+        if not self._shards.owns(namespace, name):
+            return False
+        try:
+            payloads, failures = self.payloads(namespace, name, resource.spec)
+            if self._set_is_fresh(namespace, name, payloads, failures):
+                RESOURCE_OPERATIONS.labels(
+                    resource_type=self.resource_type,
+                    operation=operation,
+                    status="skipped",
+                ).inc()
+                return False
+            target = self._instances.target(resource.instance)
+        except Exception as e:
+            RECONCILIATION_FAILURES.labels(resource_type=self.resource_type).inc()
+            logger.error(
+                "Failed to reconcile %s %s/%s: %s",
+                self.resource_type,
+                namespace,
+                name,
+                e,
+            )
+            return False
+
+        written = 0
+        for object_id, payload in payloads.items():
+            if self._entry_is_fresh(namespace, name, object_id, payload):
+                continue
+            if limiter is not None:
+                limiter.acquire()
+            try:
+                try:
+                    self._write(target, payload, True)
+                except Exception as e:
+                    # The object was removed from Airflow; recreate it
+                    if not _is_status(e, 404):
+                        raise
+                    self._write(target, payload, False)
+                self.fingerprints.record(
+                    (namespace, name, object_id), fingerprint(payload)
+                )
+                written += 1
+            except Exception as e:
+                failures[object_id] = str(e)
+        RESOURCE_OPERATIONS.labels(
+            resource_type=self.resource_type,
+            operation=operation,
+            status="failure" if failures else "success",
+        ).inc()
+        status_manager.update(
+            self.plural,
+            namespace,
+            name,
+            self.status(namespace, name, payloads, failures, resource.generation),
+        )
+        return written > 0
@@ -0,0 +1,339 @@
+import bisect
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from kubernetes import client
+
+from config.base import (
+    OPERATOR_SHARD_GROUP,
+    OPERATOR_SHARD_IDENTITY,
+    OPERATOR_SHARD_LEASE_DURATION,
+    OPERATOR_SHARD_NAMESPACE,
+    OPERATOR_SHARD_RENEW_INTERVAL,
+    OPERATOR_SHARDING,
+)
+from config.metrics import SHARD_MEMBERS, SHARD_REBALANCES
+
+logger = logging.getLogger(__name__)
+
+
+GROUP_LABEL = "airflow.drfaust92/shard-group"
+FINALIZER_PREFIX = "airflow.drfaust92/shard-"
+# Finalizer kopf uses when sharding is disabled
+DEFAULT_FINALIZER = "kopf.zalando.org/KopfFinalizerMarker"
+# Points per replica on the ring; more points spread keys more evenly
+VIRTUAL_NODES = 64
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.sha1(value.encode()).digest()[:8], "big")
+
+
+def member_id(identity):
+    """Return a short, label-safe id of a replica identity."""
+    return hashlib.sha1(identity.encode()).hexdigest()[:12]
+
+
+def shard_key(namespace, name):
+    return f"{namespace}/{name}"
+
+
+class HashRing:
+    """Consistent hash ring mapping keys to replicas.
+
+    Adding or removing a replica only moves the keys of that replica's
+    segments, about 1/N of all keys, instead of reshuffling everything.
+    """
+
+    def __init__(self, members=(), virtual_nodes=VIRTUAL_NODES):
+        self.members = frozenset(members)
+        points = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [member for _, member in points]
+
+    def owner(self, key):
+        """Return the replica owning `key`, or None if the ring is empty."""
+        if not self._owners:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+
+def _micro_time(timestamp):
+    # Kubernetes MicroTime, e.g. 2024-01-01T00:00:00.000000Z
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%S.%fZ"
+    )
+
+
+class ShardCoordinator:
+    """Split custom resources between operator replicas.
+
+    Every replica renews a Lease labelled with its shard group and lists the
+    Leases of its peers. Replicas whose Lease was renewed within the lease
+    duration form a consistent hash ring over (namespace, name) keys, and a
+    replica only handles the custom resources it owns on that ring.
+
+    At most one replica writes an object at a time:
+
+    - A replica that could not renew its own Lease for a lease duration stops
+      owning anything, because its peers already consider it gone.
+    - After the membership changes, keys taken over from a replica that is
+      still alive are only owned once a lease duration has passed. By then
+      the previous owner has seen the new ring or stopped owning anything.
+
+    Args:
+        enabled: Whether sharding is on; if not, every key is owned.
+        identity: Unique name of this replica, e.g. its pod name.
+        namespace: Namespace of the Leases.
+        group: Shard group; replicas of one deployment share it.
+        lease_duration: Seconds after which an unrenewed Lease is expired.
+        renew_interval: Seconds between renewals.
+        api: Optional `CoordinationV1Api`; created on first use.
+        clock: Callable returning the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        enabled=OPERATOR_SHARDING,
+        identity=OPERATOR_SHARD_IDENTITY,
+        namespace=OPERATOR_SHARD_NAMESPACE,
+        group=OPERATOR_SHARD_GROUP,
+        lease_duration=OPERATOR_SHARD_LEASE_DURATION,
+        renew_interval=OPERATOR_SHARD_RENEW_INTERVAL,
+        api=None,
+        clock=time.time,
+    ):
+        self.enabled = enabled
+        self.identity = identity
+        self.namespace = namespace
+        self.group = group
+        self.lease_duration = lease_duration
+        self.renew_interval = renew_interval
+        self._api = api
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._ring = HashRing()
+        # Ring before the last membership change, while keys are handed over
+        self._stable = HashRing()
+        self._changed_at = None
+        self._handover_pending = False
+        self._renewed_at = None
+        self._on_change = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def lease_name(self):
+        return f"{self.group}-{member_id(self.identity)}"
+
+    @property
+    def finalizer(self):
+        """Finalizer of this replica; kopf must use it instead of its default."""
+        return f"{FINALIZER_PREFIX}{member_id(self.identity)}"
+
+    def members(self):
+        with self._lock:
+            return self._ring.members
+
+    def owns(self, namespace, name):
+        """Return whether this replica handles the custom resource."""
+        if not self.enabled:
+            return True
+        key = shard_key(namespace, name)
+        now = self._clock()
+        with self._lock:
+            if self._renewed_at is None or now - self._renewed_at >= (
+                self.lease_duration
+            ):
+                return False
+            if self._ring.owner(key) != self.identity:
+                return False
+            if now - self._changed_at >= self.lease_duration:
+                return True
+            # Handover: keys of replicas that are gone can be taken right away
+            previous = self._stable.owner(key)
+            return (
+                previous is None
+                or previous == self.identity
+                or previous not in self._ring.members
+            )
+
+    def stale_finalizers(self, finalizers):
+        """Return the finalizers left on an object by replicas that are gone."""
+        live = {f"{FINALIZER_PREFIX}{member_id(member)}" for member in self.members()}
+        return [
+            finalizer
+            for finalizer in finalizers or []
+            if finalizer == DEFAULT_FINALIZER
+            or (finalizer.startswith(FINALIZER_PREFIX) and finalizer not in live)
+        ]
+
+    def _coordination_api(self):
+        if self._api is None:
+            self._api = client.CoordinationV1Api()
+        return self._api
+
+    def _renew(self, now):
+        body = {
+            "metadata": {"name": self.lease_name, "labels": {GROUP_LABEL: self.group}},
+            "spec": {
+                "holderIdentity": self.identity,
+                "leaseDurationSeconds": self.lease_duration,
+                "renewTime": _micro_time(now),
+            },
+        }
+        api = self._coordination_api()
+        try:
+            api.patch_namespaced_lease(self.lease_name, self.namespace, body)
+        except client.exceptions.ApiException as e:
+            if e.status != 404:
+                raise
+            api.create_namespaced_lease(
+                self.namespace,
+                {"apiVersion": "coordination.k8s.io/v1", "kind": "Lease", **body},
+            )
+
+    def _live_members(self, now):
+        leases = self._coordination_api().list_namespaced_lease(
+            self.namespace, label_selector=f"{GROUP_LABEL}={self.group}"
+        )
+        members = {self.identity}
+        for lease in leases.items:
+            spec = lease.spec
+            if not spec or not spec.holder_identity or not spec.renew_time:
+                continue
+            duration = spec.lease_duration_seconds or self.lease_duration
+            if spec.renew_time.timestamp() + duration > now:
+                members.add(spec.holder_identity)
+        return frozenset(members)
+
+    def _update_members(self, members, now):
+        if members == self._ring.members:
+            return False
+        if self._changed_at is None:
+            # Peers owned everything before this replica joined
+            self._stable = HashRing(members - {self.identity})
+        elif now - self._changed_at >= self.lease_duration:
+            self._stable = self._ring
+        self._ring = HashRing(members)
+        self._changed_at = now
+        self._handover_pending = True
+        return True
+
+    def heartbeat(self):
+        """Renew this replica's Lease and refresh the ring from its peers."""
+        now = self._clock()
+        try:
+            self._renew(now)
+            members = self._live_members(now)
+        except Exception as e:
+            logger.warning("Failed to renew shard lease %s: %s", self.lease_name, e)
+            return
+        with self._lock:
+            self._renewed_at = now
+            changed = self._update_members(members, now)
+            handed_over = self._handover_pending and (
+                now - self._changed_at >= self.lease_duration
+            )
+            if handed_over:
+                self._handover_pending = False
+        SHARD_MEMBERS.set(len(members))
+        if changed:
+            SHARD_REBALANCES.inc()
+            logger.info(
+                "Shard group %s has %s replicas; rebalancing custom resources",
+                self.group,
+                len(members),
+            )
+        if (changed or handed_over) and self._on_change is not None:
+            self._on_change()
+
+    def _run(self):
+        while not self._stop_event.wait(self.renew_interval):
+            self.heartbeat()
+
+    def start(self, on_change=None):
+        """Join the shard group and keep renewing the Lease in a daemon thread.
+
+        Args:
+            on_change: Optional callable run when this replica may have
+                gained custom resources, e.g. to start a reconciliation cycle.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._on_change = on_change
+        self._stop_event.clear()
+        self.heartbeat()
+        self._thread = threading.Thread(
+            target=self._run, name="shard-coordinator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Leave the shard group so that peers take over right away."""
+        self._stop_event.set()
+        with self._lock:
+            self._renewed_at = None
+        if not self.enabled:
+            return
+        try:
+            self._coordination_api().delete_namespaced_lease(
+                self.lease_name, self.namespace
+            )
+        except Exception as e:
+            logger.warning("Failed to release shard lease %s: %s", self.lease_name, e)
+
+    def release_stale_finalizers(self, plural, namespace, name, finalizers):
+        """Remove the finalizers of gone replicas from a deleted custom resource.
+
+        A replica's finalizer is only removed by that replica, so a replica
+        that disappears would block the deletion forever. The owner removes
+        such finalizers once its own one is gone, i.e. after its delete
+        handler ran. JSON patch `test` operations make the patch fail instead
+        of removing the wrong entry if the list changed meanwhile.
+        """
+        finalizers = list(finalizers or [])
+        if not self.enabled or not self.owns(namespace, name):
+            return False
+        stale = self.stale_finalizers(finalizers)
+        if not stale or self.finalizer in finalizers:
+            return False
+        operations = []
+        for index in sorted(
+            (finalizers.index(finalizer) for finalizer in stale), reverse=True
+        ):
+            path = f"/metadata/finalizers/{index}"
+            operations.append({"op": "test", "path": path, "value": finalizers[index]})
+            operations.append({"op": "remove", "path": path})
+        client.CustomObjectsApi().patch_namespaced_custom_object(
+            group="airflow.drfaust92",
+            version="v1beta1",
+            namespace=namespace,
+            plural=plural,
+            name=name,
+            body=operations,
+        )
+        logger.info(
+            "Released finalizers %s of gone replicas from %s %s/%s",
+            ", ".join(stale),
+            plural,
+            namespace,
+            name,
+        )
+        return True
+
+
+shard_coordinator = ShardCoordinator()
+
+
+def owns_resource(namespace, name, **kwargs):
+    """kopf `when` filter: whether this replica handles the custom resource."""
+    return shard_coordinator.owns(namespace, name)
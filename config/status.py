@@ -0,0 +1,322 @@
+import datetime
+import logging
+import threading
+import time
+
+from kubernetes import client
+
+from config.base import OPERATOR_STATUS_COALESCE_WINDOW
+from config.fingerprint import CRD_GROUP, CRD_VERSION, STATUS_FIELD
+from config.metrics import STATUS_WRITES
+
+logger = logging.getLogger(__name__)
+
+
+READY = "Ready"
+
+# Sync states of custom resources, derived from their status
+SYNC_PENDING = "pending"
+SYNC_SYNCED = "synced"
+SYNC_FAILED = "failed"
+SYNC_DRIFTED = "drifted"
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def ready_condition(ready, reason, message):
+    return {
+        "type": READY,
+        "status": "True" if ready else "False",
+        "reason": reason,
+        "message": message,
+        "lastTransitionTime": _now(),
+    }
+
+
+def synced_status(status_entry, generation=None, message="Synced to Airflow"):
+    """Return the status fields of an object that was just pushed to Airflow.
+
+    Args:
+        status_entry: Fingerprint entry returned by `FingerprintStore.record`.
+        generation: `metadata.generation` of the pushed spec, if known.
+        message: Message of the Ready condition.
+    """
+    fields = {
+        "lastSyncedHash": status_entry["hash"],
+        "lastSyncTime": status_entry["verifiedAt"],
+        "conditions": [ready_condition(True, "Synced", message)],
+    }
+    if generation is not None:
+        fields["observedGeneration"] = generation
+    return fields
+
+
+def error_message(error):
+    """Describe an error for a status message the same way on every attempt.
+
+    HTTP errors are described by their status and reason only. Their body can
+    echo the request payload and changes between attempts, which would defeat
+    coalescing; it is only logged.
+    """
+    status = getattr(error, "status", None)
+    if not isinstance(status, int):
+        return str(error)
+    reason = getattr(error, "reason", None)
+    return f"HTTP {status} {reason}" if reason else f"HTTP {status}"
+
+
+def failed_status(message, generation=None, reason="SyncFailed"):
+    """Return the status fields of an object that could not be pushed."""
+    fields = {"conditions": [ready_condition(False, reason, message)]}
+    if generation is not None:
+        fields["observedGeneration"] = generation
+    return fields
+
+
+def sync_entry(status):
+    """Return the fingerprint entry recorded in a status, for seeding after a restart."""
+    status = status or {}
+    if status.get("lastSyncedHash"):
+        return {
+            "hash": status["lastSyncedHash"],
+            "verifiedAt": status.get("lastSyncTime"),
+        }
+    # Written by operator versions before structured status
+    return status.get(STATUS_FIELD)
+
+
+def generation_synced(meta, status):
+    """Return whether the current spec generation was already synced to Airflow.
+
+    Kubernetes bumps `metadata.generation` on every spec change but not on
+    metadata or status changes. A generation that was observed with a Ready
+    condition therefore has nothing new to push; a changed referenced Secret
+    is picked up by the Secret watch instead.
+    """
+    status = status or {}
+    generation = meta.get("generation")
+    observed = status.get("observedGeneration")
+    if generation is None or observed is None or observed < generation:
+        return False
+    return any(
+        condition.get("type") == READY and condition.get("status") == "True"
+        for condition in status.get("conditions") or []
+    )
+
+
+def sync_state(status, generation=None):
+    """Return the sync state of a custom resource from its stored status.
+
+    A resource is `pending` until its current spec generation has been
+    observed with a Ready condition, then `synced`, `drifted` when a
+    detect-only cycle found drift, or `failed`.
+    """
+    status = status or {}
+    observed = status.get("observedGeneration")
+    if generation is not None and (observed is None or observed < generation):
+        return SYNC_PENDING
+    for condition in status.get("conditions") or []:
+        if condition.get("type") != READY:
+            continue
+        if condition.get("status") == "True":
+            return SYNC_SYNCED
+        if condition.get("reason") == "Drifted":
+            return SYNC_DRIFTED
+        return SYNC_FAILED
+    return SYNC_PENDING
+
+
+def _comparable(conditions):
+    return sorted(
+        (
+            {
+                key: value
+                for key, value in condition.items()
+                if key != "lastTransitionTime"
+            }
+            for condition in conditions or []
+        ),
+        key=lambda condition: condition.get("type", ""),
+    )
+
+
+def _merge_conditions(previous, conditions):
+    # A condition keeps its transition time while its status stays the same
+    merged = {condition.get("type"): condition for condition in previous or []}
+    for condition in conditions:
+        known = merged.get(condition["type"])
+        if known is not None and known.get("status") == condition["status"]:
+            condition = {
+                **condition,
+                "lastTransitionTime": known.get(
+                    "lastTransitionTime", condition["lastTransitionTime"]
+                ),
+            }
+        merged[condition["type"]] = condition
+    return list(merged.values())
+
+
+def status_changes(known, fields):
+    """Return the subset of `fields` that would change the `known` status.
+
+    Conditions are merged into the known ones; a condition only counts as
+    changed if anything besides its transition time differs.
+    """
+    known = known or {}
+    changes = {}
+    for name, value in fields.items():
+        if name == "conditions":
+            value = _merge_conditions(known.get("conditions"), value)
+            if _comparable(value) == _comparable(known.get("conditions")):
+                continue
+        elif known.get(name) == value:
+            continue
+        changes[name] = value
+    return changes
+
+
+def write_status(plural, namespace, name, fields):
+    """Merge `fields` into the status subresource of a custom resource."""
+    client.CustomObjectsApi().patch_namespaced_custom_object_status(
+        CRD_GROUP, CRD_VERSION, namespace, plural, name, {"status": fields}
+    )
+
+
+class StatusManager:
+    """Write the status of custom resources only when it meaningfully changes.
+
+    The manager tracks the status last seen on the watch stream or written by
+    the operator for each object. Kopf handlers add their changes to the
+    handler's own patch with `apply`, so kopf sends them with its own PATCH.
+    Everything else, such as reconciliation cycles, queues changes with
+    `update`: the updates of one object within `window` seconds are merged and
+    sent as one PATCH, and nothing is sent if the merged status equals the
+    known one. This avoids writes, and the watch events they cause, when a
+    sync does not change anything.
+
+    Args:
+        window: Seconds to collect updates of one object before writing.
+        write: Callable (plural, namespace, name, fields) patching the status.
+        clock: Monotonic clock returning seconds.
+    """
+
+    def __init__(
+        self,
+        window=OPERATOR_STATUS_COALESCE_WINDOW,
+        write=write_status,
+        clock=time.monotonic,
+    ):
+        self.window = window
+        self._write = write
+        self._clock = clock
+        self._condition = threading.Condition()
+        # (plural, namespace, name) -> status as stored on the object
+        self._known = {}
+        # (plural, namespace, name) -> (due time, fields to merge)
+        self._pending = {}
+        self._stopped = False
+        self._thread = None
+
+    def observe(self, plural, namespace, name, status):
+        """Record the status of an object as seen on the watch stream."""
+        with self._condition:
+            self._known[(plural, namespace, name)] = dict(status or {})
+
+    def forget(self, plural, namespace, name):
+        with self._condition:
+            self._known.pop((plural, namespace, name), None)
+            self._pending.pop((plural, namespace, name), None)
+
+    def apply(self, patch, plural, namespace, name, fields):
+        """Add the changed `fields` to the status patch of a kopf handler.
+
+        Returns the fields that were added.
+        """
+        key = (plural, namespace, name)
+        with self._condition:
+            changes = status_changes(self._known.get(key), fields)
+            self._known.setdefault(key, {}).update(changes)
+        for field_name, value in changes.items():
+            patch.status[field_name] = value
+        return changes
+
+    def update(self, plural, namespace, name, fields):
+        """Queue status fields to be merged and written within the window."""
+        key = (plural, namespace, name)
+        with self._condition:
+            due, pending = self._pending.get(key, (self._clock() + self.window, {}))
+            pending.update(fields)
+            self._pending[key] = (due, pending)
+            self._condition.notify()
+
+    def flush(self, force=False):
+        """Write the queued updates that are due, or all of them if `force`.
+
+        Returns the number of status PATCH requests sent.
+        """
+        now = self._clock()
+        writes = []
+        with self._condition:
+            for key, (due, fields) in list(self._pending.items()):
+                if not force and due > now:
+                    continue
+                del self._pending[key]
+                changes = status_changes(self._known.get(key), fields)
+                if not changes:
+                    STATUS_WRITES.labels(result="skipped").inc()
+                    continue
+                self._known.setdefault(key, {}).update(changes)
+                writes.append((key, changes))
+
+        for (plural, namespace, name), changes in writes:
+            try:
+                self._write(plural, namespace, name, changes)
+                STATUS_WRITES.labels(result="written").inc()
+            except Exception as e:
+                # The fingerprint store in memory stays authoritative; the
+                # status is rewritten on the next change
+                STATUS_WRITES.labels(result="failed").inc()
+                with self._condition:
+                    self._known.pop((plural, namespace, name), None)
+                logger.warning(
+                    "Failed to write status of %s %s/%s: %s", plural, namespace, name, e
+                )
+        return len(writes)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                if self._pending:
+                    next_due = min(due for due, _ in self._pending.values())
+                    timeout = max(0.0, next_due - self._clock())
+                else:
+                    timeout = None
+                if timeout is None or timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+            self.flush()
+
+    def start(self):
+        """Write queued updates from a daemon thread as they become due."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condition:
+            self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name="status-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and write everything still queued."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.flush(force=True)
+
+
+status_manager = StatusManager()
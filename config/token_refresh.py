@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+
+from config.metrics import (
+    RECONCILE_PHASE_DURATION,
+    TOKEN_REFRESH_DURATION,
+    TOKEN_REFRESHES,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRefresher:
+    """Single-flight, proactive refresher for short-lived credentials.
+
+    Only one refresh runs at a time; callers arriving while it is in flight
+    wait for its result instead of starting their own. After the first
+    successful refresh a daemon thread renews the credentials `lead` seconds
+    before they enter the `grace` period, so requests normally never wait for
+    a token round trip.
+
+    Args:
+        auth_type: Metric label for the credentials (e.g. "aws").
+        refresh: Callable obtaining new credentials and returning their expiry
+            as a Unix timestamp. It raises on failure.
+        grace: Seconds before expiry at which credentials count as expired.
+        lead: Seconds before the grace period at which the background thread
+            renews them.
+        retry_interval: Seconds between background attempts after a failure.
+    """
+
+    def __init__(self, auth_type, refresh, grace=60, lead=120, retry_interval=10):
+        self.auth_type = auth_type
+        self.grace = grace
+        self.lead = lead
+        self.retry_interval = retry_interval
+        self._refresh = refresh
+        self._lock = threading.Lock()
+        self._expires_at = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def needs_refresh(self, now=None):
+        """Return True if the credentials are missing or within the grace period."""
+        expires_at = self._expires_at
+        if expires_at is None:
+            return True
+        return expires_at - (now or time.time()) <= self.grace
+
+    def ensure_fresh(self):
+        """Make sure valid credentials are available, refreshing if required."""
+        if not self.needs_refresh():
+            return
+        with self._lock:
+            # Another caller may have refreshed while we waited for the lock
+            if self.needs_refresh():
+                self._run_refresh("request")
+        self._start()
+
+    def _run_refresh(self, trigger):
+        start_time = time.time()
+        try:
+            self._expires_at = self._refresh()
+        except Exception:
+            TOKEN_REFRESHES.labels(
+                auth_type=self.auth_type, trigger=trigger, status="failure"
+            ).inc()
+            raise
+        finally:
+            duration = time.time() - start_time
+            TOKEN_REFRESH_DURATION.labels(auth_type=self.auth_type).observe(duration)
+            if trigger == "request":
+                RECONCILE_PHASE_DURATION.labels(phase="token_refresh").observe(duration)
+        TOKEN_REFRESHES.labels(
+            auth_type=self.auth_type, trigger=trigger, status="success"
+        ).inc()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run_forever,
+                    name=f"{self.auth_type}-token-refresher",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _run_forever(self):
+        delay = self._next_delay()
+        while not self._stop_event.wait(delay):
+            try:
+                with self._lock:
+                    self._run_refresh("background")
+                delay = self._next_delay()
+            except Exception as e:
+                logger.warning(
+                    "Background %s token refresh failed, retrying in %ss: %s",
+                    self.auth_type,
+                    self.retry_interval,
+                    e,
+                )
+                delay = self.retry_interval
+
+    def _next_delay(self):
+        if self._expires_at is None:
+            return self.retry_interval
+        # Short-lived tokens must not turn the loop into a busy refresh cycle
+        return max(
+            self._expires_at - self.grace - self.lead - time.time(),
+            self.retry_interval,
+        )
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,179 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from config.base import OPERATOR_WORKERS
+from config.metrics import WORKQUEUE_DEDUPLICATED, WORKQUEUE_DEPTH, WORKQUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+
+# Lower values run first
+PRIORITY_CHANGE = 0  # spec edits and Secret rotations
+PRIORITY_RESYNC = 1  # drift found by reconciliation cycles
+PRIORITY_NAMES = {PRIORITY_CHANGE: "change", PRIORITY_RESYNC: "resync"}
+
+
+@dataclass
+class _Item:
+    work: Callable[[], object]
+    priority: int
+    sequence: int
+    added_at: float
+
+
+class WorkQueue:
+    """Reconcile custom resources from worker threads, at most once per key.
+
+    Work is keyed by (resource type, namespace, name). Adding a key that is
+    already waiting merges the two: the item keeps its place and the higher
+    of both priorities, and runs the work of the higher-priority add. Work
+    reads the latest spec from the resource index when it runs, so a burst of
+    edits turns into one Airflow write. A key added while its work is running
+    is queued again once it finishes. Waiting keys run by priority, then in
+    the order they were first added.
+
+    Args:
+        workers: Number of worker threads started by `start`.
+        clock: Monotonic clock returning seconds.
+    """
+
+    def __init__(self, workers=OPERATOR_WORKERS, clock=time.monotonic):
+        self.workers = workers
+        self._clock = clock
+        self._condition = threading.Condition()
+        # Heap of (priority, sequence, key); entries of merged items go stale
+        self._heap = []
+        self._pending = {}
+        self._running = set()
+        # Items added while their key was running
+        self._requeued = {}
+        self._sequence = itertools.count()
+        self._stopped = False
+        self._threads = []
+
+    def __len__(self):
+        with self._condition:
+            return len(self._pending) + len(self._requeued)
+
+    def _merge(self, known, key, work, priority):
+        if known is None:
+            return _Item(work, priority, next(self._sequence), self._clock())
+        WORKQUEUE_DEDUPLICATED.labels(resource_type=key[0]).inc()
+        if priority > known.priority:
+            return known
+        return _Item(work, priority, known.sequence, known.added_at)
+
+    def _push(self, key, item, known=None):
+        if known is not None:
+            if known.priority == item.priority:
+                self._pending[key] = item
+                return
+            WORKQUEUE_DEPTH.labels(priority=PRIORITY_NAMES[known.priority]).dec()
+        self._pending[key] = item
+        heapq.heappush(self._heap, (item.priority, item.sequence, key))
+        WORKQUEUE_DEPTH.labels(priority=PRIORITY_NAMES[item.priority]).inc()
+        self._condition.notify()
+
+    def add(self, key, work, priority=PRIORITY_CHANGE):
+        """Queue `work` for `key`, merging it with work already waiting.
+
+        Args:
+            key: Tuple (resource type, namespace, name).
+            work: Callable without arguments reconciling the resource.
+            priority: `PRIORITY_CHANGE` or `PRIORITY_RESYNC`.
+        """
+        with self._condition:
+            if key in self._running:
+                # The running work may have read an older spec
+                self._requeued[key] = self._merge(
+                    self._requeued.get(key), key, work, priority
+                )
+                return
+            known = self._pending.get(key)
+            self._push(key, self._merge(known, key, work, priority), known)
+
+    def _pop(self):
+        while self._heap:
+            priority, sequence, key = heapq.heappop(self._heap)
+            item = self._pending.get(key)
+            if item is None or (item.priority, item.sequence) != (priority, sequence):
+                continue
+            del self._pending[key]
+            self._running.add(key)
+            name = PRIORITY_NAMES[priority]
+            WORKQUEUE_DEPTH.labels(priority=name).dec()
+            WORKQUEUE_WAIT.labels(priority=name).observe(self._clock() - item.added_at)
+            return key, item
+        return None
+
+    def _process(self, key, item):
+        try:
+            item.work()
+        except Exception as e:
+            logger.error("Failed to reconcile %s: %s", "/".join(key), e)
+        finally:
+            with self._condition:
+                self._running.discard(key)
+                requeued = self._requeued.pop(key, None)
+                if requeued is not None:
+                    self._push(key, requeued, self._pending.get(key))
+
+    def drain(self):
+        """Run waiting work in the calling thread until the queue is empty.
+
+        Returns the number of items processed.
+        """
+        processed = 0
+        while True:
+            with self._condition:
+                popped = self._pop()
+            if popped is None:
+                return processed
+            self._process(*popped)
+            processed += 1
+
+    def _run(self):
+        while True:
+            with self._condition:
+                popped = None
+                while not self._stopped:
+                    popped = self._pop()
+                    if popped is not None:
+                        break
+                    self._condition.wait()
+                if popped is None:
+                    return
+            self._process(*popped)
+
+    def start(self):
+        """Start the worker threads."""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        with self._condition:
+            self._stopped = False
+        self._threads = [
+            threading.Thread(
+                target=self._run, name=f"reconcile-worker-{i}", daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """Stop the workers once their current work is done.
+
+        Waiting work is dropped; the next reconciliation cycle after a
+        restart finds whatever it would have changed.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+
+work_queue = WorkQueue()
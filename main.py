@@ -1,13 +1,131 @@
+import asyncio
 import datetime
 
 import kopf
 import prometheus_client as prometheus
 
 import resources.connections  # noqa: F401
+import resources.instances  # noqa: F401
 import resources.pools  # noqa: F401
+import resources.secrets  # noqa: F401
+import resources.sets  # noqa: F401
+import resources.shards  # noqa: F401
 import resources.variables  # noqa: F401
+from config import log, reconciler
+from config.base import OPERATOR_AUTH_STARTUP_TIMEOUT
+from config.gc import orphan_collector
+from config.instances import airflow_instances
+from config.k8s_secret import prefetch_secrets
+from config.secret_refs import secret_ref_index
+from config.sharding import shard_coordinator
+from config.status import status_manager
+from config.workqueue import work_queue
 
-prometheus.start_http_server(9000)
+
+@kopf.on.startup()
+def start_log_writer(settings, **kwargs):
+    # Registered first, so that the other startup handlers already log through it
+    log.start(settings)
+
+
+@kopf.on.startup()
+def configure_sharding(settings, logger, **kwargs):
+    if not shard_coordinator.enabled:
+        return
+    # Replicas split the custom resources instead of electing one active peer.
+    # Each replica uses its own finalizer, so a replica never releases an
+    # object that another one still has to clean up.
+    settings.peering.standalone = True
+    settings.persistence.finalizer = shard_coordinator.finalizer
+    shard_coordinator.start(on_change=reconciler.wake)
+    logger.info(
+        "Sharding enabled as %s with %s replicas",
+        shard_coordinator.identity,
+        len(shard_coordinator.members()),
+    )
+
+
+@kopf.on.startup()
+def start_metrics_server(**kwargs):
+    prometheus.start_http_server(9000)
+
+
+@kopf.on.startup()
+async def authenticate_airflow_client(logger, **kwargs):
+    # Obtain credentials of the default instance now rather than on the first
+    # reconcile, but never hold up startup for longer than the timeout;
+    # requests retry on their own. Other instances authenticate on first use.
+    def authenticate():
+        airflow_instances.target().api_client.auth_headers()
+
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(authenticate), OPERATOR_AUTH_STARTUP_TIMEOUT
+        )
+    except TimeoutError:
+        logger.warning(
+            "Airflow authentication did not finish within %ss; continuing startup",
+            OPERATOR_AUTH_STARTUP_TIMEOUT,
+        )
+    except Exception as e:
+        logger.error("Airflow authentication failed at startup: %s", e)
+
+
+@kopf.on.startup()
+def start_status_writer(**kwargs):
+    status_manager.start()
+
+
+@kopf.on.startup()
+def start_work_queue(**kwargs):
+    work_queue.start()
+
+
+@kopf.on.startup()
+def start_bulk_reconciler(**kwargs):
+    # Seed the Secret cache in bulk, then run a rate-limited first cycle
+    reconciler.start(warm_up=lambda: prefetch_secrets(secret_ref_index.secrets()))
+
+
+@kopf.on.startup()
+def start_orphan_collector(**kwargs):
+    orphan_collector.start()
+
+
+@kopf.on.cleanup()
+def stop_bulk_reconciler(**kwargs):
+    reconciler.stop()
+
+
+@kopf.on.cleanup()
+def stop_orphan_collector(**kwargs):
+    orphan_collector.stop()
+
+
+@kopf.on.cleanup()
+def stop_work_queue(**kwargs):
+    work_queue.stop()
+
+
+@kopf.on.cleanup()
+def stop_status_writer(**kwargs):
+    # Write the status updates still waiting for their coalescing window
+    status_manager.stop()
+
+
+@kopf.on.cleanup()
+def leave_shard_group(**kwargs):
+    shard_coordinator.stop()
+
+
+@kopf.on.cleanup()
+async def close_airflow_sessions(**kwargs):
+    await airflow_instances.close()
+
+
+@kopf.on.cleanup()
+def stop_log_writer(**kwargs):
+    log.stop()
 
 
 @kopf.on.probe(id="now")
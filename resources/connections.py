@@ -1,57 +1,155 @@
+import asyncio
+import json
 import time
 
 import kopf
 from airflow_client.client.api.connection_api import ConnectionApi
 from airflow_client.client.model.connection import Connection
 
-from config.base import OPERATOR_RECONCILE_INTERVAL, OPERATOR_RECONCILE_INTERVAL_DELAY
-from config.client import api_client
-from config.k8s_secret import resolve_value
+from config import reconciler
+from config.bulk import create_object, delete_object
+from config.instances import airflow_instances
+from config.k8s_secret import resolve_value, secret_refs
+from config.log import redact_error, sampled
 from config.metrics import (
-    MANAGED_RESOURCES,
+    RECONCILE_PHASE_DURATION,
     RECONCILIATION_FAILURES,
     RESOURCE_OPERATIONS,
     RESOURCE_RECONCILIATION_DURATION,
 )
+from config.payloads import PayloadSchema, write_object
+from config.secret_refs import secret_ref_index
+from config.sharding import owns_resource
+from config.status import (
+    error_message,
+    failed_status,
+    generation_synced,
+    status_manager,
+    sync_entry,
+)
+
+connection_index = reconciler.ResourceIndex()
+
+
+def connection_payload(connection_id, spec, namespace, logger=None):
+    """Build the Airflow connection payload for a Connection spec.
+
+    Sensitive fields are resolved from direct values or secret references.
+    """
+    # Resolve sensitive fields from direct values or secret references; timed
+    # as the secret_resolve phase, separately from building the payload
+    login = (
+        resolve_value(spec.get("login"), namespace, logger=logger)
+        if spec.get("login")
+        else None
+    )
+    password = (
+        resolve_value(spec.get("password"), namespace, logger=logger)
+        if spec.get("password")
+        else None
+    )
 
-connections_api = ConnectionApi(api_client=api_client)
+    with RECONCILE_PHASE_DURATION.labels(phase="payload_build").time():
+        payload = {
+            "connection_id": connection_id,
+            "conn_type": spec.get("connType"),
+            "description": spec.get("description"),
+            "host": spec.get("host"),
+            "login": login,
+            "port": spec.get("port"),
+            "schema": spec.get("schema"),
+            "extra": spec.get("extra"),
+        }
+        # The Airflow API does not accept a null password
+        if password is not None:
+            payload["password"] = password
+    return payload
+
+
+def list_connections(target, limit, offset):
+    response = target.api(ConnectionApi).get_connections(
+        limit=limit, offset=offset, _preload_content=False
+    )
+    return json.loads(response.data)
+
+
+CONNECTION_SCHEMA = PayloadSchema(Connection)
+
+
+def write_connection(target, payload, exists):
+    write_object(
+        target,
+        "connections",
+        CONNECTION_SCHEMA,
+        payload["connection_id"],
+        payload,
+        exists,
+    )
 
 
-@kopf.on.create("airflow.drfaust92", "v1beta1", "connections")
-def create_connection(meta, spec, namespace, logger, body, **kwargs):
+connection_reconciler = reconciler.register(
+    reconciler.BulkReconciler(
+        resource_type="connection",
+        plural="connections",
+        id_field="connection_id",
+        collection="connections",
+        index=connection_index,
+        list_page=list_connections,
+        build_payload=connection_payload,
+        write=write_connection,
+    )
+)
+
+
+@kopf.on.event("airflow.drfaust92", "v1beta1", "connections")
+def index_connection(event, meta, spec, status, namespace, **kwargs):
+    owner = ("connection", namespace, meta.get("name"))
+    if event["type"] == "DELETED" or meta.get("deletionTimestamp"):
+        connection_index.remove(namespace, meta.get("name"))
+        status_manager.forget("connections", namespace, meta.get("name"))
+        secret_ref_index.remove(owner)
+    else:
+        connection_index.upsert(
+            namespace, meta.get("name"), spec, meta.get("generation"), status
+        )
+        secret_ref_index.update(
+            owner, namespace, secret_refs(spec.get("login"), spec.get("password"))
+        )
+        # Re-seed fingerprints persisted before an operator restart
+        connection_reconciler.fingerprints.seed(
+            (namespace, meta.get("name")), sync_entry(status)
+        )
+        status_manager.observe("connections", namespace, meta.get("name"), status)
+
+
+@kopf.on.create("airflow.drfaust92", "v1beta1", "connections", when=owns_resource)
+async def create_connection(meta, spec, namespace, logger, body, patch, **kwargs):
     connection_id = meta.get("name")
     var_conn_type = spec.get("connType")
 
     logger.info(
-        f"Creating Airflow Connection: {connection_id} with connType: {var_conn_type}"
+        "Creating Airflow Connection: %s with connType: %s",
+        connection_id,
+        var_conn_type,
     )
     start_time = time.time()
+    payload = None
     try:
-        # Resolve sensitive fields from direct values or secret references
-        login = (
-            resolve_value(spec.get("login"), namespace, logger=logger)
-            if spec.get("login")
-            else None
+        payload = await asyncio.to_thread(
+            connection_payload, connection_id, spec, namespace, logger=logger
         )
-        password = (
-            resolve_value(spec.get("password"), namespace, logger=logger)
-            if spec.get("password")
-            else None
+        target = await airflow_instances.for_resource_async(namespace, spec)
+        await create_object(target, "connections", connection_id, payload)
+        status_manager.apply(
+            patch,
+            "connections",
+            namespace,
+            connection_id,
+            connection_reconciler.synced(
+                namespace, connection_id, payload, meta.get("generation")
+            ),
         )
 
-        connection = Connection(
-            connection_id=connection_id,
-            conn_type=var_conn_type,
-            description=spec.get("description"),
-            host=spec.get("host"),
-            login=login,
-            password=password,
-            port=spec.get("port"),
-            schema=spec.get("schema"),
-            extra=spec.get("extra"),
-        )
-        connections_api.post_connection(connection)
-
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
             resource_type="connection", operation="create"
@@ -59,9 +157,7 @@ def create_connection(meta, spec, namespace, logger, body, **kwargs):
         RESOURCE_OPERATIONS.labels(
             resource_type="connection", operation="create", status="success"
         ).inc()
-        MANAGED_RESOURCES.labels(resource_type="connection").inc()
 
-        return {"message": f"Connection {connection_id} created successfully."}
     except Exception as e:
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -72,18 +168,30 @@ def create_connection(meta, spec, namespace, logger, body, **kwargs):
         ).inc()
         RECONCILIATION_FAILURES.labels(resource_type="connection").inc()
 
-        logger.error(f"Failed to create Airflow Connection {connection_id}: {e}")
-        return {"error": f"Failed to create connection {connection_id}: {e}"}
+        e = redact_error(e, payload)
+        logger.error("Failed to create Airflow Connection %s: %s", connection_id, e)
+        status_manager.apply(
+            patch,
+            "connections",
+            namespace,
+            connection_id,
+            failed_status(
+                f"Failed to create connection {connection_id}: {error_message(e)}",
+                meta.get("generation"),
+            ),
+        )
 
 
-@kopf.on.delete("airflow.drfaust92", "v1beta1", "connections")
-def delete_connection(meta, spec, namespace, logger, body, **kwargs):
+@kopf.on.delete("airflow.drfaust92", "v1beta1", "connections", when=owns_resource)
+async def delete_connection(meta, spec, namespace, logger, body, **kwargs):
     connection_id = meta.get("name")
 
-    logger.info(f"Deleting Airflow Connection: {connection_id}")
+    logger.info("Deleting Airflow Connection: %s", connection_id)
     start_time = time.time()
     try:
-        connections_api.delete_connection(connection_id=connection_id)
+        target = await airflow_instances.for_resource_async(namespace, spec)
+        await delete_object(target, "connections", connection_id)
+        connection_reconciler.forget(namespace, connection_id)
 
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -92,9 +200,7 @@ def delete_connection(meta, spec, namespace, logger, body, **kwargs):
         RESOURCE_OPERATIONS.labels(
             resource_type="connection", operation="delete", status="success"
         ).inc()
-        MANAGED_RESOURCES.labels(resource_type="connection").dec()
 
-        return {"message": f"Connection {connection_id} deleted successfully."}
     except Exception as e:
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -106,82 +212,34 @@ def delete_connection(meta, spec, namespace, logger, body, **kwargs):
             RESOURCE_OPERATIONS.labels(
                 resource_type="connection", operation="delete", status="success"
             ).inc()
-            MANAGED_RESOURCES.labels(resource_type="connection").dec()
-            logger.info(f"Connection {connection_id} already deleted or doesn't exist")
-            return {
-                "message": f"Connection {connection_id} already deleted or doesn't exist."
-            }
+            connection_reconciler.forget(namespace, connection_id)
+            logger.info("Connection %s already deleted or doesn't exist", connection_id)
+            return
 
         RESOURCE_OPERATIONS.labels(
             resource_type="connection", operation="delete", status="failure"
         ).inc()
         RECONCILIATION_FAILURES.labels(resource_type="connection").inc()
-        logger.error(f"Failed to delete Airflow Connection {connection_id}: {e}")
-        return {"error": f"Failed to delete connection {connection_id}: {e}"}
+        logger.error("Failed to delete Airflow Connection %s: %s", connection_id, e)
 
 
-@kopf.on.timer(
-    "airflow.drfaust92",
-    "v1beta1",
-    "connections",
-    interval=OPERATOR_RECONCILE_INTERVAL,
-    initial_delay=OPERATOR_RECONCILE_INTERVAL_DELAY,
+@kopf.on.update(
+    "airflow.drfaust92", "v1beta1", "connections", field="spec", when=owns_resource
 )
-@kopf.on.update("airflow.drfaust92", "v1beta1", "connections")
-def update_connection(meta, spec, namespace, logger, body, **kwargs):
+async def update_connection(meta, status, namespace, logger, **kwargs):
     connection_id = meta.get("name")
-    var_conn_type = spec.get("connType")
-
-    logger.info(
-        f"Updating Airflow Connection: {connection_id} with connType: {var_conn_type}"
-    )
-    start_time = time.time()
-    try:
-        # Resolve sensitive fields from direct values or secret references
-        login = (
-            resolve_value(spec.get("login"), namespace, logger=logger)
-            if spec.get("login")
-            else None
-        )
-        password = (
-            resolve_value(spec.get("password"), namespace, logger=logger)
-            if spec.get("password")
-            else None
-        )
-
-        connection = Connection(
-            connection_id=connection_id,
-            conn_type=var_conn_type,
-            description=spec.get("description"),
-            host=spec.get("host"),
-            login=login,
-            password=password,
-            port=spec.get("port"),
-            schema=spec.get("schema"),
-            extra=spec.get("extra"),
-        )
-        connections_api.patch_connection(
-            connection_id=connection_id, connection=connection
-        )
-
-        duration = time.time() - start_time
-        RESOURCE_RECONCILIATION_DURATION.labels(
-            resource_type="connection", operation="update"
-        ).observe(duration)
-        RESOURCE_OPERATIONS.labels(
-            resource_type="connection", operation="update", status="success"
-        ).inc()
-
-        return {"message": f"Connection {connection_id} updated successfully."}
-    except Exception as e:
-        duration = time.time() - start_time
-        RESOURCE_RECONCILIATION_DURATION.labels(
-            resource_type="connection", operation="update"
-        ).observe(duration)
+    if generation_synced(meta, status):
         RESOURCE_OPERATIONS.labels(
-            resource_type="connection", operation="update", status="failure"
+            resource_type="connection", operation="update", status="skipped"
         ).inc()
-        RECONCILIATION_FAILURES.labels(resource_type="connection").inc()
+        logger.info(
+            "Connection %s generation is already synced; skipping update",
+            connection_id,
+            extra=sampled("connections", namespace, connection_id),
+        )
+        return
 
-        logger.error(f"Failed to update Airflow Connection {connection_id}: {e}")
-        return {"error": f"Failed to update connection {connection_id}: {e}"}
+    # Edits queued before the work queue gets to this connection are pushed as one
+    # update of the latest indexed spec
+    connection_reconciler.enqueue(namespace, connection_id, operation="update")
+    logger.info("Queued update of Airflow Connection: %s", connection_id)
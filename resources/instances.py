@@ -0,0 +1,22 @@
+import kopf
+
+from config.instances import airflow_instances, credential_refs
+from config.secret_refs import secret_ref_index
+
+
+@kopf.on.event("airflow.drfaust92", "v1beta1", "airflowinstances")
+async def index_airflow_instance(event, meta, spec, namespace, logger, **kwargs):
+    name = meta.get("name")
+    owner = ("airflowinstance", namespace, name)
+    if event["type"] == "DELETED" or meta.get("deletionTimestamp"):
+        retired = airflow_instances.remove(namespace, name)
+        secret_ref_index.remove(owner)
+    else:
+        retired = airflow_instances.upsert(namespace, name, spec)
+        secret_ref_index.update(owner, namespace, credential_refs(spec))
+    if retired is not None:
+        # Clients are rebuilt from the new spec on the next request
+        logger.info(
+            "AirflowInstance %s/%s changed; closing its clients", namespace, name
+        )
+        await retired.aio_client.close()
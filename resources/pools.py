@@ -1,36 +1,107 @@
+import json
 import time
 
 import kopf
 from airflow_client.client.api.pool_api import PoolApi
 from airflow_client.client.model.pool import Pool
 
-from config.base import OPERATOR_RECONCILE_INTERVAL, OPERATOR_RECONCILE_INTERVAL_DELAY
-from config.client import api_client
+from config import reconciler
+from config.bulk import create_object, delete_object
+from config.instances import airflow_instances
+from config.log import sampled
 from config.metrics import (
-    MANAGED_RESOURCES,
+    RECONCILE_PHASE_DURATION,
     RECONCILIATION_FAILURES,
     RESOURCE_OPERATIONS,
     RESOURCE_RECONCILIATION_DURATION,
 )
+from config.payloads import PayloadSchema, write_object
+from config.sharding import owns_resource
+from config.status import (
+    error_message,
+    failed_status,
+    generation_synced,
+    status_manager,
+    sync_entry,
+)
+
+pool_index = reconciler.ResourceIndex()
+
+
+@RECONCILE_PHASE_DURATION.labels(phase="payload_build").time()
+def pool_payload(var_name, spec, namespace=None, logger=None):
+    """Build the Airflow pool payload for a Pool spec."""
+    return {
+        "name": var_name,
+        "description": spec.get("description"),
+        "include_deferred": spec.get("includeDeferred", False),
+        "slots": spec.get("slots"),
+    }
+
+
+def list_pools(target, limit, offset):
+    response = target.api(PoolApi).get_pools(
+        limit=limit, offset=offset, _preload_content=False
+    )
+    return json.loads(response.data)
+
+
+POOL_SCHEMA = PayloadSchema(Pool)
+
 
-pools_api = PoolApi(api_client=api_client)
+def write_pool(target, payload, exists):
+    write_object(target, "pools", POOL_SCHEMA, payload["name"], payload, exists)
 
 
-@kopf.on.create("airflow.drfaust92", "v1beta1", "pools")
-def create_pool(meta, spec, namespace, logger, body, **kwargs):
+pool_reconciler = reconciler.register(
+    reconciler.BulkReconciler(
+        resource_type="pool",
+        plural="pools",
+        id_field="name",
+        collection="pools",
+        index=pool_index,
+        list_page=list_pools,
+        build_payload=pool_payload,
+        write=write_pool,
+    )
+)
+
+
+@kopf.on.event("airflow.drfaust92", "v1beta1", "pools")
+def index_pool(event, meta, spec, status, namespace, **kwargs):
+    if event["type"] == "DELETED" or meta.get("deletionTimestamp"):
+        pool_index.remove(namespace, meta.get("name"))
+        status_manager.forget("pools", namespace, meta.get("name"))
+    else:
+        pool_index.upsert(
+            namespace, meta.get("name"), spec, meta.get("generation"), status
+        )
+        # Re-seed fingerprints persisted before an operator restart
+        pool_reconciler.fingerprints.seed(
+            (namespace, meta.get("name")), sync_entry(status)
+        )
+        status_manager.observe("pools", namespace, meta.get("name"), status)
+
+
+@kopf.on.create("airflow.drfaust92", "v1beta1", "pools", when=owns_resource)
+async def create_pool(meta, spec, namespace, logger, body, patch, **kwargs):
     var_name = meta.get("name")
-    slots = spec.get("slots")
 
-    logger.info(f"Creating Airflow Pool: {var_name} with spec: {spec}")
+    logger.info("Creating Airflow Pool: %s", var_name)
     start_time = time.time()
     try:
-        pool = Pool(
-            name=var_name,
-            description=spec.get("description"),
-            include_deferred=spec.get("includeDeferred", False),
-            slots=slots,
+        payload = pool_payload(var_name, spec)
+        target = await airflow_instances.for_resource_async(namespace, spec)
+        await create_object(target, "pools", var_name, payload)
+        status_manager.apply(
+            patch,
+            "pools",
+            namespace,
+            var_name,
+            pool_reconciler.synced(
+                namespace, var_name, payload, meta.get("generation")
+            ),
         )
-        pools_api.post_pool(pool)
 
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -39,10 +110,8 @@ def create_pool(meta, spec, namespace, logger, body, **kwargs):
         RESOURCE_OPERATIONS.labels(
             resource_type="pool", operation="create", status="success"
         ).inc()
-        MANAGED_RESOURCES.labels(resource_type="pool").inc()
 
-        logger.info(f"Pool {var_name} created with value: {spec.get('value')}")
-        return {"message": f"Pool {var_name} created successfully."}
+        logger.info("Pool %s created with %s slots", var_name, payload["slots"])
     except Exception as e:
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -53,18 +122,29 @@ def create_pool(meta, spec, namespace, logger, body, **kwargs):
         ).inc()
         RECONCILIATION_FAILURES.labels(resource_type="pool").inc()
 
-        logger.error(f"Failed to create Airflow Pool {var_name}: {e}")
-        return {"error": f"Failed to create pool {var_name}: {e}"}
+        logger.error("Failed to create Airflow Pool %s: %s", var_name, e)
+        status_manager.apply(
+            patch,
+            "pools",
+            namespace,
+            var_name,
+            failed_status(
+                f"Failed to create pool {var_name}: {error_message(e)}",
+                meta.get("generation"),
+            ),
+        )
 
 
-@kopf.on.delete("airflow.drfaust92", "v1beta1", "pools")
-def delete_pool(meta, spec, namespace, logger, body, **kwargs):
+@kopf.on.delete("airflow.drfaust92", "v1beta1", "pools", when=owns_resource)
+async def delete_pool(meta, spec, namespace, logger, body, **kwargs):
     var_name = meta.get("name")
 
-    logger.info(f"Deleting Airflow Pool: {var_name}")
+    logger.info("Deleting Airflow Pool: %s", var_name)
     start_time = time.time()
     try:
-        pools_api.delete_pool(pool_name=var_name)
+        target = await airflow_instances.for_resource_async(namespace, spec)
+        await delete_object(target, "pools", var_name)
+        pool_reconciler.forget(namespace, var_name)
 
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -73,9 +153,7 @@ def delete_pool(meta, spec, namespace, logger, body, **kwargs):
         RESOURCE_OPERATIONS.labels(
             resource_type="pool", operation="delete", status="success"
         ).inc()
-        MANAGED_RESOURCES.labels(resource_type="pool").dec()
 
-        return {"message": f"Pool {var_name} deleted successfully."}
     except Exception as e:
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -87,60 +165,34 @@ def delete_pool(meta, spec, namespace, logger, body, **kwargs):
             RESOURCE_OPERATIONS.labels(
                 resource_type="pool", operation="delete", status="success"
             ).inc()
-            MANAGED_RESOURCES.labels(resource_type="pool").dec()
-            logger.info(f"Pool {var_name} already deleted or doesn't exist")
-            return {"message": f"Pool {var_name} already deleted or doesn't exist."}
+            pool_reconciler.forget(namespace, var_name)
+            logger.info("Pool %s already deleted or doesn't exist", var_name)
+            return
 
         RESOURCE_OPERATIONS.labels(
             resource_type="pool", operation="delete", status="failure"
         ).inc()
         RECONCILIATION_FAILURES.labels(resource_type="pool").inc()
-        logger.error(f"Failed to delete Airflow Pool {var_name}: {e}")
-        return {"error": f"Failed to delete pool {var_name}: {e}"}
+        logger.error("Failed to delete Airflow Pool %s: %s", var_name, e)
 
 
-@kopf.on.timer(
-    "airflow.drfaust92",
-    "v1beta1",
-    "pools",
-    interval=OPERATOR_RECONCILE_INTERVAL,
-    initial_delay=OPERATOR_RECONCILE_INTERVAL_DELAY,
+@kopf.on.update(
+    "airflow.drfaust92", "v1beta1", "pools", field="spec", when=owns_resource
 )
-@kopf.on.update("airflow.drfaust92", "v1beta1", "pools")
-def update_pool(meta, spec, namespace, logger, body, **kwargs):
+async def update_pool(meta, status, namespace, logger, **kwargs):
     var_name = meta.get("name")
-    slots = spec.get("slots")
-
-    logger.info(f"Updating Airflow Pool: {var_name}")
-    start_time = time.time()
-    try:
-        pool = Pool(
-            name=var_name,
-            description=spec.get("description"),
-            include_deferred=spec.get("includeDeferred", False),
-            slots=slots,
-        )
-        pools_api.patch_pool(pool_name=var_name, pool=pool)
-
-        duration = time.time() - start_time
-        RESOURCE_RECONCILIATION_DURATION.labels(
-            resource_type="pool", operation="update"
-        ).observe(duration)
+    if generation_synced(meta, status):
         RESOURCE_OPERATIONS.labels(
-            resource_type="pool", operation="update", status="success"
+            resource_type="pool", operation="update", status="skipped"
         ).inc()
+        logger.info(
+            "Pool %s generation is already synced; skipping update",
+            var_name,
+            extra=sampled("pools", namespace, var_name),
+        )
+        return
 
-        logger.info(f"Pool {var_name} updated with value: {spec}")
-        return {"message": f"Pool {var_name} updated successfully."}
-    except Exception as e:
-        duration = time.time() - start_time
-        RESOURCE_RECONCILIATION_DURATION.labels(
-            resource_type="pool", operation="update"
-        ).observe(duration)
-        RESOURCE_OPERATIONS.labels(
-            resource_type="pool", operation="update", status="failure"
-        ).inc()
-        RECONCILIATION_FAILURES.labels(resource_type="pool").inc()
-
-        logger.error(f"Failed to update Airflow Pool {var_name}: {e}")
-        return {"error": f"Failed to update pool {var_name}: {e}"}
+    # Edits queued before the work queue gets to this pool are pushed as one
+    # update of the latest indexed spec
+    pool_reconciler.enqueue(namespace, var_name, operation="update")
+    logger.info("Queued update of Airflow Pool: %s", var_name)
@@ -0,0 +1,74 @@
+import kopf
+
+from config import reconciler
+from config.instances import airflow_instances
+from config.metrics import SECRET_CHANGE_RECONCILES
+from config.secret_cache import decode_secret_data, secret_cache
+from config.secret_refs import secret_ref_index
+
+
+def changed_keys(previous, current):
+    """Return the keys whose values differ, or None if nothing was known before."""
+    if previous is None:
+        return None
+    return {
+        key
+        for key in previous.keys() | current.keys()
+        if previous.get(key) != current.get(key)
+    }
+
+
+def tracked_secret(meta, namespace, **kwargs):
+    """Return whether a custom resource references the Secret or it is cached.
+
+    Events of every other Secret in the cluster are dropped before their
+    data is decoded.
+    """
+    key = (namespace, meta.get("name"))
+    return secret_ref_index.is_referenced(*key) or key in secret_cache
+
+
+@kopf.on.event("", "v1", "secrets", when=tracked_secret)
+async def watch_secret(event, body, meta, namespace, logger, **kwargs):
+    # Keep cached Secrets current so resolve_value never reads the apiserver
+    secret_name = meta.get("name")
+    if event["type"] == "DELETED":
+        secret_cache.invalidate(namespace, secret_name)
+        return
+
+    if not secret_ref_index.is_referenced(namespace, secret_name):
+        if (namespace, secret_name) in secret_cache:
+            secret_cache.refresh(
+                namespace, secret_name, decode_secret_data(body.get("data"))
+            )
+        return
+
+    data = decode_secret_data(body.get("data"))
+    previous = secret_cache.replace(namespace, secret_name, data)
+    # The initial listing replays existing Secrets; bulk cycles cover those
+    if event["type"] is None:
+        return
+
+    keys = changed_keys(previous, data)
+    if keys is not None and not keys:
+        return
+
+    # Re-reconcile only the custom resources that use the changed keys
+    for resource_type, owner_namespace, owner_name in sorted(
+        secret_ref_index.dependents(namespace, secret_name, keys)
+    ):
+        if resource_type == "airflowinstance":
+            # Rebuild the instance's clients with the rotated credentials
+            logger.debug("Secret %s changed; resetting %s", secret_name, owner_name)
+            retired = airflow_instances.reset(owner_namespace, owner_name)
+            if retired is not None:
+                await retired.aio_client.close()
+            continue
+        logger.debug(
+            "Secret %s changed; reconciling %s %s",
+            secret_name,
+            resource_type,
+            owner_name,
+        )
+        SECRET_CHANGE_RECONCILES.labels(resource_type=resource_type).inc()
+        reconciler.reconcilers[resource_type].enqueue(owner_namespace, owner_name)
@@ -0,0 +1,364 @@
+import asyncio
+import time
+
+import kopf
+
+from config import reconciler
+from config.config_maps import config_map_cache, config_map_ref_index
+from config.k8s_secret import secret_refs
+from config.log import sampled
+from config.metrics import (
+    RECONCILIATION_FAILURES,
+    RESOURCE_OPERATIONS,
+    RESOURCE_RECONCILIATION_DURATION,
+)
+from config.secret_refs import secret_ref_index
+from config.sets import (
+    ResourceSetReconciler,
+    expand_sources,
+    source_config_maps,
+    source_secrets,
+)
+from config.sharding import owns_resource
+from config.status import (
+    error_message,
+    failed_status,
+    generation_synced,
+    status_manager,
+    sync_entry,
+)
+from resources.connections import (
+    connection_payload,
+    list_connections,
+    write_connection,
+)
+from resources.variables import list_variables, variable_payload, write_variable
+
+variable_set_index = reconciler.ResourceIndex()
+connection_set_index = reconciler.ResourceIndex()
+
+
+def expand_variable_set(spec, namespace):
+    """Return the entries of a VariableSet by variable key.
+
+    Entries listed inline in `variables` override keys from `from` sources.
+    """
+    entries = expand_sources(spec.get("from"), namespace)
+    for entry in spec.get("variables") or []:
+        entries[entry["key"]] = entry
+    return entries
+
+
+def expand_connection_set(spec, namespace):
+    """Return the entries of a ConnectionSet by connection id."""
+    return {entry["connectionId"]: entry for entry in spec.get("connections") or []}
+
+
+variable_set_reconciler = reconciler.register(
+    ResourceSetReconciler(
+        expand=expand_variable_set,
+        resource_type="variableset",
+        plural="variablesets",
+        id_field="key",
+        collection="variables",
+        index=variable_set_index,
+        list_page=list_variables,
+        build_payload=variable_payload,
+        write=write_variable,
+    )
+)
+
+connection_set_reconciler = reconciler.register(
+    ResourceSetReconciler(
+        expand=expand_connection_set,
+        resource_type="connectionset",
+        plural="connectionsets",
+        id_field="connection_id",
+        collection="connections",
+        index=connection_set_index,
+        list_page=list_connections,
+        build_payload=connection_payload,
+        write=write_connection,
+    )
+)
+
+
+def variable_set_secret_refs(spec):
+    refs = secret_refs(*(spec.get("variables") or []))
+    # Whole-Secret sources depend on every key of the Secret
+    refs.update((name, None) for name in source_secrets(spec.get("from")))
+    return refs
+
+
+def connection_set_secret_refs(spec):
+    return secret_refs(
+        *(
+            value
+            for entry in spec.get("connections") or []
+            for value in (entry.get("login"), entry.get("password"))
+        )
+    )
+
+
+def _index_set(set_reconciler, refs, event, meta, spec, status, namespace):
+    owner = (set_reconciler.resource_type, namespace, meta.get("name"))
+    if event["type"] == "DELETED" or meta.get("deletionTimestamp"):
+        set_reconciler.index.remove(namespace, meta.get("name"))
+        secret_ref_index.remove(owner)
+        config_map_ref_index.remove(owner)
+        status_manager.forget(set_reconciler.plural, namespace, meta.get("name"))
+    else:
+        set_reconciler.index.upsert(
+            namespace, meta.get("name"), spec, meta.get("generation"), status
+        )
+        secret_ref_index.update(owner, namespace, refs(spec))
+        config_map_ref_index.update(
+            owner,
+            namespace,
+            ((name, None) for name in source_config_maps(spec.get("from"))),
+        )
+        # Re-seed the set digest persisted before an operator restart
+        set_reconciler.fingerprints.seed(
+            (namespace, meta.get("name")), sync_entry(status)
+        )
+        status_manager.observe(
+            set_reconciler.plural, namespace, meta.get("name"), status
+        )
+
+
+def _generation_synced(set_reconciler, meta, status, logger):
+    if not generation_synced(meta, status):
+        return False
+    resource_type = set_reconciler.resource_type
+    RESOURCE_OPERATIONS.labels(
+        resource_type=resource_type, operation="update", status="skipped"
+    ).inc()
+    logger.info(
+        "%s %s generation is already synced; skipping update",
+        resource_type,
+        meta.get("name"),
+        extra=sampled(set_reconciler.plural, meta.get("namespace"), meta.get("name")),
+    )
+    return True
+
+
+async def _apply_set(
+    set_reconciler, operation, meta, spec, namespace, logger, patch, old=None
+):
+    name = meta.get("name")
+    plural = set_reconciler.plural
+    resource_type = set_reconciler.resource_type
+    generation = meta.get("generation")
+    start_time = time.time()
+    try:
+        removed = ()
+        if old is not None:
+            old_ids, new_ids = await asyncio.gather(
+                asyncio.to_thread(set_reconciler.object_ids, namespace, old),
+                asyncio.to_thread(set_reconciler.object_ids, namespace, spec),
+            )
+            removed = old_ids - new_ids
+        status = await set_reconciler.apply(
+            namespace,
+            name,
+            spec,
+            removed=removed,
+            create=operation == "create",
+            generation=generation,
+        )
+
+        RESOURCE_RECONCILIATION_DURATION.labels(
+            resource_type=resource_type, operation=operation
+        ).observe(time.time() - start_time)
+        if status is None:
+            RESOURCE_OPERATIONS.labels(
+                resource_type=resource_type, operation=operation, status="skipped"
+            ).inc()
+            logger.info(
+                "%s %s is unchanged; skipping %s",
+                resource_type,
+                name,
+                operation,
+                extra=sampled(plural, namespace, name),
+            )
+            status_manager.apply(
+                patch, plural, namespace, name, {"observedGeneration": generation}
+            )
+            return
+        status_manager.apply(patch, plural, namespace, name, status)
+        summary = status["summary"]
+        if summary.get("failed"):
+            RESOURCE_OPERATIONS.labels(
+                resource_type=resource_type, operation=operation, status="failure"
+            ).inc()
+            RECONCILIATION_FAILURES.labels(resource_type=resource_type).inc()
+            logger.error(
+                "%s of %s entries of %s %s failed: %s",
+                summary["failed"],
+                summary["entries"],
+                resource_type,
+                name,
+                ", ".join(summary["failedKeys"]),
+            )
+            return
+        RESOURCE_OPERATIONS.labels(
+            resource_type=resource_type, operation=operation, status="success"
+        ).inc()
+        logger.info(
+            "%s %s: %s entries synced, %s removed",
+            resource_type,
+            name,
+            summary["synced"],
+            len(removed),
+        )
+    except Exception as e:
+        RESOURCE_RECONCILIATION_DURATION.labels(
+            resource_type=resource_type, operation=operation
+        ).observe(time.time() - start_time)
+        RESOURCE_OPERATIONS.labels(
+            resource_type=resource_type, operation=operation, status="failure"
+        ).inc()
+        RECONCILIATION_FAILURES.labels(resource_type=resource_type).inc()
+        logger.error("Failed to %s %s %s: %s", operation, resource_type, name, e)
+        status_manager.apply(
+            patch,
+            plural,
+            namespace,
+            name,
+            failed_status(
+                f"Failed to {operation} {resource_type}: {error_message(e)}",
+                generation,
+            ),
+        )
+
+
+async def _delete_set(set_reconciler, meta, spec, namespace, logger):
+    name = meta.get("name")
+    resource_type = set_reconciler.resource_type
+    start_time = time.time()
+    try:
+        deleted = await set_reconciler.remove(namespace, name, spec)
+
+        RESOURCE_RECONCILIATION_DURATION.labels(
+            resource_type=resource_type, operation="delete"
+        ).observe(time.time() - start_time)
+        RESOURCE_OPERATIONS.labels(
+            resource_type=resource_type, operation="delete", status="success"
+        ).inc()
+        logger.info("%s %s: %s entries deleted", resource_type, name, deleted)
+    except Exception as e:
+        RESOURCE_RECONCILIATION_DURATION.labels(
+            resource_type=resource_type, operation="delete"
+        ).observe(time.time() - start_time)
+        RESOURCE_OPERATIONS.labels(
+            resource_type=resource_type, operation="delete", status="failure"
+        ).inc()
+        RECONCILIATION_FAILURES.labels(resource_type=resource_type).inc()
+        logger.error("Failed to delete %s %s: %s", resource_type, name, e)
+        # Keep the finalizer until every entry is gone; 404s count as deleted
+        raise kopf.TemporaryError(
+            f"Failed to delete the entries of {resource_type} {name}"
+        ) from e
+
+
+@kopf.on.event("airflow.drfaust92", "v1beta1", "variablesets")
+def index_variable_set(event, meta, spec, status, namespace, **kwargs):
+    _index_set(
+        variable_set_reconciler,
+        variable_set_secret_refs,
+        event,
+        meta,
+        spec,
+        status,
+        namespace,
+    )
+
+
+@kopf.on.create("airflow.drfaust92", "v1beta1", "variablesets", when=owns_resource)
+async def create_variable_set(meta, spec, namespace, logger, patch, **kwargs):
+    return await _apply_set(
+        variable_set_reconciler, "create", meta, spec, namespace, logger, patch
+    )
+
+
+@kopf.on.update(
+    "airflow.drfaust92", "v1beta1", "variablesets", field="spec", when=owns_resource
+)
+async def update_variable_set(
+    meta, spec, status, namespace, logger, patch, old, **kwargs
+):
+    if _generation_synced(variable_set_reconciler, meta, status, logger):
+        return
+    return await _apply_set(
+        variable_set_reconciler, "update", meta, spec, namespace, logger, patch, old
+    )
+
+
+@kopf.on.delete("airflow.drfaust92", "v1beta1", "variablesets", when=owns_resource)
+async def delete_variable_set(meta, spec, namespace, logger, **kwargs):
+    return await _delete_set(variable_set_reconciler, meta, spec, namespace, logger)
+
+
+@kopf.on.event("airflow.drfaust92", "v1beta1", "connectionsets")
+def index_connection_set(event, meta, spec, status, namespace, **kwargs):
+    _index_set(
+        connection_set_reconciler,
+        connection_set_secret_refs,
+        event,
+        meta,
+        spec,
+        status,
+        namespace,
+    )
+
+
+@kopf.on.create("airflow.drfaust92", "v1beta1", "connectionsets", when=owns_resource)
+async def create_connection_set(meta, spec, namespace, logger, patch, **kwargs):
+    return await _apply_set(
+        connection_set_reconciler, "create", meta, spec, namespace, logger, patch
+    )
+
+
+@kopf.on.update(
+    "airflow.drfaust92", "v1beta1", "connectionsets", field="spec", when=owns_resource
+)
+async def update_connection_set(
+    meta, spec, status, namespace, logger, patch, old, **kwargs
+):
+    if _generation_synced(connection_set_reconciler, meta, status, logger):
+        return
+    return await _apply_set(
+        connection_set_reconciler, "update", meta, spec, namespace, logger, patch, old
+    )
+
+
+@kopf.on.delete("airflow.drfaust92", "v1beta1", "connectionsets", when=owns_resource)
+async def delete_connection_set(meta, spec, namespace, logger, **kwargs):
+    return await _delete_set(connection_set_reconciler, meta, spec, namespace, logger)
+
+
+def referenced_config_map(meta, namespace, **kwargs):
+    return config_map_ref_index.is_referenced(namespace, meta.get("name"))
+
+
+@kopf.on.event("", "v1", "configmaps", when=referenced_config_map)
+def watch_config_map(event, body, meta, namespace, logger, **kwargs):
+    # Keep the ConfigMaps of sets cached, and resync the sets when they change
+    name = meta.get("name")
+    if event["type"] == "DELETED":
+        config_map_cache.remove(namespace, name)
+    else:
+        previous = config_map_cache.update(namespace, name, body.get("data"))
+        # The initial listing replays existing ConfigMaps; bulk cycles cover those
+        if event["type"] is None or previous == dict(body.get("data") or {}):
+            return
+    for resource_type, owner_namespace, owner_name in sorted(
+        config_map_ref_index.dependents(namespace, name)
+    ):
+        logger.debug(
+            "ConfigMap %s changed; reconciling %s %s",
+            name,
+            resource_type,
+            owner_name,
+        )
+        reconciler.reconcilers[resource_type].enqueue(owner_namespace, owner_name)
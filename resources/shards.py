@@ -0,0 +1,36 @@
+import asyncio
+
+import kopf
+
+from config.sharding import shard_coordinator
+
+# Custom resources split between replicas when sharding is enabled
+SHARDED_PLURALS = (
+    "variables",
+    "connections",
+    "pools",
+    "variablesets",
+    "connectionsets",
+)
+
+
+async def release_stale_finalizers(event, meta, namespace, resource, logger, **kwargs):
+    # Only deleted objects can be held up by the finalizer of a gone replica
+    if event["type"] == "DELETED" or not meta.get("deletionTimestamp"):
+        return
+    try:
+        await asyncio.to_thread(
+            shard_coordinator.release_stale_finalizers,
+            resource.plural,
+            namespace,
+            meta.get("name"),
+            meta.get("finalizers"),
+        )
+    except Exception as e:
+        # The next event of the object retries
+        logger.warning("Failed to release finalizers of gone replicas: %s", e)
+
+
+if shard_coordinator.enabled:
+    for plural in SHARDED_PLURALS:
+        kopf.on.event("airflow.drfaust92", "v1beta1", plural)(release_stale_finalizers)
@@ -1,35 +1,121 @@
+import asyncio
+import json
 import time
 
 import kopf
 from airflow_client.client.api.variable_api import VariableApi
 from airflow_client.client.model.variable import Variable
 
-from config.base import OPERATOR_RECONCILE_INTERVAL, OPERATOR_RECONCILE_INTERVAL_DELAY
-from config.client import api_client
-from config.k8s_secret import resolve_value
+from config import reconciler
+from config.bulk import create_object, delete_object
+from config.instances import airflow_instances
+from config.k8s_secret import resolve_value, secret_refs
+from config.log import redact_error, redacted, sampled
 from config.metrics import (
-    MANAGED_RESOURCES,
+    RECONCILE_PHASE_DURATION,
     RECONCILIATION_FAILURES,
     RESOURCE_OPERATIONS,
     RESOURCE_RECONCILIATION_DURATION,
 )
+from config.payloads import PayloadSchema, write_object
+from config.secret_refs import secret_ref_index
+from config.sharding import owns_resource
+from config.status import (
+    error_message,
+    failed_status,
+    generation_synced,
+    status_manager,
+    sync_entry,
+)
+
+variable_index = reconciler.ResourceIndex()
+
+
+def variable_payload(var_name, spec, namespace, logger=None):
+    """Build the Airflow variable payload for a Variable spec.
+
+    The value is resolved from a direct value or a secret reference.
+    """
+    # Timed as the secret_resolve phase, separately from building the payload
+    value = resolve_value(spec, namespace, logger=logger)
+    with RECONCILE_PHASE_DURATION.labels(phase="payload_build").time():
+        return {
+            "key": var_name,
+            "value": value,
+            "description": spec.get("description"),
+        }
+
+
+def list_variables(target, limit, offset):
+    response = target.api(VariableApi).get_variables(
+        limit=limit, offset=offset, _preload_content=False
+    )
+    return json.loads(response.data)
+
+
+VARIABLE_SCHEMA = PayloadSchema(Variable)
 
-variables_api = VariableApi(api_client=api_client)
 
+def write_variable(target, payload, exists):
+    write_object(target, "variables", VARIABLE_SCHEMA, payload["key"], payload, exists)
 
-@kopf.on.create("airflow.drfaust92", "v1beta1", "variables")
-def create_variable(meta, spec, namespace, logger, body, **kwargs):
+
+variable_reconciler = reconciler.register(
+    reconciler.BulkReconciler(
+        resource_type="variable",
+        plural="variables",
+        id_field="key",
+        collection="variables",
+        index=variable_index,
+        list_page=list_variables,
+        build_payload=variable_payload,
+        write=write_variable,
+    )
+)
+
+
+@kopf.on.event("airflow.drfaust92", "v1beta1", "variables")
+def index_variable(event, meta, spec, status, namespace, **kwargs):
+    owner = ("variable", namespace, meta.get("name"))
+    if event["type"] == "DELETED" or meta.get("deletionTimestamp"):
+        variable_index.remove(namespace, meta.get("name"))
+        status_manager.forget("variables", namespace, meta.get("name"))
+        secret_ref_index.remove(owner)
+    else:
+        variable_index.upsert(
+            namespace, meta.get("name"), spec, meta.get("generation"), status
+        )
+        secret_ref_index.update(owner, namespace, secret_refs(spec))
+        # Re-seed fingerprints persisted before an operator restart
+        variable_reconciler.fingerprints.seed(
+            (namespace, meta.get("name")), sync_entry(status)
+        )
+        status_manager.observe("variables", namespace, meta.get("name"), status)
+
+
+@kopf.on.create("airflow.drfaust92", "v1beta1", "variables", when=owns_resource)
+async def create_variable(meta, spec, namespace, logger, body, patch, **kwargs):
     var_name = meta.get("name")
 
-    logger.info(f"Creating Airflow Variable: {var_name} with spec: {spec}")
+    logger.info("Creating Airflow Variable: %s", var_name)
     start_time = time.time()
+    payload = None
     try:
-        logger.debug(f"Passing spec to resolve_value: {spec}")
-        var_value = resolve_value(spec, namespace, logger=logger)
-        variable = Variable(
-            key=var_name, value=var_value, description=spec.get("description")
+        logger.debug("Passing spec to resolve_value: %s", redacted(spec))
+        payload = await asyncio.to_thread(
+            variable_payload, var_name, spec, namespace, logger=logger
+        )
+        target = await airflow_instances.for_resource_async(namespace, spec)
+        await create_object(target, "variables", var_name, payload)
+        status_manager.apply(
+            patch,
+            "variables",
+            namespace,
+            var_name,
+            variable_reconciler.synced(
+                namespace, var_name, payload, meta.get("generation")
+            ),
         )
-        variables_api.post_variables(variable)
 
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -38,10 +124,8 @@ def create_variable(meta, spec, namespace, logger, body, **kwargs):
         RESOURCE_OPERATIONS.labels(
             resource_type="variable", operation="create", status="success"
         ).inc()
-        MANAGED_RESOURCES.labels(resource_type="variable").inc()
 
-        logger.info(f"Variable {var_name} created with value: {var_value}")
-        return {"message": f"Variable {var_name} created successfully."}
+        logger.info("Variable %s created", var_name)
     except Exception as e:
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -52,18 +136,30 @@ def create_variable(meta, spec, namespace, logger, body, **kwargs):
         ).inc()
         RECONCILIATION_FAILURES.labels(resource_type="variable").inc()
 
-        logger.error(f"Failed to create Airflow Variable {var_name}: {e}")
-        return {"error": f"Failed to create variable {var_name}: {e}"}
+        e = redact_error(e, payload)
+        logger.error("Failed to create Airflow Variable %s: %s", var_name, e)
+        status_manager.apply(
+            patch,
+            "variables",
+            namespace,
+            var_name,
+            failed_status(
+                f"Failed to create variable {var_name}: {error_message(e)}",
+                meta.get("generation"),
+            ),
+        )
 
 
-@kopf.on.delete("airflow.drfaust92", "v1beta1", "variables")
-def delete_variable(meta, spec, namespace, logger, body, **kwargs):
+@kopf.on.delete("airflow.drfaust92", "v1beta1", "variables", when=owns_resource)
+async def delete_variable(meta, spec, namespace, logger, body, **kwargs):
     var_name = meta.get("name")
 
-    logger.info(f"Deleting Airflow Variable: {var_name}")
+    logger.info("Deleting Airflow Variable: %s", var_name)
     start_time = time.time()
     try:
-        variables_api.delete_variable(variable_key=var_name)
+        target = await airflow_instances.for_resource_async(namespace, spec)
+        await delete_object(target, "variables", var_name)
+        variable_reconciler.forget(namespace, var_name)
 
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -72,9 +168,7 @@ def delete_variable(meta, spec, namespace, logger, body, **kwargs):
         RESOURCE_OPERATIONS.labels(
             resource_type="variable", operation="delete", status="success"
         ).inc()
-        MANAGED_RESOURCES.labels(resource_type="variable").dec()
 
-        return {"message": f"Variable {var_name} deleted successfully."}
     except Exception as e:
         duration = time.time() - start_time
         RESOURCE_RECONCILIATION_DURATION.labels(
@@ -86,59 +180,34 @@ def delete_variable(meta, spec, namespace, logger, body, **kwargs):
             RESOURCE_OPERATIONS.labels(
                 resource_type="variable", operation="delete", status="success"
             ).inc()
-            MANAGED_RESOURCES.labels(resource_type="variable").dec()
-            logger.info(f"Variable {var_name} already deleted or doesn't exist")
-            return {"message": f"Variable {var_name} already deleted or doesn't exist."}
+            variable_reconciler.forget(namespace, var_name)
+            logger.info("Variable %s already deleted or doesn't exist", var_name)
+            return
 
         RESOURCE_OPERATIONS.labels(
             resource_type="variable", operation="delete", status="failure"
         ).inc()
         RECONCILIATION_FAILURES.labels(resource_type="variable").inc()
-        logger.error(f"Failed to delete Airflow Variable {var_name}: {e}")
-        return {"error": f"Failed to delete variable {var_name}: {e}"}
+        logger.error("Failed to delete Airflow Variable %s: %s", var_name, e)
 
 
-@kopf.on.timer(
-    "airflow.drfaust92",
-    "v1beta1",
-    "variables",
-    interval=OPERATOR_RECONCILE_INTERVAL,
-    initial_delay=OPERATOR_RECONCILE_INTERVAL_DELAY,
+@kopf.on.update(
+    "airflow.drfaust92", "v1beta1", "variables", field="spec", when=owns_resource
 )
-@kopf.on.update("airflow.drfaust92", "v1beta1", "variables")
-def update_variable(meta, spec, namespace, logger, body, **kwargs):
+async def update_variable(meta, status, namespace, logger, **kwargs):
     var_name = meta.get("name")
-
-    logger.info(f"Updating Airflow Variable: {var_name}")
-    start_time = time.time()
-    try:
-        logger.debug(f"Passing spec to resolve_value: {spec}")
-        var_value = resolve_value(spec, namespace, logger=logger)
-        logger.debug(f"Resolved value for {var_name}: {var_value}")
-        variable = Variable(
-            key=var_name, value=var_value, description=spec.get("description")
-        )
-        variables_api.patch_variable(variable_key=var_name, variable=variable)
-
-        duration = time.time() - start_time
-        RESOURCE_RECONCILIATION_DURATION.labels(
-            resource_type="variable", operation="update"
-        ).observe(duration)
+    if generation_synced(meta, status):
         RESOURCE_OPERATIONS.labels(
-            resource_type="variable", operation="update", status="success"
+            resource_type="variable", operation="update", status="skipped"
         ).inc()
+        logger.info(
+            "Variable %s generation is already synced; skipping update",
+            var_name,
+            extra=sampled("variables", namespace, var_name),
+        )
+        return
 
-        logger.info(f"Variable {var_name} updated with value: {var_value}")
-        return {"message": f"Variable {var_name} updated successfully."}
-    except Exception as e:
-        duration = time.time() - start_time
-        RESOURCE_RECONCILIATION_DURATION.labels(
-            resource_type="variable", operation="update"
-        ).observe(duration)
-        RESOURCE_OPERATIONS.labels(
-            resource_type="variable", operation="update", status="failure"
-        ).inc()
-        RECONCILIATION_FAILURES.labels(resource_type="variable").inc()
-
-        logger.error(f"Failed to update Airflow Variable {var_name}: {e}")
-        return {"error": f"Failed to update variable {var_name}: {e}"}
+    # Edits queued before the work queue gets to this variable are pushed as one
+    # update of the latest indexed spec
+    variable_reconciler.enqueue(namespace, var_name, operation="update")
+    logger.info("Queued update of Airflow Variable: %s", var_name)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+os.environ.setdefault("AIRFLOW_USERNAME", "admin")
+os.environ.setdefault("AIRFLOW_PASSWORD", "admin")
+import airflow_client.client as client
+from airflow_client.client.exceptions import ApiException
+
+from config.aio import AsyncAirflowClient
+from config.api_client import AirflowApiClient
+from config.ratelimit import InFlightLimit
+
+
+async def _with_server(handler, scenario, max_in_flight=4):
+    app = web.Application()
+    app.router.add_route("*", "/api/v1/{tail:.*}", handler)
+    async with TestServer(app) as server:
+        configuration = client.Configuration(
+            host=str(server.make_url("/api/v1")), username="admin", password="admin"
+        )
+        sync_client = AirflowApiClient(configuration)
+        sync_client.in_flight = InFlightLimit(max_in_flight)
+        aio = AsyncAirflowClient(sync_client)
+        try:
+            return await scenario(aio)
+        finally:
+            await aio.close()
+
+
+def test_request_sends_auth_and_json_body():
+    seen = {}
+
+    async def handler(request):
+        seen["path"] = request.path
+        seen["auth"] = request.headers.get("Authorization")
+        seen["body"] = await request.json()
+        return web.json_response({"key": "my var"})
+
+    result = asyncio.run(
+        _with_server(handler, lambda aio: aio.patch("variables", "my var", {"v": 1}))
+    )
+
+    assert result == {"key": "my var"}
+    assert seen["path"] == "/api/v1/variables/my var"
+    assert seen["auth"].startswith("Basic ")
+    assert seen["body"] == {"v": 1}
+
+
+def test_error_status_raises_api_exception():
+    async def handler(request):
+        return web.json_response({"title": "Not Found"}, status=404)
+
+    with pytest.raises(ApiException) as excinfo:
+        asyncio.run(_with_server(handler, lambda aio: aio.delete("pools", "p")))
+    assert excinfo.value.status == 404
+    assert "404" in str(excinfo.value)
+
+
+def test_semaphore_bounds_requests_in_flight():
+    state = {"current": 0, "peak": 0}
+
+    async def handler(request):
+        state["current"] += 1
+        state["peak"] = max(state["peak"], state["current"])
+        await asyncio.sleep(0.01)
+        state["current"] -= 1
+        return web.Response(status=204)
+
+    async def scenario(aio):
+        await asyncio.gather(*(aio.delete("pools", str(i)) for i in range(10)))
+
+    asyncio.run(_with_server(handler, scenario, max_in_flight=2))
+    assert state["peak"] == 2
+
+
+def test_throttling_response_is_reported_to_rate_limiter():
+    async def handler(request):
+        return web.json_response(
+            {"title": "Too Many Requests"}, status=429, headers={"Retry-After": "7"}
+        )
+
+    limiter = MagicMock()
+    limiter.acquire_async = AsyncMock()
+
+    async def scenario(aio):
+        aio._sync_client.rate_limiter = limiter
+        return await aio.post("pools", {})
+
+    with pytest.raises(ApiException):
+        asyncio.run(_with_server(handler, scenario))
+    limiter.acquire_async.assert_awaited_once()
+    limiter.record.assert_called_once_with(429, "7")
@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+os.environ.setdefault("AIRFLOW_USERNAME", "admin")
+os.environ.setdefault("AIRFLOW_PASSWORD", "admin")
+from benchmarks.fake_airflow import FakeAirflow
+from benchmarks.run import percentile, run_benchmark, updated_spec
+
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile(list(range(101)), 0.99) == 99
+
+
+def test_fake_airflow_drift_changes_a_fraction():
+    airflow = FakeAirflow()
+    airflow.objects["pools"] = {
+        f"p{i}": {"name": f"p{i}", "slots": 1} for i in range(10)
+    }
+    assert airflow.drift("pools", 0.3, "slots", 0) == 3
+    assert sum(pool["slots"] == 0 for pool in airflow.objects["pools"].values()) == 3
+
+
+def test_updated_spec_changes_every_kind():
+    assert updated_spec("pool", {"slots": 1})["slots"] == 2
+    assert updated_spec("variable", {"value": "v"})["value"] == "v-updated"
+    assert updated_spec("connection", {"port": 5432})["port"] == 5433
+
+
+def test_benchmark_smoke():
+    results = run_benchmark(count=12, drift=0.5)
+
+    assert all(
+        metrics["errors"] == 0 for name, metrics in results.items() if name != "memory"
+    )
+    assert results["create"]["airflow_calls"] == 12
+    # Every resource was changed, so every update writes once
+    assert results["update"]["airflow_calls"] == 12
+    # One list page per collection and no writes while nothing drifted
+    assert results["cycle_steady"]["airflow_calls"] == 3
+    assert results["cycle_drift"]["airflow_calls"] == 3 + 6
+    assert results["delete"]["airflow_calls"] == 12
+    assert results["memory"]["max_rss_mib"] > 0
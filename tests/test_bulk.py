@@ -0,0 +1,105 @@
+import os
+import sys
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.bulk import BulkWriteError, BulkWriter, api_version
+
+
+def _api_client(results=None):
+    api_client = MagicMock()
+    api_client.request_json.side_effect = lambda method, path, body: (
+        results(body) if results else {}
+    )
+    return api_client
+
+
+def test_only_api_v2_instances_get_a_writer():
+    assert api_version("http://airflow:8080/api/v1") == 1
+    assert api_version("http://airflow:8080/api/v2/") == 2
+    assert api_version("http://airflow:8080") == 1
+    api_client = _api_client()
+    v1, v2 = "http://airflow/api/v1", "http://airflow/api/v2"
+    assert BulkWriter.for_client(api_client, v1) is None
+    assert BulkWriter.for_client(api_client, v2, mode="disabled") is None
+    assert BulkWriter.for_client(api_client, v2) is not None
+    # Asking an MWAA client for its host would exchange a token
+    api_client.api_host.assert_not_called()
+
+
+def test_writes_within_the_linger_share_one_request():
+    api_client = _api_client()
+    writer = BulkWriter(api_client, batch_size=100, linger=0.05)
+    futures = [
+        writer.upsert("pools", "a", {"name": "a", "slots": 1}),
+        writer.upsert("pools", "b", {"name": "b", "slots": 1}),
+        # The last write of an object wins
+        writer.upsert("pools", "a", {"name": "a", "slots": 2}),
+        writer.delete("pools", "c"),
+    ]
+    for future in futures:
+        future.result(timeout=5)
+
+    api_client.request_json.assert_called_once_with(
+        "PATCH",
+        "/pools",
+        {
+            "actions": [
+                {
+                    "action": "create",
+                    "action_on_existence": "overwrite",
+                    "entities": [
+                        {"name": "b", "slots": 1},
+                        {"name": "a", "slots": 2},
+                    ],
+                },
+                {
+                    "action": "delete",
+                    "action_on_non_existence": "skip",
+                    "entities": ["c"],
+                },
+            ]
+        },
+    )
+
+
+def test_full_batches_are_sent_without_waiting():
+    sent = threading.Event()
+    api_client = _api_client(results=lambda body: sent.set() or {})
+    writer = BulkWriter(api_client, batch_size=2, linger=60)
+
+    writer.upsert("variables", "a", {"key": "a", "value": "1"})
+    writer.upsert("variables", "b", {"key": "b", "value": "2"}).result(timeout=5)
+    assert sent.is_set()
+
+
+def test_failed_entities_raise_for_their_writes_only():
+    def results(body):
+        return {
+            "create": {
+                "success": ["ok"],
+                "errors": [{"error": "invalid slots", "status_code": 422}],
+            }
+        }
+
+    writer = BulkWriter(_api_client(results=results), linger=0.01)
+    ok = writer.upsert("pools", "ok", {"name": "ok", "slots": 1})
+    failed = writer.upsert("pools", "bad", {"name": "bad", "slots": -1})
+
+    assert ok.result(timeout=5) is None
+    with pytest.raises(BulkWriteError, match="bad: 422 invalid slots") as error:
+        failed.result(timeout=5)
+    assert error.value.status == 422
+
+
+def test_cancelled_writes_do_not_keep_the_batch_from_resolving():
+    api_client = _api_client()
+    writer = BulkWriter(api_client, linger=0.05)
+    cancelled = writer.upsert("pools", "a", {"name": "a", "slots": 1})
+    cancelled.cancel()
+
+    assert writer.write("pools", "b", {"name": "b", "slots": 1}) is None
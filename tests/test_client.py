@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+os.environ.setdefault("AIRFLOW_USERNAME", "admin")
+os.environ.setdefault("AIRFLOW_PASSWORD", "admin")
+
+from config import client  # noqa: E402
+from config.api_client import AirflowApiClient  # noqa: E402
+
+
+def test_load_auth_backend_by_name():
+    assert isinstance(client.load_auth_backend("basic"), AirflowApiClient)
+
+
+def test_load_auth_backend_from_module_path():
+    api_client = client.load_auth_backend("config.client:create_basic_api_client")
+    assert isinstance(api_client, AirflowApiClient)
+
+
+def test_load_auth_backend_rejects_unknown_name():
+    with pytest.raises(RuntimeError, match="Unknown Airflow auth backend"):
+        client.load_auth_backend("kerberos")
+
+
+def test_load_auth_backend_reports_missing_extra(monkeypatch):
+    monkeypatch.setitem(client.AUTH_BACKENDS, "aws", "not_installed_sdk:factory")
+    with pytest.raises(RuntimeError, match="Install the 'aws' extra"):
+        client.load_auth_backend("aws")
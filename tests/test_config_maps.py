@@ -0,0 +1,43 @@
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.config_maps import ConfigMapCache
+from config.secret_refs import SecretRefIndex
+
+
+def _cache():
+    refs = SecretRefIndex()
+    refs.update(("variableset", "ns", "settings"), "ns", {("settings", None)})
+    api = MagicMock()
+    api.read_namespaced_config_map.return_value = SimpleNamespace(
+        data={"bucket": "s3://v1"}
+    )
+    return ConfigMapCache(refs, api), api
+
+
+def test_referenced_config_maps_are_read_once_and_kept_current():
+    cache, api = _cache()
+
+    assert cache.get("ns", "settings") == {"bucket": "s3://v1"}
+    assert cache.get("ns", "settings") == {"bucket": "s3://v1"}
+    api.read_namespaced_config_map.assert_called_once_with("settings", "ns")
+
+    assert cache.update("ns", "settings", {"bucket": "s3://v2"}) == {
+        "bucket": "s3://v1"
+    }
+    assert cache.get("ns", "settings") == {"bucket": "s3://v2"}
+    cache.remove("ns", "settings")
+    assert ("ns", "settings") not in cache
+
+
+def test_unreferenced_config_maps_are_not_kept():
+    cache, api = _cache()
+
+    cache.get("ns", "other")
+    cache.update("ns", "other", {"key": "value"})
+
+    assert ("ns", "other") not in cache
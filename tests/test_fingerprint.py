@@ -0,0 +1,52 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.fingerprint import FingerprintStore, fingerprint
+
+
+def test_fingerprint_is_stable_across_key_order():
+    assert fingerprint({"key": "a", "value": "b"}) == fingerprint(
+        {"value": "b", "key": "a"}
+    )
+
+
+def test_fingerprint_changes_with_value():
+    assert fingerprint({"value": "a"}) != fingerprint({"value": "b"})
+
+
+def test_is_fresh_requires_matching_digest():
+    store = FingerprintStore(ttl=60)
+    store.record(("default", "var"), "abc", verified_at=1000)
+    assert store.is_fresh(("default", "var"), "abc", now=1030)
+    assert not store.is_fresh(("default", "var"), "def", now=1030)
+    assert not store.is_fresh(("default", "other"), "abc", now=1030)
+
+
+def test_is_fresh_expires_after_ttl():
+    store = FingerprintStore(ttl=60)
+    store.record(("default", "var"), "abc", verified_at=1000)
+    assert not store.is_fresh(("default", "var"), "abc", now=1061)
+
+
+def test_seed_round_trips_status_entry():
+    store = FingerprintStore(ttl=60)
+    entry = store.record(("default", "var"), "abc", verified_at=1000)
+
+    restarted = FingerprintStore(ttl=60)
+    restarted.seed(("default", "var"), entry)
+    assert restarted.is_fresh(("default", "var"), "abc", now=1010)
+
+
+def test_seed_does_not_override_known_entry():
+    store = FingerprintStore(ttl=60)
+    store.record(("default", "var"), "new", verified_at=1000)
+    store.seed(("default", "var"), {"hash": "old", "verifiedAt": "1970-01-01T00:00:00"})
+    assert store.matches(("default", "var"), "new")
+
+
+def test_seed_ignores_malformed_entry():
+    store = FingerprintStore(ttl=60)
+    store.seed(("default", "var"), {"hash": "abc", "verifiedAt": "not-a-date"})
+    assert not store.matches(("default", "var"), "abc")
@@ -0,0 +1,224 @@
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from kubernetes.client.exceptions import ApiException
+from prometheus_client import REGISTRY
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.gc import GC_DRY_RUN, GC_ENABLED, OrphanCollector, OwnershipLedger
+from config.instances import DEFAULT_INSTANCE, InstanceRegistry
+from config.ownership import WrittenObjects
+from config.reconciler import BulkReconciler, ResourceIndex
+from config.workqueue import WorkQueue
+
+
+class _ConfigMaps:
+    """In-memory stand-in for the ConfigMap calls of `CoreV1Api`."""
+
+    def __init__(self, data=None):
+        self.config_map = None
+        self.version = 0
+        self.conflicts = 0
+        if data is not None:
+            self._store(data)
+
+    def _store(self, data):
+        self.version += 1
+        self.config_map = SimpleNamespace(
+            data=data, metadata=SimpleNamespace(resource_version=str(self.version))
+        )
+
+    def read_namespaced_config_map(self, name, namespace):
+        if self.config_map is None:
+            raise ApiException(status=404)
+        return self.config_map
+
+    def create_namespaced_config_map(self, namespace, body):
+        if self.config_map is not None:
+            raise ApiException(status=409)
+        self._store(body["data"])
+
+    def replace_namespaced_config_map(self, name, namespace, body):
+        if self.conflicts:
+            # Another replica updated the ledger in between
+            self.conflicts -= 1
+            self._store(dict(self.config_map.data))
+            raise ApiException(status=409)
+        if body["metadata"]["resourceVersion"] != (
+            self.config_map.metadata.resource_version
+        ):
+            raise ApiException(status=409)
+        self._store(body["data"])
+
+
+def _ledger(*owned):
+    api = _ConfigMaps({"default.pools": json.dumps(sorted(owned))} if owned else None)
+    return OwnershipLedger(api=api), api
+
+
+def _pool(name):
+    return {"name": name, "slots": 1, "description": None}
+
+
+def _written(*ids):
+    written = WrittenObjects()
+    written.enabled = True
+    for object_id in ids:
+        written.record(DEFAULT_INSTANCE, "pools", object_id)
+    return written
+
+
+def _collector(mode, remote, send_json=None, ledger=None, written=None, **kwargs):
+    target = SimpleNamespace(name=DEFAULT_INSTANCE, api_client=MagicMock())
+    if send_json is not None:
+        target.api_client.send_json.side_effect = send_json
+    instances = InstanceRegistry(
+        create=lambda key, namespace, spec: target, create_default=lambda: target
+    )
+    index = ResourceIndex()
+    index.upsert("ns", "kept", {"slots": 1})
+    pools = BulkReconciler(
+        resource_type="pool",
+        plural="pools",
+        id_field="name",
+        collection="pools",
+        index=index,
+        list_page=lambda target, limit, offset: {
+            "pools": remote[offset : offset + limit],
+            "total_entries": len(remote),
+        },
+        build_payload=MagicMock(),
+        write=MagicMock(),
+        instances=instances,
+        queue=WorkQueue(),
+    )
+    collector = OrphanCollector(
+        mode=mode,
+        reconcilers={"pool": pools},
+        instances=instances,
+        ledger=ledger or _ledger()[0],
+        written=written or _written(),
+        rate=1000,
+        batch_size=10,
+        **kwargs,
+    )
+    return collector, target
+
+
+def _orphans():
+    return REGISTRY.get_sample_value(
+        "airflow_orphaned_objects",
+        {"resource_type": "pool", "instance": DEFAULT_INSTANCE},
+    )
+
+
+def test_ledger_survives_concurrent_updates():
+    ledger, api = _ledger("a")
+    api.conflicts = 2
+
+    ledger.update("default", "pools", add={"b"}, remove={"a"})
+
+    assert ledger.owned("default", "pools") == {"b"}
+    assert ledger.owned("airflow/eu", "pools") == set()
+
+
+def test_dry_run_records_ownership_and_counts_orphans_without_deleting():
+    remote = [_pool("kept"), _pool("orphan"), _pool("created-by-hand")]
+    ledger, api = _ledger("orphan", "deleted-by-hand")
+    collector, target = _collector(
+        GC_DRY_RUN, remote, ledger=ledger, written=_written("kept")
+    )
+
+    assert collector.run_pass() == 0
+    assert _orphans() == 1
+    target.api_client.send_json.assert_not_called()
+    # Descriptions are left alone; ownership is tracked in the ConfigMap
+    assert ledger.owned("default", "pools") == {"kept", "orphan"}
+
+
+def test_only_objects_the_operator_wrote_are_owned():
+    remote = [_pool("kept")]
+    ledger, api = _ledger()
+    written = _written("not-listed-yet")
+    collector, target = _collector(GC_ENABLED, remote, ledger=ledger, written=written)
+    collector._reconcilers["pool"].index.upsert("ns", "not-listed-yet", {})
+
+    # The object existed before and was never written by the operator
+    assert collector.run_pass() == 0
+    assert ledger.owned("default", "pools") == set()
+
+    written.record(DEFAULT_INSTANCE, "pools", "kept")
+    remote.append(_pool("not-listed-yet"))
+    collector.run_pass()
+    assert ledger.owned("default", "pools") == {"kept", "not-listed-yet"}
+    assert written.get(DEFAULT_INSTANCE, "pools") == set()
+
+
+def test_orphans_are_deleted_and_missing_ones_ignored():
+    remote = [_pool(name) for name in ("kept", "orphan one", "gone")]
+    ledger, api = _ledger("kept", "orphan one", "gone")
+
+    def send_json(method, path, body=None):
+        if path == "/pools/gone":
+            raise RuntimeError("(404) Not Found")
+        return 204
+
+    collector, target = _collector(GC_ENABLED, remote, send_json, ledger=ledger)
+
+    assert collector.run_pass() == 1
+    assert ledger.owned("default", "pools") == {"kept"}
+    assert [call.args for call in target.api_client.send_json.call_args_list] == [
+        ("DELETE", "/pools/gone"),
+        ("DELETE", "/pools/orphan%20one"),
+    ]
+
+
+def test_nothing_is_deleted_above_the_safety_limit():
+    remote = [_pool(f"orphan-{i}") for i in range(3)]
+    ledger, api = _ledger(*(pool["name"] for pool in remote))
+    collector, target = _collector(GC_ENABLED, remote, ledger=ledger, max_deletes=2)
+
+    assert collector.run_pass() == 0
+    assert _orphans() == 3
+    target.api_client.send_json.assert_not_called()
+
+
+def test_objects_of_resources_that_lose_their_instance_are_not_deleted():
+    remote = [_pool("kept"), _pool("eu")]
+    api = _ConfigMaps(
+        {"default.pools": json.dumps(["kept"]), "airflow_eu.pools": json.dumps(["eu"])}
+    )
+    collector, target = _collector(GC_ENABLED, remote, ledger=OwnershipLedger(api=api))
+    collector._instances.upsert("airflow", "eu", {"host": "http://eu"})
+    index = collector._reconcilers["pool"].index
+    spec = {"airflowRef": {"name": "eu", "namespace": "airflow"}}
+    with patch("config.instances.OPERATOR_CROSS_NAMESPACE_INSTANCES", True):
+        index.upsert("team", "eu", spec)
+    # Cross-namespace references are turned off afterwards
+    with patch("config.instances.OPERATOR_CROSS_NAMESPACE_INSTANCES", False):
+        index.upsert("team", "eu", spec)
+
+    assert index.get("team", "eu").unresolved
+    assert collector.run_pass() == 0
+    target.api_client.send_json.assert_not_called()
+
+
+def test_first_pass_waits_for_the_warm_sync_and_only_reports():
+    synced = threading.Event()
+    collector, target = _collector(GC_ENABLED, [], synced=synced)
+    passed = threading.Event()
+    collector.run_pass = MagicMock(side_effect=lambda dry_run: passed.set())
+
+    collector.start()
+    try:
+        assert not passed.wait(0.2)
+        synced.set()
+        assert passed.wait(5)
+    finally:
+        collector.stop()
+    collector.run_pass.assert_called_once_with(dry_run=True)
@@ -0,0 +1,45 @@
+import datetime
+import importlib
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+
+
+class _Credentials:
+    def __init__(self):
+        self.refreshes = 0
+        self.token = None
+        self.expiry = None
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.token = f"token-{self.refreshes}"
+        self.expiry = datetime.datetime.now(datetime.UTC).replace(
+            tzinfo=None
+        ) + datetime.timedelta(hours=1)
+
+
+def test_google_client_looks_up_credentials_lazily():
+    credentials = _Credentials()
+    with patch("google.auth.default", return_value=(credentials, "project")) as adc:
+        gcp = importlib.import_module("config.gcp")
+        client = gcp.create_api_client()
+        try:
+            assert adc.call_count == 0
+            assert client.auth_refresh_needed()
+            assert client.auth_headers() == {"Authorization": "Bearer token-1"}
+            assert client.auth_headers() == {"Authorization": "Bearer token-1"}
+            assert adc.call_count == 1
+            assert credentials.refreshes == 1
+        finally:
+            client._refresher.stop()
+
+
+def test_google_client_uses_pooled_session_for_token_requests():
+    gcp = importlib.import_module("config.gcp")
+    client = gcp.create_api_client()
+    adapter = client._auth_request.session.get_adapter("https://oauth2.googleapis.com")
+    assert "socket_options" in adapter.poolmanager.connection_pool_kw
@@ -0,0 +1,87 @@
+import os
+import socket
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+import airflow_client.client as client
+import prometheus_client as prometheus
+
+from config import http_pool
+from config.api_client import AirflowApiClient, endpoint_label
+from config.base import OPERATOR_HTTP_POOL_MAXSIZE
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"pools": [], "total_entries": 0}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_configure_applies_pool_settings():
+    configuration = http_pool.configure(client.Configuration(host="http://x"))
+    assert configuration.connection_pool_maxsize == OPERATOR_HTTP_POOL_MAXSIZE
+    assert configuration.retries.total == http_pool.retry_policy().total
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in configuration.socket_options
+
+
+def test_requests_session_mounts_pooled_adapter():
+    adapter = http_pool.requests_session().get_adapter("https://example.com")
+    assert adapter._pool_maxsize == OPERATOR_HTTP_POOL_MAXSIZE
+    assert "socket_options" in adapter.poolmanager.connection_pool_kw
+
+
+def test_connections_are_reused_and_reported():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host = f"http://127.0.0.1:{server.server_port}/api/v1"
+        api_client = AirflowApiClient(client.Configuration(host=host))
+        for _ in range(3):
+            api_client.call_api("/pools", "GET", _preload_content=False).data
+
+        in_use, idle, capacity = http_pool.pool_usage(
+            api_client.rest_client.pool_manager
+        )
+        assert (in_use, idle, capacity) == (0, 1, OPERATOR_HTTP_POOL_MAXSIZE)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_endpoint_label_hides_object_ids():
+    assert endpoint_label("/connections") == "/connections"
+    assert endpoint_label("/connections/my%20conn") == "/connections/{id}"
+    assert endpoint_label("") == "/"
+
+
+def test_requests_are_recorded_per_endpoint():
+    labels = {"method": "GET", "endpoint": "/pools", "status_code": "200"}
+    before = (
+        prometheus.REGISTRY.get_sample_value("airflow_api_requests_total", labels) or 0
+    )
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host = f"http://127.0.0.1:{server.server_port}/api/v1"
+        api_client = AirflowApiClient(client.Configuration(host=host))
+        api_client.call_api("/pools", "GET", _preload_content=False).data
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    after = prometheus.REGISTRY.get_sample_value("airflow_api_requests_total", labels)
+    assert after == before + 1
@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+os.environ.setdefault("AIRFLOW_USERNAME", "admin")
+os.environ.setdefault("AIRFLOW_PASSWORD", "admin")
+
+from config.instances import (  # noqa: E402
+    DEFAULT_INSTANCE,
+    InstanceRegistry,
+    api_url,
+    create_target,
+    credential_refs,
+    instance_key,
+)
+
+SPEC = {
+    "host": "https://airflow.example.com/",
+    "auth": {
+        "backend": "basic",
+        "username": "operator",
+        "password": {"secretRef": {"name": "airflow-creds", "key": "password"}},
+    },
+    "rateLimit": {"requestsPerSecond": 5, "burst": 5},
+}
+REF = {"name": "eu", "namespace": "airflow"}
+
+
+def test_instance_key():
+    assert instance_key("team", {}) == DEFAULT_INSTANCE
+    assert instance_key("team", {"airflowRef": {"name": "eu"}}) == "team/eu"
+    ref = {"name": "eu", "namespace": "airflow"}
+    assert instance_key("airflow", {"airflowRef": ref}) == "airflow/eu"
+    with pytest.raises(LookupError):
+        instance_key("team", {"airflowRef": ref})
+    assert instance_key("team", {"airflowRef": ref}, cross_namespace=True) == (
+        "airflow/eu"
+    )
+
+
+def test_api_url():
+    assert api_url("https://a.example.com/") == "https://a.example.com/api/v1"
+    assert api_url("https://a.example.com", "/api/v2") == "https://a.example.com/api/v2"
+    assert api_url("https://a.example.com/api/v1") == "https://a.example.com/api/v1"
+
+
+def test_credential_refs():
+    assert credential_refs(SPEC) == {("airflow-creds", "password")}
+
+
+def test_create_target_has_own_limiter_and_pool():
+    with patch("config.instances.resolve_value", side_effect=["operator", "s3cr3t"]):
+        first = create_target("airflow/eu", "airflow", SPEC)
+    with patch("config.instances.resolve_value", side_effect=["operator", "s3cr3t"]):
+        second = create_target("airflow/us", "airflow", SPEC)
+
+    assert first.api_client.api_host() == "https://airflow.example.com/api/v1"
+    assert first.api_client.configuration.password == "s3cr3t"
+    assert first.api_client.rate_limiter.max_rate == 5
+    assert first.api_client.rate_limiter is not second.api_client.rate_limiter
+    assert first.api_client.rest_client is not second.api_client.rest_client
+    assert first.aio_client._sync_client is first.api_client
+
+
+def test_registry_builds_lazily_and_caches():
+    built = []
+
+    def create(key, namespace, spec):
+        built.append(key)
+        return object()
+
+    registry = InstanceRegistry(create=create, create_default=object)
+    registry.upsert("airflow", "eu", SPEC)
+    assert built == []
+
+    target = registry.target("airflow/eu")
+    assert registry.for_resource("airflow", {"airflowRef": REF}) is target
+    assert built == ["airflow/eu"]
+
+    with pytest.raises(LookupError):
+        registry.target("airflow/missing")
+
+
+def test_registry_retires_target_when_spec_changes():
+    registry = InstanceRegistry(
+        create=lambda key, namespace, spec: object(), create_default=object
+    )
+    registry.upsert("airflow", "eu", SPEC)
+    target = registry.target("airflow/eu")
+
+    assert registry.upsert("airflow", "eu", SPEC) is None
+    assert registry.upsert("airflow", "eu", {**SPEC, "host": "https://new"}) is target
+    assert registry.target("airflow/eu") is not target
+    assert registry.remove("airflow", "eu") is not None
+    with pytest.raises(LookupError):
+        registry.target("airflow/eu")
+
+
+def test_for_resource_async_builds_off_the_event_loop():
+    registry = InstanceRegistry(
+        create=lambda key, namespace, spec: key, create_default=lambda: "default"
+    )
+    registry.upsert("airflow", "eu", SPEC)
+
+    async def lookup():
+        return await registry.for_resource_async("airflow", {"airflowRef": REF})
+
+    assert asyncio.run(lookup()) == "airflow/eu"
+    assert asyncio.run(registry.for_resource_async("team", {})) == "default"
+
+
+def test_instances_cannot_import_custom_auth_backends():
+    spec = {**SPEC, "auth": {"backend": "os:system"}}
+
+    with pytest.raises(ValueError, match="Unknown auth backend"):
+        create_target("airflow/eu", "airflow", spec)
+
+
+def test_default_target_is_built_outside_the_registry_lock():
+    registry = InstanceRegistry(create_default=lambda: registry._lock.locked())
+
+    assert registry.target() is False
@@ -5,7 +5,16 @@ from unittest.mock import MagicMock, patch
 import pytest
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from k8s_secret import _get_secret_value, resolve_value
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.k8s_secret import _get_secret_value, prefetch_secrets, resolve_value
+from config.secret_cache import secret_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_secret_cache():
+    secret_cache.clear()
+    yield
+    secret_cache.clear()
 
 
 def test_resolve_value_direct_string():
@@ -18,7 +27,7 @@ def test_resolve_value_with_explicit_key():
 
 
 def test_resolve_value_secret_ref():
-    with patch("k8s_secret._get_secret_value") as mock_get_secret:
+    with patch("config.k8s_secret._get_secret_value") as mock_get_secret:
         mock_get_secret.return_value = "secret-value"
         spec = {"secretRef": {"name": "my-secret", "key": "my-key"}}
         result = resolve_value(spec, "default")
@@ -27,7 +36,7 @@ def test_resolve_value_secret_ref():
 
 
 def test_extra_args_resolve_value_secret_ref():
-    with patch("k8s_secret._get_secret_value") as mock_get_secret:
+    with patch("config.k8s_secret._get_secret_value") as mock_get_secret:
         mock_get_secret.return_value = "secret-value"
         spec = {
             "description": "Example Airflow Variable that fetches value from a Kubernetes Secret.",
@@ -52,7 +61,7 @@ def test_resolve_value_invalid_spec():
 
 def test__get_secret_value_success():
     # Patch the Kubernetes client and secret object
-    with patch("k8s_secret.client.CoreV1Api") as mock_api:
+    with patch("config.k8s_secret.client.CoreV1Api") as mock_api:
         mock_instance = MagicMock()
         mock_api.return_value = mock_instance
         secret_obj = MagicMock()
@@ -66,7 +75,7 @@ def test__get_secret_value_success():
 
 
 def test__get_secret_value_missing_key():
-    with patch("k8s_secret.client.CoreV1Api") as mock_api:
+    with patch("config.k8s_secret.client.CoreV1Api") as mock_api:
         mock_instance = MagicMock()
         mock_api.return_value = mock_instance
         secret_obj = MagicMock()
@@ -77,9 +86,47 @@ def test__get_secret_value_missing_key():
 
 
 def test__get_secret_value_api_exception():
-    with patch("k8s_secret.client.CoreV1Api") as mock_api:
+    with patch("config.k8s_secret.client.CoreV1Api") as mock_api:
         mock_instance = MagicMock()
         mock_api.return_value = mock_instance
         mock_instance.read_namespaced_secret.side_effect = Exception("API error")
         with pytest.raises(ValueError):
             _get_secret_value("my-secret", "my-key", "default")
+
+
+def test__get_secret_value_served_from_cache():
+    with patch("config.k8s_secret.client.CoreV1Api") as mock_api:
+        mock_instance = MagicMock()
+        mock_api.return_value = mock_instance
+        secret_obj = MagicMock()
+        secret_obj.data = {"my-key": "c2VjcmV0LXZhbHVl"}  # base64 for 'secret-value'
+        mock_instance.read_namespaced_secret.return_value = secret_obj
+
+        assert _get_secret_value("my-secret", "my-key", "default") == "secret-value"
+        assert _get_secret_value("my-secret", "my-key", "default") == "secret-value"
+        mock_instance.read_namespaced_secret.assert_called_once_with(
+            "my-secret", "default"
+        )
+
+
+def _secret_list(secrets, continue_token):
+    items = []
+    for name, data in secrets.items():
+        secret = MagicMock(data=data)
+        secret.metadata.name = name
+        items.append(secret)
+    return MagicMock(items=items, metadata=MagicMock(_continue=continue_token))
+
+
+def test_prefetch_secrets_pages_through_namespace():
+    with patch("config.k8s_secret.client.CoreV1Api") as mock_api:
+        mock_api.return_value.list_namespaced_secret.side_effect = [
+            _secret_list({"db": {"password": "czNjcjN0"}}, "next"),
+            _secret_list({"other": {"token": "eA=="}}, None),
+        ]
+        loaded = prefetch_secrets([("default", "db")])
+
+    assert loaded == 1
+    assert mock_api.return_value.list_namespaced_secret.call_count == 2
+    assert secret_cache.get("default", "db") == {"password": "s3cr3t"}
+    assert ("default", "other") not in secret_cache
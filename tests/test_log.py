@@ -0,0 +1,77 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from airflow_client.client.exceptions import ApiException
+
+from config.log import LogFilter, redact_error, redacted, sampled
+
+
+class _Records(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _logger(log_filter):
+    logger = logging.getLogger(f"test_log.{id(log_filter)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    records = _Records()
+    records.addFilter(log_filter)
+    logger.addHandler(records)
+    return logger, records
+
+
+def test_repeated_messages_about_an_object_are_sampled():
+    clock = [0.0]
+    log_filter = LogFilter(interval=60, clock=lambda: clock[0])
+    logger, records = _logger(log_filter)
+
+    for _ in range(3):
+        logger.info("Synced pool %s", "ns/a", extra=sampled("pools", "ns", "a"))
+    logger.info("Synced pool %s", "ns/b", extra=sampled("pools", "ns", "b"))
+    clock[0] = 60
+    logger.info("Synced pool %s", "ns/a", extra=sampled("pools", "ns", "a"))
+
+    assert records.messages == [
+        "Synced pool ns/a",
+        "Synced pool ns/b",
+        "Synced pool ns/a (2 similar messages suppressed)",
+    ]
+
+
+def test_api_errors_do_not_echo_sent_secrets():
+    error = ApiException(status=422, reason="Unprocessable Entity")
+    error.body = (
+        '{"detail": [{"input": {"password": "s3cr\\"et", "login": "abc", '
+        '"extra": "{\\"token\\": \\"t0ken\\"}"}}]}'
+    )
+    body = {
+        "password": 's3cr"et',
+        "login": "abc",
+        "extra": '{"token": "t0ken"}',
+    }
+
+    assert redact_error(error, body) is error
+    assert "s3cr" not in str(error)
+    assert "t0ken" not in str(error)
+    assert '"login": "abc"' in str(error)
+
+
+def test_redacted_keeps_secret_references():
+    spec = {
+        "connType": "postgres",
+        "password": "hunter22",
+        "value": {"secretRef": {"name": "db", "key": "password"}},
+    }
+    assert redacted(spec) == {
+        "connType": "postgres",
+        "password": "***",
+        "value": {"secretRef": {"name": "db", "key": "password"}},
+    }
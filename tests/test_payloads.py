@@ -0,0 +1,116 @@
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+import airflow_client.client as client
+from airflow_client.client.exceptions import ApiException
+from airflow_client.client.model.connection import Connection
+from airflow_client.client.model.pool import Pool
+
+from config import http_pool
+from config.api_client import AirflowApiClient
+from config.ownership import written_objects
+from config.payloads import PayloadSchema, write_object
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+
+    def _respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        self.requests.append((self.command, self.path, body))
+        status = 404 if self.path.endswith("/missing") else 200
+        data = json.dumps(body or {}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_PATCH = _respond
+    do_POST = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def target():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _Handler.requests = []
+    host = f"http://127.0.0.1:{server.server_port}/api/v1"
+    try:
+        yield SimpleNamespace(
+            name="default",
+            api_client=AirflowApiClient(client.Configuration(host=host)),
+            bulk=None,
+        )
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_schema_accepts_payloads_the_model_accepts():
+    schema = PayloadSchema(Connection)
+    payload = {"connection_id": "db", "conn_type": "postgres", "port": 5432}
+    schema.validate({**payload, "host": None})
+    Connection(**payload)
+
+
+def test_schema_rejects_wrong_types_and_read_only_fields():
+    schema = PayloadSchema(Pool)
+    with pytest.raises(ValueError, match="slots: expected int, got NoneType"):
+        schema.validate({"name": "pool", "slots": None})
+    with pytest.raises(ValueError, match="expected int, got bool"):
+        schema.validate({"name": "pool", "slots": True})
+    with pytest.raises(ValueError, match="no writable field open_slots"):
+        schema.validate({"name": "pool", "open_slots": 1})
+
+
+def test_write_object_sends_the_payload_as_json(target, monkeypatch):
+    schema = PayloadSchema(Pool)
+    payload = {"name": "my pool", "slots": 3, "description": None}
+
+    monkeypatch.setattr(written_objects, "enabled", True)
+    write_object(target, "pools", schema, "my pool", payload, exists=True)
+    write_object(target, "pools", schema, "my pool", payload, exists=False)
+
+    assert _Handler.requests == [
+        ("PATCH", "/api/v1/pools/my%20pool", payload),
+        ("POST", "/api/v1/pools", payload),
+    ]
+    # Undeserialized responses still return their connection to the pool
+    in_use, idle, _ = http_pool.pool_usage(target.api_client.rest_client.pool_manager)
+    assert (in_use, idle) == (0, 1)
+    assert "my pool" in written_objects.get("default", "pools")
+    written_objects.forget("default", "pools", {"my pool"})
+
+
+def test_write_object_raises_api_errors(target, monkeypatch):
+    monkeypatch.setattr(written_objects, "enabled", True)
+    schema = PayloadSchema(Pool)
+    with pytest.raises(ApiException) as error:
+        write_object(
+            target, "pools", schema, "missing", {"name": "missing"}, exists=True
+        )
+    assert error.value.status == 404
+    # Only successful writes make an object owned
+    assert "missing" not in written_objects.get("default", "pools")
+
+
+def test_request_json_returns_the_decoded_response(target):
+    body = {"actions": [{"action": "delete", "entities": ["pool"]}]}
+    assert target.api_client.request_json("PATCH", "/pools", body) == body
+    in_use, idle, _ = http_pool.pool_usage(target.api_client.rest_client.pool_manager)
+    assert (in_use, idle) == (0, 1)
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.ratelimit import (
+    AdaptiveRateLimiter,
+    InFlightLimit,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+def test_burst_is_available_immediately():
+    bucket = TokenBucket(rate=1, burst=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0, 0, 0]
+    assert bucket.try_acquire() > 0
+
+
+def test_tokens_refill_at_rate():
+    with patch("config.ratelimit.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(rate=2, burst=1)
+        assert bucket.try_acquire() == 0
+        assert bucket.try_acquire() == 0.5
+    with patch("config.ratelimit.time.monotonic", return_value=100.5):
+        assert bucket.try_acquire() == 0
+
+
+def test_acquire_sleeps_until_a_token_is_available():
+    clock = [0.0]
+
+    def sleep(seconds):
+        clock[0] += seconds
+
+    with (
+        patch("config.ratelimit.time.monotonic", side_effect=lambda: clock[0]),
+        patch("config.ratelimit.time.sleep", side_effect=sleep),
+    ):
+        bucket = TokenBucket(rate=4, burst=1)
+        assert bucket.acquire() == 0
+        assert bucket.acquire() == 0.25
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_throttling_halves_rate_once_per_cooldown():
+    limiter = AdaptiveRateLimiter(max_rate=8, burst=8, min_rate=1, increase=1)
+    limiter.record(429)
+    limiter.record(503)
+    assert limiter.rate == 4
+
+
+def test_throttling_respects_min_rate_and_retry_after():
+    limiter = AdaptiveRateLimiter(max_rate=2, burst=2, min_rate=1.5, increase=1)
+    limiter.record(503, "30")
+    assert limiter.rate == 1.5
+    assert 29 < limiter._delay() <= 30
+
+
+def test_success_increases_rate_up_to_max():
+    limiter = AdaptiveRateLimiter(max_rate=8, burst=8, min_rate=1, increase=2)
+    limiter.record(429)
+    limiter.record(200)
+    assert limiter.rate == 4.5
+    for _ in range(100):
+        limiter.record(204)
+    assert limiter.rate == 8
+
+
+def test_disabled_limiter_never_waits():
+    limiter = AdaptiveRateLimiter(max_rate=0, burst=0, min_rate=1, increase=1)
+    limiter.acquire()
+    limiter.record(429, "60")
+    assert limiter.rate == 0
+
+
+def test_in_flight_limit_is_shared_by_threads_and_coroutines():
+    limit = InFlightLimit(1)
+    limit.acquire()
+    order = []
+
+    async def request():
+        async with limit:
+            order.append("async")
+
+    def worker():
+        with limit:
+            order.append("thread")
+
+    async def scenario():
+        task = asyncio.create_task(request())
+        await asyncio.sleep(0.01)
+        thread = threading.Thread(target=worker)
+        thread.start()
+        await asyncio.sleep(0.01)
+        assert order == []
+        # Slots go to waiters in arrival order
+        limit.release()
+        await task
+        await asyncio.to_thread(thread.join, 5)
+
+    asyncio.run(scenario())
+    assert order == ["async", "thread"]
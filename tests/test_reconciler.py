@@ -0,0 +1,328 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+from prometheus_client import REGISTRY
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.instances import InstanceRegistry
+from config.metrics import ManagedResourceCollector
+from config.reconciler import BulkReconciler, ResourceIndex, diff_payload
+from config.workqueue import WorkQueue
+
+
+def _instances():
+    return InstanceRegistry(
+        create=lambda key, namespace, spec: key, create_default=lambda: "default"
+    )
+
+
+def _pages(objects, page_size):
+    def list_page(target, limit, offset):
+        return {
+            "pools": objects[offset : offset + min(limit, page_size)],
+            "total_entries": len(objects),
+        }
+
+    return list_page
+
+
+def _pool_payload(name, spec, namespace, logger=None):
+    return {"name": name, "slots": spec["slots"], "description": None}
+
+
+def _reconciler(objects, write, page_size=100, **kwargs):
+    index = ResourceIndex()
+    return index, BulkReconciler(
+        resource_type="pool",
+        plural="pools",
+        id_field="name",
+        collection="pools",
+        index=index,
+        list_page=_pages(objects, page_size),
+        build_payload=_pool_payload,
+        write=write,
+        instances=_instances(),
+        queue=WorkQueue(),
+        **kwargs,
+    )
+
+
+def test_diff_payload_missing_remote():
+    assert diff_payload({"name": "p", "slots": 1}, None) == ["name", "slots"]
+
+
+def test_diff_payload_treats_empty_and_null_as_equal():
+    desired = {"name": "p", "description": "", "slots": 2}
+    remote = {"name": "p", "description": None, "slots": 3}
+    assert diff_payload(desired, remote) == ["slots"]
+
+
+def test_diff_payload_skips_hidden_fields():
+    desired = {"connection_id": "c", "password": "secret"}
+    assert diff_payload(desired, {"connection_id": "c"}) == []
+
+
+def test_snapshot_pages_through_collection():
+    objects = [{"name": f"pool-{i}", "slots": i} for i in range(5)]
+    _, reconciler = _reconciler(objects, MagicMock(), page_size=2)
+    assert sorted(reconciler.snapshot("default")) == [f"pool-{i}" for i in range(5)]
+
+
+def test_run_cycle_only_writes_drifted_objects():
+    objects = [
+        {"name": "in-sync", "slots": 1, "description": None},
+        {"name": "drifted", "slots": 1, "description": None},
+    ]
+
+    def write(target, payload, exists):
+        if exists and payload["name"] == "missing":
+            raise RuntimeError("404 Not Found")
+
+    write = MagicMock(side_effect=write)
+    index, reconciler = _reconciler(objects, write)
+    index.upsert("default", "in-sync", {"slots": 1})
+    index.upsert("default", "drifted", {"slots": 4})
+    index.upsert("default", "missing", {"slots": 2})
+
+    with patch("config.reconciler.status_manager"):
+        assert reconciler.run_cycle() == 2
+        write.assert_not_called()
+        assert reconciler.queue.drain() == 2
+    written = [(call.args[1]["name"], call.args[2]) for call in write.call_args_list]
+    assert written == [("drifted", True), ("missing", True), ("missing", False)]
+
+
+def test_reconcilers_of_one_collection_share_a_listing():
+    objects = [{"name": "pool", "slots": 1, "description": None}]
+    list_page = MagicMock(side_effect=_pages(objects, 100))
+    index, first = _reconciler(objects, MagicMock())
+    index.upsert("default", "pool", {"slots": 1})
+    _, second = _reconciler(objects, MagicMock())
+    second.index = index
+    first._list_page = second._list_page = list_page
+
+    snapshots = {}
+    with patch("config.reconciler.status_manager"):
+        assert first.run_cycle(snapshots=snapshots) == 0
+        assert second.run_cycle(snapshots=snapshots) == 0
+    assert list_page.call_count == 1
+
+
+def test_run_cycle_acquires_limiter_per_write():
+    objects = [{"name": "in-sync", "slots": 1, "description": None}]
+    index, reconciler = _reconciler(objects, MagicMock())
+    index.upsert("default", "in-sync", {"slots": 1})
+    index.upsert("default", "missing-a", {"slots": 2})
+    index.upsert("default", "missing-b", {"slots": 3})
+    limiter = MagicMock()
+
+    with patch("config.reconciler.status_manager"):
+        assert reconciler.run_cycle(limiter) == 2
+        # The workers pace the writes, not the enqueueing
+        assert limiter.acquire.call_count == 0
+        reconciler.queue.drain()
+    assert limiter.acquire.call_count == 2
+
+
+def test_hidden_fields_are_written_once():
+    write = MagicMock()
+    index = ResourceIndex()
+    index.upsert("default", "conn", {"password": "secret"})
+    reconciler = BulkReconciler(
+        resource_type="connection",
+        plural="connections",
+        id_field="connection_id",
+        collection="connections",
+        index=index,
+        list_page=lambda target, limit, offset: {
+            "connections": [{"connection_id": "conn"}],
+            "total_entries": 1,
+        },
+        build_payload=lambda name, spec, namespace: {
+            "connection_id": name,
+            "password": spec["password"],
+        },
+        write=write,
+        instances=_instances(),
+        queue=WorkQueue(),
+    )
+
+    with patch("config.reconciler.status_manager") as statuses:
+        assert reconciler.run_cycle() == 1
+        reconciler.queue.drain()
+        assert reconciler.run_cycle() == 0
+
+        index.upsert("default", "conn", {"password": "rotated"})
+        assert reconciler.run_cycle() == 1
+        reconciler.queue.drain()
+    assert write.call_count == 2
+    assert statuses.update.call_count == 2
+
+
+def test_hidden_fields_trust_seeded_fingerprint():
+    write = MagicMock()
+    index = ResourceIndex()
+    index.upsert("default", "conn", {"password": "secret"})
+    reconciler = BulkReconciler(
+        resource_type="connection",
+        plural="connections",
+        id_field="connection_id",
+        collection="connections",
+        index=index,
+        list_page=lambda target, limit, offset: {
+            "connections": [{"connection_id": "conn"}],
+            "total_entries": 1,
+        },
+        build_payload=lambda name, spec, namespace: {
+            "connection_id": name,
+            "password": spec["password"],
+        },
+        write=write,
+        instances=_instances(),
+        queue=WorkQueue(),
+    )
+    persisted = reconciler.mark_synced(
+        "default", "conn", {"connection_id": "conn", "password": "secret"}
+    )
+    reconciler.forget("default", "conn")
+    reconciler.fingerprints.seed(("default", "conn"), persisted)
+
+    assert reconciler.run_cycle() == 0
+    write.assert_not_called()
+
+
+def test_run_cycle_lists_each_referenced_instance():
+    listed = []
+
+    def list_page(target, limit, offset):
+        listed.append(target)
+        return {"pools": [], "total_entries": 0}
+
+    write = MagicMock()
+    index = ResourceIndex()
+    instances = _instances()
+    instances.upsert("airflow", "eu", {"host": "https://eu.example.com"})
+    index.upsert("default", "local", {"slots": 1})
+    index.upsert("team", "remote", {"slots": 2, "airflowRef": {"name": "eu"}})
+    index.upsert(
+        "airflow",
+        "shared",
+        {"slots": 3, "airflowRef": {"name": "eu", "namespace": "airflow"}},
+    )
+    # Other namespaces' instances may not be referenced by default
+    index.upsert(
+        "team",
+        "foreign",
+        {"slots": 4, "airflowRef": {"name": "eu", "namespace": "airflow"}},
+    )
+    reconciler = BulkReconciler(
+        resource_type="pool",
+        plural="pools",
+        id_field="name",
+        collection="pools",
+        index=index,
+        list_page=list_page,
+        build_payload=_pool_payload,
+        write=write,
+        instances=instances,
+        queue=WorkQueue(),
+    )
+
+    with patch("config.reconciler.status_manager"):
+        # team/eu does not exist; its pool fails without blocking the others
+        assert reconciler.run_cycle() == 2
+        reconciler.queue.drain()
+    assert sorted(listed) == ["airflow/eu", "default"]
+    written = {call.args[1]["name"]: call.args[0] for call in write.call_args_list}
+    assert written == {"local": "default", "shared": "airflow/eu"}
+
+
+def _drift_count(field):
+    return (
+        REGISTRY.get_sample_value(
+            "airflow_drift_detected_total", {"resource_type": "pool", "field": field}
+        )
+        or 0
+    )
+
+
+def test_detect_mode_reports_drift_without_writing():
+    objects = [{"name": "drifted", "slots": 1, "description": None}]
+    write = MagicMock()
+    index, reconciler = _reconciler(objects, write, drift_mode="detect")
+    index.upsert("default", "drifted", {"slots": 4}, generation=2)
+    index.upsert("default", "missing", {"slots": 2})
+    slots, missing = _drift_count("slots"), _drift_count("missing")
+
+    with patch("config.reconciler.status_manager") as status:
+        assert reconciler.run_cycle() == 0
+        write.assert_not_called()
+        assert _drift_count("slots") == slots + 1
+        assert _drift_count("missing") == missing + 1
+        conditions = {
+            call.args[2]: call.args[3]["conditions"][0]
+            for call in status.update.call_args_list
+        }
+        assert conditions["drifted"]["reason"] == "Drifted"
+        assert "slots" in conditions["drifted"]["message"]
+
+        # Fixed in Airflow: the condition turns Ready again
+        objects[0]["slots"] = 4
+        index.remove("default", "missing")
+        status.reset_mock()
+        reconciler.run_cycle()
+    (call,) = status.update.call_args_list
+    assert call.args[3]["conditions"][0]["status"] == "True"
+
+
+def test_unknown_drift_mode_is_rejected():
+    with pytest.raises(ValueError):
+        _reconciler([], MagicMock(), drift_mode="ignore")
+
+
+def test_index_counts_follow_namespace_state_and_instance():
+    index = ResourceIndex()
+    synced = {
+        "observedGeneration": 1,
+        "conditions": [{"type": "Ready", "status": "True"}],
+    }
+    index.upsert("ns", "a", {"slots": 1}, generation=1)
+    index.upsert("ns", "b", {"slots": 1}, generation=1, status=synced)
+    index.upsert("other", "c", {"airflowRef": {"name": "prod"}})
+    assert index.counts() == {
+        ("ns", "pending", "default"): 1,
+        ("ns", "synced", "default"): 1,
+        ("other", "pending", "other/prod"): 1,
+    }
+
+    index.upsert("ns", "a", {"slots": 1}, generation=1, status=synced)
+    # A spec change is pending until its generation is observed
+    index.upsert("ns", "b", {"slots": 2}, generation=2, status=synced)
+    index.remove("other", "c")
+    assert index.counts() == {
+        ("ns", "synced", "default"): 1,
+        ("ns", "pending", "default"): 1,
+    }
+
+
+def test_managed_resources_are_collected_from_index_counts():
+    index = ResourceIndex()
+    index.upsert("ns", "a", {"slots": 1})
+    collector = ManagedResourceCollector()
+    collector.add_source("pool", index.counts)
+
+    [family] = collector.collect()
+    assert [(sample.labels, sample.value) for sample in family.samples] == [
+        (
+            {
+                "resource_type": "pool",
+                "namespace": "ns",
+                "state": "pending",
+                "instance": "default",
+            },
+            1,
+        )
+    ]
@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.secret_cache import SecretCache, decode_secret_data
+
+
+def test_decode_secret_data():
+    assert decode_secret_data({"password": "aHVudGVyMg=="}) == {"password": "hunter2"}
+    assert decode_secret_data(None) == {}
+
+
+def test_decode_secret_data_skips_binary_values():
+    assert decode_secret_data({"blob": "/w==", "ok": "b2s="}) == {"ok": "ok"}
+
+
+def test_get_miss_and_hit():
+    cache = SecretCache(max_entries=10)
+    assert cache.get("default", "creds") is None
+    cache.put("default", "creds", {"password": "a"})
+    assert cache.get("default", "creds") == {"password": "a"}
+
+
+def test_entries_are_namespace_scoped():
+    cache = SecretCache(max_entries=10)
+    cache.put("team-a", "creds", {"password": "a"})
+    assert cache.get("team-b", "creds") is None
+
+
+def test_evicts_least_recently_used():
+    cache = SecretCache(max_entries=2)
+    cache.put("default", "one", {})
+    cache.put("default", "two", {})
+    cache.get("default", "one")
+    cache.put("default", "three", {})
+    assert ("default", "one") in cache
+    assert ("default", "two") not in cache
+    assert ("default", "three") in cache
+
+
+def test_refreshed_entries_are_evicted_last():
+    cache = SecretCache(max_entries=2)
+    cache.put("default", "watched", {})
+    cache.put("default", "idle", {})
+    cache.refresh("default", "watched", {"password": "b"})
+    cache.put("default", "new", {})
+    assert ("default", "watched") in cache
+    assert ("default", "idle") not in cache
+
+
+def test_refresh_only_updates_cached_entries():
+    cache = SecretCache(max_entries=10)
+    cache.refresh("default", "unknown", {"password": "a"})
+    assert ("default", "unknown") not in cache
+
+    cache.put("default", "creds", {"password": "a"})
+    cache.refresh("default", "creds", {"password": "b"})
+    assert cache.get("default", "creds") == {"password": "b"}
+
+
+def test_invalidate():
+    cache = SecretCache(max_entries=10)
+    cache.put("default", "creds", {"password": "a"})
+    cache.invalidate("default", "creds")
+    assert cache.get("default", "creds") is None
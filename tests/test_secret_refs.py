@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.k8s_secret import secret_refs
+from config.secret_refs import SecretRefIndex
+
+
+def test_secret_refs_collects_only_secret_references():
+    login = {"value": "admin"}
+    password = {"secretRef": {"name": "creds", "key": "password"}}
+    assert secret_refs(login, password, None, "plain") == {("creds", "password")}
+
+
+def test_secret_refs_skips_malformed_reference():
+    assert secret_refs({"secretRef": {"name": "creds"}}) == set()
+
+
+def test_dependents_by_key():
+    index = SecretRefIndex()
+    index.update(("connection", "default", "db"), "default", {("creds", "password")})
+    index.update(("variable", "default", "user"), "default", {("creds", "login")})
+
+    assert index.dependents("default", "creds", {"password"}) == {
+        ("connection", "default", "db")
+    }
+    assert len(index.dependents("default", "creds")) == 2
+    assert index.dependents("other", "creds") == set()
+
+
+def test_update_replaces_previous_refs():
+    index = SecretRefIndex()
+    owner = ("variable", "default", "path")
+    index.update(owner, "default", {("old", "key")})
+    index.update(owner, "default", {("new", "key")})
+
+    assert not index.is_referenced("default", "old")
+    assert index.dependents("default", "new") == {owner}
+
+
+def test_remove_owner():
+    index = SecretRefIndex()
+    owner = ("variable", "default", "path")
+    index.update(owner, "default", {("creds", "key")})
+    index.remove(owner)
+
+    assert not index.is_referenced("default", "creds")
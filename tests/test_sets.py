@@ -0,0 +1,185 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from airflow_client.client.exceptions import ApiException  # noqa: E402
+
+from config.instances import InstanceRegistry  # noqa: E402
+from config.reconciler import ResourceIndex  # noqa: E402
+from config.secret_refs import SecretRefIndex  # noqa: E402
+from config.sets import ResourceSetReconciler, expand_sources  # noqa: E402
+from config.workqueue import WorkQueue  # noqa: E402
+
+
+class FakeAioClient:
+    def __init__(self, existing=(), failing=()):
+        self.existing = set(existing)
+        self.failing = set(failing)
+        self.calls = []
+
+    async def post(self, collection, payload):
+        self.calls.append(("POST", payload["key"]))
+        if payload["key"] in self.failing:
+            raise ApiException(status=400, reason="Bad Request")
+        self.existing.add(payload["key"])
+
+    async def patch(self, collection, object_id, payload):
+        self.calls.append(("PATCH", object_id))
+        if object_id not in self.existing:
+            raise ApiException(status=404, reason="Not Found")
+
+    async def delete(self, collection, object_id):
+        self.calls.append(("DELETE", object_id))
+        if object_id not in self.existing:
+            raise ApiException(status=404, reason="Not Found")
+        self.existing.discard(object_id)
+
+
+def _variable_payload(key, entry, namespace, logger=None):
+    if "value" not in entry:
+        raise ValueError(f"no value for {key}")
+    return {"key": key, "value": entry["value"], "description": None}
+
+
+def _reconciler(aio_client=None, remote=(), write=None):
+    target = SimpleNamespace(
+        name="default", aio_client=aio_client or FakeAioClient(), bulk=None
+    )
+    index = ResourceIndex()
+    return ResourceSetReconciler(
+        expand=lambda spec, namespace: {e["key"]: e for e in spec["variables"]},
+        resource_type="variableset",
+        plural="variablesets",
+        id_field="key",
+        collection="variables",
+        index=index,
+        list_page=lambda target, limit, offset: {
+            "variables": list(remote),
+            "total_entries": len(remote),
+        },
+        build_payload=_variable_payload,
+        write=write or MagicMock(),
+        instances=InstanceRegistry(create_default=lambda: target),
+        queue=WorkQueue(),
+    )
+
+
+def _spec(count):
+    return {"variables": [{"key": f"var-{i}", "value": str(i)} for i in range(count)]}
+
+
+def test_apply_writes_every_entry_once():
+    aio = FakeAioClient()
+    reconciler = _reconciler(aio)
+
+    status = asyncio.run(reconciler.apply("ns", "set", _spec(120), create=True))
+
+    assert status["summary"] == {"entries": 120, "synced": 120}
+    assert status["lastSyncedHash"]
+    assert status["conditions"][0]["status"] == "True"
+    assert sorted(aio.calls) == sorted(("POST", f"var-{i}") for i in range(120))
+    # An unchanged set is skipped as a whole
+    assert asyncio.run(reconciler.apply("ns", "set", _spec(120))) is None
+
+
+def test_apply_only_pushes_changed_entries():
+    aio = FakeAioClient()
+    reconciler = _reconciler(aio)
+    asyncio.run(reconciler.apply("ns", "set", _spec(3), create=True))
+    aio.calls.clear()
+
+    spec = _spec(3)
+    spec["variables"][1]["value"] = "changed"
+    asyncio.run(reconciler.apply("ns", "set", spec))
+
+    assert aio.calls == [("PATCH", "var-1")]
+
+
+def test_apply_reports_failed_entries_in_summary():
+    aio = FakeAioClient(failing={"var-2"})
+    reconciler = _reconciler(aio)
+    spec = _spec(4)
+    del spec["variables"][3]["value"]
+
+    status = asyncio.run(reconciler.apply("ns", "set", spec, create=True))
+
+    assert status["summary"] == {
+        "entries": 4,
+        "synced": 2,
+        "failed": 2,
+        "failedKeys": ["var-2", "var-3"],
+    }
+    assert status["lastSyncedHash"] is None
+    assert status["conditions"][0]["reason"] == "EntriesFailed"
+
+
+def test_apply_deletes_removed_entries():
+    aio = FakeAioClient()
+    reconciler = _reconciler(aio)
+    asyncio.run(reconciler.apply("ns", "set", _spec(3), create=True))
+    aio.calls.clear()
+
+    status = asyncio.run(
+        reconciler.apply("ns", "set", _spec(2), removed={"var-2", "gone"})
+    )
+
+    assert status["summary"] == {"entries": 2, "synced": 2}
+    assert sorted(aio.calls) == [("DELETE", "gone"), ("DELETE", "var-2")]
+
+
+def test_run_cycle_writes_drifted_entries_and_persists_summary():
+    remote = [
+        {"key": "var-0", "value": "0", "description": None},
+        {"key": "var-1", "value": "drifted", "description": None},
+    ]
+
+    def write(target, payload, exists):
+        known = {variable["key"]: variable for variable in remote}
+        if not exists:
+            remote.append(payload)
+        elif payload["key"] in known:
+            known[payload["key"]].update(payload)
+        else:
+            raise ApiException(status=404, reason="Not Found")
+
+    write = MagicMock(side_effect=write)
+    reconciler = _reconciler(remote=remote, write=write)
+    reconciler.index.upsert("ns", "set", _spec(3))
+
+    with patch("config.sets.status_manager") as statuses:
+        assert reconciler.run_cycle() == 2
+        assert reconciler.queue.drain() == 1
+        assert reconciler.run_cycle() == 0
+    written = [(call.args[1]["key"], call.args[2]) for call in write.call_args_list]
+    assert written == [("var-1", True), ("var-2", True), ("var-2", False)]
+    assert statuses.update.call_count == 1
+    assert statuses.update.call_args.args[3]["summary"] == {"entries": 3, "synced": 3}
+
+
+def test_expand_sources_reads_config_maps_and_secrets():
+    with (
+        patch("config.sets.config_map_cache.get", return_value={"bucket": "s3://data"}),
+        patch("config.sets.get_secret_data", return_value={"token": "t0k3n"}),
+    ):
+        entries = expand_sources(
+            [
+                {"configMapRef": {"name": "settings"}, "prefix": "team_"},
+                {"secretRef": {"name": "creds"}},
+            ],
+            "ns",
+        )
+
+    assert entries == {
+        "team_bucket": {"value": "s3://data"},
+        "token": {"secretRef": {"name": "creds", "key": "token"}},
+    }
+
+
+def test_whole_secret_reference_depends_on_every_key():
+    index = SecretRefIndex()
+    index.update("owner", "ns", {("creds", None)})
+    assert index.dependents("ns", "creds", {"any-key"}) == {"owner"}
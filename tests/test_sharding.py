@@ -0,0 +1,212 @@
+import os
+import sys
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from kubernetes.client.exceptions import ApiException
+
+from config.instances import InstanceRegistry
+from config.reconciler import BulkReconciler, ResourceIndex
+from config.sharding import (
+    DEFAULT_FINALIZER,
+    HashRing,
+    ShardCoordinator,
+    shard_key,
+)
+from config.workqueue import WorkQueue
+
+
+class FakeLeases:
+    """In-memory stand-in for the Leases of one namespace."""
+
+    def __init__(self):
+        self.leases = {}
+
+    def patch_namespaced_lease(self, name, namespace, body):
+        if name not in self.leases:
+            raise ApiException(status=404)
+        self.leases[name] = body
+
+    def create_namespaced_lease(self, namespace, body):
+        self.leases[body["metadata"]["name"]] = body
+
+    def delete_namespaced_lease(self, name, namespace):
+        self.leases.pop(name, None)
+
+    def list_namespaced_lease(self, namespace, label_selector):
+        items = []
+        for body in self.leases.values():
+            spec = body["spec"]
+            renew_time = datetime.strptime(
+                spec["renewTime"], "%Y-%m-%dT%H:%M:%S.%fZ"
+            ).replace(tzinfo=timezone.utc)
+            items.append(
+                SimpleNamespace(
+                    spec=SimpleNamespace(
+                        holder_identity=spec["holderIdentity"],
+                        lease_duration_seconds=spec["leaseDurationSeconds"],
+                        renew_time=renew_time,
+                    )
+                )
+            )
+        return SimpleNamespace(items=items)
+
+
+def _replica(identity, leases, clock):
+    return ShardCoordinator(
+        enabled=True,
+        identity=identity,
+        namespace="operator",
+        group="test",
+        lease_duration=15,
+        renew_interval=5,
+        api=leases,
+        clock=lambda: clock[0],
+    )
+
+
+KEYS = [("team", f"object-{i}") for i in range(200)]
+
+
+def _tick(clock, seconds, *replicas):
+    # Replicas renew every 5 seconds
+    for _ in range(seconds // 5):
+        clock[0] += 5
+        for replica in replicas:
+            replica.heartbeat()
+
+
+def _owned(replica):
+    return {key for key in KEYS if replica.owns(*key)}
+
+
+def test_ring_moves_only_the_keys_of_a_new_member():
+    before = HashRing(["a", "b"])
+    after = HashRing(["a", "b", "c"])
+    keys = [shard_key(*key) for key in KEYS]
+    moved = [key for key in keys if before.owner(key) != after.owner(key)]
+    assert moved
+    assert all(after.owner(key) == "c" for key in moved)
+    assert HashRing().owner("team/object") is None
+
+
+def test_single_replica_owns_everything_right_away():
+    clock = [1000.0]
+    replica = _replica("a", FakeLeases(), clock)
+    assert _owned(replica) == set()
+    replica.heartbeat()
+    assert _owned(replica) == set(KEYS)
+
+
+def test_disabled_coordinator_owns_everything():
+    assert ShardCoordinator(enabled=False).owns("team", "object")
+
+
+def test_joining_replica_waits_for_handover():
+    clock = [1000.0]
+    leases = FakeLeases()
+    a = _replica("a", leases, clock)
+    b = _replica("b", leases, clock)
+    a.heartbeat()
+    b.heartbeat()
+    # b only takes keys over once a had a lease duration to notice it
+    assert _owned(b) == set()
+    clock[0] += 5
+    a.heartbeat()
+    assert _owned(a) and _owned(a) != set(KEYS)
+    assert not _owned(a) & _owned(b)
+
+    _tick(clock, 10, a, b)
+    assert _owned(a) | _owned(b) == set(KEYS)
+    assert not _owned(a) & _owned(b)
+
+
+def test_keys_of_a_gone_replica_are_taken_over_immediately():
+    clock = [1000.0]
+    leases = FakeLeases()
+    a = _replica("a", leases, clock)
+    b = _replica("b", leases, clock)
+    a.heartbeat()
+    b.heartbeat()
+    _tick(clock, 20, a, b)
+    assert _owned(a) | _owned(b) == set(KEYS)
+
+    on_change = MagicMock()
+    a._on_change = on_change
+    b.stop()
+    a.heartbeat()
+    assert _owned(a) == set(KEYS)
+    assert _owned(b) == set()
+    on_change.assert_called_once()
+
+
+def test_replica_that_cannot_renew_stops_owning():
+    clock = [1000.0]
+    leases = FakeLeases()
+    replica = _replica("a", leases, clock)
+    replica.heartbeat()
+    leases.patch_namespaced_lease = MagicMock(side_effect=ApiException(status=500))
+    clock[0] += 10
+    replica.heartbeat()
+    assert _owned(replica) == set(KEYS)
+    clock[0] += 5
+    replica.heartbeat()
+    assert _owned(replica) == set()
+
+
+def test_stale_finalizers_are_released_after_own_finalizer():
+    clock = [1000.0]
+    leases = FakeLeases()
+    a = _replica("a", leases, clock)
+    gone = _replica("gone", leases, clock)
+    a.heartbeat()
+    finalizers = [gone.finalizer, a.finalizer, DEFAULT_FINALIZER]
+    assert a.stale_finalizers(finalizers) == [gone.finalizer, DEFAULT_FINALIZER]
+
+    with patch("config.sharding.client.CustomObjectsApi") as api:
+        assert not a.release_stale_finalizers("pools", "team", "pool", finalizers)
+        assert a.release_stale_finalizers(
+            "pools", "team", "pool", [gone.finalizer, DEFAULT_FINALIZER]
+        )
+    operations = api.return_value.patch_namespaced_custom_object.call_args.kwargs[
+        "body"
+    ]
+    assert operations == [
+        {"op": "test", "path": "/metadata/finalizers/1", "value": DEFAULT_FINALIZER},
+        {"op": "remove", "path": "/metadata/finalizers/1"},
+        {"op": "test", "path": "/metadata/finalizers/0", "value": gone.finalizer},
+        {"op": "remove", "path": "/metadata/finalizers/0"},
+    ]
+
+
+def test_run_cycle_skips_resources_of_other_replicas():
+    shards = MagicMock()
+    shards.owns.side_effect = lambda namespace, name: name == "mine"
+    index = ResourceIndex()
+    write = MagicMock()
+    reconciler = BulkReconciler(
+        resource_type="pool",
+        plural="pools",
+        id_field="name",
+        collection="pools",
+        index=index,
+        list_page=lambda target, limit, offset: {"pools": [], "total_entries": 0},
+        build_payload=lambda name, spec, namespace: {"name": name, "slots": 1},
+        write=write,
+        instances=InstanceRegistry(
+            create=lambda key, namespace, spec: key, create_default=lambda: "default"
+        ),
+        shards=shards,
+        queue=WorkQueue(),
+    )
+    index.upsert("team", "mine", {})
+    index.upsert("team", "theirs", {})
+
+    with patch("config.reconciler.status_manager"):
+        assert reconciler.run_cycle() == 1
+        reconciler.queue.drain()
+        assert not reconciler.reconcile_one("team", "theirs")
+    assert [call.args[1]["name"] for call in write.call_args_list] == ["mine"]
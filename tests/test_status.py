@@ -0,0 +1,127 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import kopf
+from airflow_client.client.exceptions import ApiException
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from config.status import (
+    StatusManager,
+    error_message,
+    failed_status,
+    generation_synced,
+    status_changes,
+    sync_entry,
+    sync_state,
+    synced_status,
+)
+
+ENTRY = {"hash": "abc", "verifiedAt": "2024-01-01T00:00:00+00:00"}
+
+
+def _manager(write=None):
+    clock = [0.0]
+    manager = StatusManager(
+        window=2, write=write or MagicMock(), clock=lambda: clock[0]
+    )
+    return manager, clock
+
+
+def test_updates_within_the_window_are_written_once():
+    write = MagicMock()
+    manager, clock = _manager(write)
+    manager.update("pools", "ns", "pool", failed_status("boom", generation=1))
+    clock[0] = 1
+    manager.update("pools", "ns", "pool", synced_status(ENTRY, generation=2))
+    assert manager.flush() == 0
+
+    clock[0] = 2
+    assert manager.flush() == 1
+    plural, namespace, name, fields = write.call_args.args
+    assert (plural, namespace, name) == ("pools", "ns", "pool")
+    assert fields["observedGeneration"] == 2
+    assert fields["lastSyncedHash"] == "abc"
+    assert [c["status"] for c in fields["conditions"]] == ["True"]
+
+
+def test_unchanged_status_is_not_written():
+    write = MagicMock()
+    manager, _ = _manager(write)
+    status = synced_status(ENTRY, generation=3)
+    manager.observe("pools", "ns", "pool", status)
+
+    # Only the transition time of the condition would differ
+    manager.update("pools", "ns", "pool", synced_status(ENTRY, generation=3))
+    assert manager.flush(force=True) == 0
+    write.assert_not_called()
+
+
+def test_condition_keeps_transition_time_while_status_is_unchanged():
+    known = failed_status("first error")
+    known["conditions"][0]["lastTransitionTime"] = "earlier"
+
+    changes = status_changes(known, failed_status("second error"))
+
+    assert changes["conditions"][0]["message"] == "second error"
+    assert changes["conditions"][0]["lastTransitionTime"] == "earlier"
+    changes = status_changes(known, synced_status(ENTRY))
+    assert changes["conditions"][0]["lastTransitionTime"] != "earlier"
+
+
+def test_apply_adds_only_changes_to_the_handler_patch():
+    manager, _ = _manager()
+    manager.observe("pools", "ns", "pool", synced_status(ENTRY, generation=1))
+    patch = kopf.Patch()
+
+    manager.apply(patch, "pools", "ns", "pool", synced_status(ENTRY, generation=2))
+
+    assert dict(patch["status"]) == {"observedGeneration": 2}
+
+
+def test_failed_write_is_retried_on_next_update():
+    write = MagicMock(side_effect=[RuntimeError("conflict"), None])
+    manager, _ = _manager(write)
+    manager.update("pools", "ns", "pool", synced_status(ENTRY))
+    manager.flush(force=True)
+    manager.update("pools", "ns", "pool", synced_status(ENTRY))
+    assert manager.flush(force=True) == 1
+    assert write.call_count == 2
+
+
+def test_sync_entry_reads_structured_and_legacy_status():
+    assert sync_entry(synced_status(ENTRY)) == ENTRY
+    assert sync_entry({"fingerprint": ENTRY}) == ENTRY
+    assert sync_entry(None) is None
+
+
+def test_generation_is_synced_only_once_ready_at_that_generation():
+    meta = {"generation": 4}
+    assert generation_synced(meta, synced_status(ENTRY, generation=4))
+    # Events can carry a spec older than the status already written
+    assert generation_synced(meta, synced_status(ENTRY, generation=5))
+    assert not generation_synced(meta, synced_status(ENTRY, generation=3))
+    assert not generation_synced(meta, failed_status("boom", generation=4))
+    assert not generation_synced(meta, {"observedGeneration": 4})
+    assert not generation_synced({}, synced_status(ENTRY, generation=4))
+
+
+def test_sync_state_follows_ready_condition_of_current_generation():
+    assert sync_state(None) == "pending"
+    assert sync_state(synced_status(ENTRY, generation=2), generation=2) == "synced"
+    assert sync_state(synced_status(ENTRY, generation=1), generation=2) == "pending"
+    assert sync_state(failed_status("boom", generation=2), generation=2) == "failed"
+    assert sync_state(failed_status("drift", reason="Drifted")) == "drifted"
+
+
+def test_error_message_leaves_out_the_response_body():
+    first = ApiException(status=400, reason="Bad Request")
+    first.body = '{"detail": "invalid value s3cret"}'
+    second = ApiException(status=400, reason="Bad Request")
+    second.body = '{"detail": "invalid value other"}'
+
+    assert error_message(first) == error_message(second) == "HTTP 400 Bad Request"
+    assert error_message(ValueError("Invalid Pool field slots")) == (
+        "Invalid Pool field slots"
+    )
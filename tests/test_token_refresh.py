@@ -0,0 +1,71 @@
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.token_refresh import TokenRefresher
+
+
+def test_concurrent_callers_share_one_refresh():
+    calls = []
+    release = threading.Event()
+
+    def refresh():
+        calls.append(1)
+        release.wait(1)
+        return time.time() + 3600
+
+    refresher = TokenRefresher("test", refresh)
+    threads = [threading.Thread(target=refresher.ensure_fresh) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+    refresher.stop()
+
+    assert len(calls) == 1
+    assert not refresher.needs_refresh()
+
+
+def test_needs_refresh_within_grace_period():
+    refresher = TokenRefresher("test", lambda: 1000.0, grace=60)
+    assert refresher.needs_refresh(now=0)
+    refresher.ensure_fresh()
+    refresher.stop()
+    assert not refresher.needs_refresh(now=939)
+    assert refresher.needs_refresh(now=940)
+
+
+def test_failed_refresh_raises_and_keeps_credentials_missing():
+    def refresh():
+        raise RuntimeError("login failed")
+
+    refresher = TokenRefresher("test", refresh)
+    with pytest.raises(RuntimeError):
+        refresher.ensure_fresh()
+    assert refresher.needs_refresh()
+
+
+def test_background_thread_renews_ahead_of_grace_period():
+    renewed = threading.Event()
+    expiries = iter([time.time() + 0.2, time.time() + 3600])
+
+    def refresh():
+        expiry = next(expiries)
+        if expiry > time.time() + 60:
+            renewed.set()
+        return expiry
+
+    refresher = TokenRefresher(
+        "test", refresh, grace=0.05, lead=0.1, retry_interval=0.01
+    )
+    refresher.ensure_fresh()
+    try:
+        assert renewed.wait(2)
+    finally:
+        refresher.stop()
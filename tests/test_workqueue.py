@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("AIRFLOW_HOST", "http://localhost:8080")
+from prometheus_client import REGISTRY
+
+from config.workqueue import PRIORITY_CHANGE, PRIORITY_RESYNC, WorkQueue
+
+
+def _deduplicated():
+    return (
+        REGISTRY.get_sample_value(
+            "airflow_workqueue_deduplicated_total", {"resource_type": "pool"}
+        )
+        or 0
+    )
+
+
+def test_pending_work_of_a_key_is_merged():
+    queue = WorkQueue()
+    runs = []
+    before = _deduplicated()
+    for spec in ("v1", "v2", "v3"):
+        queue.add(("pool", "ns", "pool"), lambda spec=spec: runs.append(spec))
+
+    assert len(queue) == 1
+    assert _deduplicated() == before + 2
+    assert queue.drain() == 1
+    assert runs == ["v3"]
+
+
+def test_changes_run_before_resyncs():
+    queue = WorkQueue()
+    runs = []
+    queue.add(("pool", "ns", "a"), lambda: runs.append("a"), PRIORITY_RESYNC)
+    queue.add(("pool", "ns", "b"), lambda: runs.append("b"), PRIORITY_RESYNC)
+    queue.add(("pool", "ns", "c"), lambda: runs.append("c"), PRIORITY_CHANGE)
+    # A change of a key waiting for a resync moves it ahead
+    queue.add(("pool", "ns", "b"), lambda: runs.append("b-change"), PRIORITY_CHANGE)
+    # A later resync does not replace the waiting change
+    queue.add(("pool", "ns", "c"), lambda: runs.append("c-resync"), PRIORITY_RESYNC)
+
+    queue.drain()
+    assert runs == ["b-change", "c", "a"]
+
+
+def test_key_added_while_running_runs_again_afterwards():
+    queue = WorkQueue()
+    runs = []
+
+    def first():
+        runs.append("first")
+        queue.add(("pool", "ns", "pool"), lambda: runs.append("second"))
+
+    queue.add(("pool", "ns", "pool"), first)
+    assert queue.drain() == 2
+    assert runs == ["first", "second"]
+
+
+def test_workers_keep_going_after_failed_work():
+    queue = WorkQueue(workers=2)
+    done = threading.Event()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    queue.add(("pool", "ns", "a"), fail)
+    queue.add(("pool", "ns", "b"), done.set)
+    queue.start()
+    try:
+        assert done.wait(5)
+    finally:
+        queue.stop()
+    assert len(queue) == 0